@@ -0,0 +1,1225 @@
+"""
+⏱️ 성능 벤치마크 스크립트
+PDF 추출 파이프라인의 최적화 효과를 로컬에서 측정
+
+사용법:
+    python benchmarks.py parallel-extract --pages 240
+    python benchmarks.py document-buffer --pages 400
+    python benchmarks.py response-stream --elements 2000
+    python benchmarks.py document-model --elements 300
+    python benchmarks.py easyocr --pages 8 --batch-size 4
+    python benchmarks.py ocr-pool --pages 16 --workers 1 2 4
+    python benchmarks.py ocr-render --pages 6
+    python benchmarks.py local-tables --pages 40
+    python benchmarks.py ocr-server-concurrency --latency 0.2
+    python benchmarks.py ocr-batch --items 16 --max-in-flight 1 8
+    python benchmarks.py ocr-cache --clients 16
+    python benchmarks.py ocr-pdf-upload --sizes 8 32 128 --clients 4
+    python benchmarks.py ocr-pdf-stream --pages 40 --window-pages 5
+    python benchmarks.py ocr-microbatch --requests 32 --max-batch-size 1 4 8
+    python benchmarks.py metrics-overhead --requests 2000
+    python benchmarks.py resilience --clients 12
+    python benchmarks.py image-passthrough --width 2480 --height 3508
+    python benchmarks.py ocr-response-encoding --pages 40
+"""
+
+import argparse
+import sys
+import time
+
+import fitz  # PyMuPDF
+
+
+def make_synthetic_pdf(num_pages=200, lines_per_page=60):
+    """텍스트 레이어가 있는 합성 PDF 생성 (사업보고서 분량 흉내)"""
+    doc = fitz.open()
+    for page_num in range(num_pages):
+        page = doc.new_page()
+        y = 40
+        for line in range(lines_per_page):
+            page.insert_text(
+                (40, y),
+                f"Page {page_num + 1} line {line + 1}: Revenue 294, Operating profit 43, Net income 24",
+                fontsize=8,
+            )
+            y += 12
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def make_synthetic_table_pdf(num_pages=40, rows=12, cols=5):
+    """괘선이 있는 재무표 페이지로 된 합성 PDF 생성 (디지털 사업보고서 흉내)"""
+    doc = fitz.open()
+    headers = ["Item", "2021", "2022", "2023", "2024"][:cols]
+    for page_num in range(num_pages):
+        page = doc.new_page()
+        page.insert_text((40, 40), f"Page {page_num + 1} - Consolidated statement (unit: KRW 100M)", fontsize=9)
+        y = 60
+        for row in range(rows):
+            x = 40
+            for col in range(cols):
+                page.draw_rect(fitz.Rect(x, y, x + 100, y + 18))
+                if row == 0:
+                    cell = headers[col]
+                else:
+                    cell = f"{(row * 37 + col * 11 + page_num) * 13:,}" if col else f"Account {row}"
+                page.insert_text((x + 4, y + 13), cell, fontsize=8)
+                x += 100
+            y += 18
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes
+
+
+def serve_in_thread(app, port):
+    """uvicorn 서버를 백그라운드 스레드에서 실행 (벤치마크용) - Server 객체 반환"""
+    from mock_services import serve_in_thread as serve
+
+    return serve(app, port)
+
+
+def make_mock_upstage_app(latency=0.2, page_latency=0.0):
+    """고정 지연(+ PDF면 페이지당 지연) 후 응답하는 모의 Upstage 서버
+
+    호출 수 / 최대 동시 처리 수 / 장애 주입 순서(plan)는 app.state.mock (mock_services.MockBehavior)
+    """
+    from mock_services import MockBehavior, make_upstage_app
+
+    return make_upstage_app(MockBehavior(latency=latency), page_latency=page_latency)
+
+
+def start_ocr_server_with_mock(args):
+    """모의 Upstage + ocr_server를 로컬 포트에 띄우기 - (upstream, server)"""
+    import logging
+    import os
+
+    upstream = serve_in_thread(
+        make_mock_upstage_app(args.latency, getattr(args, "page_latency", 0.0)), args.upstream_port
+    )
+    os.environ["UPSTAGE_API_URL"] = f"http://127.0.0.1:{args.upstream_port}/v1/document-ai/document-parse"
+    os.environ["OCR_API_KEY"] = "bench-key"
+    os.environ.setdefault("UPSTAGE_API_KEY", "mock-upstage-key")
+    # 결과 캐시는 ocr-cache 벤치마크에서만 사용
+    os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+    import ocr_server
+
+    for name in ("ocr_server", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return upstream, serve_in_thread(ocr_server.app, args.port)
+
+
+def load_test_image():
+    from pathlib import Path
+
+    return (Path(__file__).parent / "test_ocr_image.png").read_bytes()
+
+
+def unique_image(image_bytes, index):
+    """PNG 끝에 바이트를 덧붙여 요청마다 다른 내용으로 (동일 요청 합치기/캐시 회피)"""
+    return image_bytes + index.to_bytes(4, "big")
+
+
+def print_header(title):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def bench_parallel_extract(args):
+    """직렬 루프 vs 프로세스 풀 페이지 텍스트 추출 (pages/sec)"""
+    from pdf_extraction import extract_page_texts_parallel, extract_page_texts_serial, join_page_texts
+
+    print_header("📄 병렬 페이지 텍스트 추출 벤치마크")
+    pdf_bytes = make_synthetic_pdf(args.pages)
+    print(f"  📝 합성 PDF: {args.pages}페이지, {len(pdf_bytes) / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    serial_texts = extract_page_texts_serial(pdf_bytes, max_pages=args.pages)
+    serial_time = time.perf_counter() - start
+    print(f"  🔸 직렬:  {serial_time:.2f}초 ({args.pages / serial_time:.0f} pages/sec)")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        parallel_texts = extract_page_texts_parallel(pdf_bytes, max_pages=args.pages, workers=workers)
+        parallel_time = time.perf_counter() - start
+        same = join_page_texts(parallel_texts) == join_page_texts(serial_texts)
+        print(
+            f"  🔹 병렬 x{workers}: {parallel_time:.2f}초 ({args.pages / parallel_time:.0f} pages/sec, "
+            f"{serial_time / parallel_time:.2f}배) 결과 일치: {'✅' if same else '❌'}"
+        )
+
+
+def bench_document_buffer(args):
+    """업로드 PDF 반복 read() vs 공유 버퍼 핸들 (Python 힙 최대 사용량)"""
+    import io
+    import tempfile
+    import tracemalloc
+
+    from document_buffer import PDFDocumentHandle
+
+    print_header("🗂️ 공유 문서 버퍼 메모리 벤치마크")
+    pdf_bytes = make_synthetic_pdf(args.pages)
+    print(f"  📝 합성 PDF: {args.pages}페이지, {len(pdf_bytes) / 1e6:.1f} MB, 단계 {args.stages}개")
+
+    def repeated_reads(upload):
+        # 기존: 단계마다 seek(0)/read()로 새 bytes 생성
+        copies = []
+        for _ in range(args.stages):
+            upload.seek(0)
+            copies.append(upload.read())
+        return sum(len(c) for c in copies)
+
+    def shared_handle(upload):
+        handle = PDFDocumentHandle.from_upload(upload, spill_threshold=args.spill_mb * 1024 * 1024)
+        views = [handle.view() for _ in range(args.stages)]
+        total = sum(v.nbytes for v in views)
+        del views
+        handle.close()
+        return total
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as disk_file:
+        disk_file.write(pdf_bytes)
+        disk_file.flush()
+        sources = (("메모리 업로드(BytesIO)", lambda: io.BytesIO(pdf_bytes)), ("디스크 파일", lambda: open(disk_file.name, "rb")))
+        for source_label, make_upload in sources:
+            print(f"  [{source_label}]")
+            for label, func in (("반복 read()", repeated_reads), ("공유 핸들", shared_handle)):
+                upload = make_upload()
+                tracemalloc.start()
+                func(upload)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                upload.close()
+                print(f"    🔹 {label}: 최대 {peak / 1e6:.2f} MB 추가 할당")
+
+
+def bench_response_stream(args):
+    """Upstage 응답 json.loads(전체) vs 스트리밍 파싱 (최대 메모리, 청크 경계 정확성)"""
+    import base64
+    import json
+    import tempfile
+    import tracemalloc
+
+    from upstage_client import AssetStore, parse_response_stream
+
+    print_header("🌊 Upstage 응답 스트리밍 파싱 벤치마크")
+    figure = base64.b64encode(bytes(range(256)) * (args.asset_kb * 4)).decode()
+    elements = [
+        {
+            "id": i,
+            "page": i // 10 + 1,
+            "category": "figure" if i % 10 == 0 else "paragraph",
+            "content": {"text": f"요소 {i} 매출액 {i * 7:,}억원", "markdown": f"| 요소 | {i} |"},
+            "coordinates": [{"x": 0.125 * (i % 8), "y": 1.5e-3 * i}],
+            **({"base64_encoding": figure} if i % 10 == 0 else {}),
+        }
+        for i in range(args.elements)
+    ]
+    body = json.dumps(
+        {"api": "2.0", "model": "document-parse", "content": {"text": ""}, "elements": elements, "usage": {"pages": 1.5}},
+        ensure_ascii=False,
+    ).encode()
+    print(f"  📝 요소 {args.elements}개, 응답 {len(body) / 1e6:.1f} MB (base64 이미지 {args.elements // 10}개)")
+
+    def chunked(data, size):
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    with tempfile.TemporaryDirectory() as asset_dir:
+        store = AssetStore(asset_dir)
+        for label, parse in (
+            ("json.loads(전체)", lambda: json.loads(b"".join(chunked(body, 64 * 1024)))),
+            ("스트리밍 파싱", lambda: parse_response_stream(chunked(body, 64 * 1024), asset_store=store)),
+        ):
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = parse()
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  🔹 {label}: {elapsed * 1000:.0f}ms, 최대 {peak / 1e6:.1f} MB 추가 할당, 요소 {len(result['elements'])}개")
+
+    # 숫자/리터럴이 청크 경계에서 잘리는 경우 ('1.' + '5}') - 모든 분할 위치에서 결과 일치 확인
+    sample = b'{"a": 1.5, "b": -2.5e-3, "c": [10, true, null, false], "elements": [{"x": 0.25}, 7], "d": 12}'
+    cases = [[b'{"a": 1.', b"5}"]] + [[sample[:i], sample[i:]] for i in range(1, len(sample))]
+    cases.append([sample[i:i + 1] for i in range(len(sample))])
+    failures = []
+    for chunks in cases:
+        try:
+            if parse_response_stream(chunks) != json.loads(b"".join(chunks)):
+                failures.append((chunks, "결과 불일치"))
+        except ValueError as e:
+            failures.append((chunks, e))
+    cases_ok = len(cases) - len(failures)
+    print(f"  {'✅' if not failures else '❌'} 청크 경계 분할: {cases_ok}/{len(cases)}가지 결과 일치")
+    for chunks, error in failures[:3]:
+        print(f"    ❌ {chunks}: {error}")
+
+
+def bench_document_model(args):
+    """기존 dict 리스트 vs __slots__ 문서 모델 (메모리, 페이지별 표 조회)"""
+    import json
+    import tracemalloc
+
+    from document_model import StructuredDocument
+
+    print_header("🧱 구조화 문서 모델 벤치마크")
+    categories = ("paragraph", "table", "heading1", "list", "figure", "paragraph", "caption", "paragraph")
+    elements_list = [
+        {
+            "id": i,
+            "page": i // 10 + 1,
+            "category": categories[i % len(categories)],
+            "content": {"text": f"요소 {i} 매출액 {i * 7:,}억원", "html": f"<p>요소 {i}</p>", "markdown": f"| 요소 | {i} |"},
+        }
+        for i in range(args.elements)
+    ]
+    num_pages = elements_list[-1]["page"]
+    print(f"  📝 요소 {args.elements}개, {num_pages}페이지")
+
+    def legacy_structure():
+        # 기존 extract_text_with_upstage 분류 루프와 동일한 dict 구성
+        structured = {"tables": [], "charts": [], "headings": [], "paragraphs": [], "lists": []}
+        for element in elements_list:
+            category = element["category"]
+            content = element["content"]
+            text, html, markdown = content["text"], content["html"], content["markdown"]
+            if "table" in category.lower():
+                structured["tables"].append({"page": element["page"], "content": text, "html": html, "markdown": markdown})
+            elif "figure" in category.lower() or "chart" in category.lower() or "image" in category.lower():
+                structured["charts"].append({"page": element["page"], "content": text, "html": html, "markdown": markdown, "category": category})
+            elif "heading" in category.lower() or "title" in category.lower():
+                structured["headings"].append({"page": element["page"], "content": text})
+            elif "list" in category.lower():
+                structured["lists"].append({"page": element["page"], "content": text})
+            elif "paragraph" in category.lower():
+                structured["paragraphs"].append({"page": element["page"], "content": text})
+        return structured
+
+    def measure(build):
+        tracemalloc.start()
+        result = build()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, size
+
+    legacy, legacy_bytes = measure(legacy_structure)
+    model, model_bytes = measure(lambda: StructuredDocument.from_upstage_elements(elements_list))
+    print(f"  🔸 dict 리스트: {legacy_bytes / 1024:.1f} KB")
+    print(f"  🔹 문서 모델:   {model_bytes / 1024:.1f} KB ({model_bytes / legacy_bytes:.2f}배, 인덱스 포함)")
+    # 모델은 아웃라인 수준 계산을 위해 제목에 category를 추가로 저장
+    saved = model.to_dict()
+    for heading in saved["headings"]:
+        heading.pop("category")
+    print(f"  ✅ 저장 형식 일치: {'✅' if saved == legacy else '❌'}")
+
+    rounds = 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in range(1, num_pages + 1):
+            [table for table in legacy["tables"] if table["page"] == page]
+    legacy_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for page in range(1, num_pages + 1):
+            model.tables_on_page(page)
+    model_ms = (time.perf_counter() - start) * 1000
+    print(f"  🔸 페이지별 표 조회 (전체 순회): {legacy_ms:.1f}ms / {rounds}회")
+    print(f"  🔹 페이지별 표 조회 (인덱스):   {model_ms:.1f}ms / {rounds}회")
+
+    payload = json.dumps(model.to_dict(), ensure_ascii=False)
+    start = time.perf_counter()
+    for _ in range(100):
+        StructuredDocument.from_dict(json.loads(payload)).to_dict()
+    print(f"  🔹 JSON 왕복 ({len(payload) / 1024:.1f} KB): {(time.perf_counter() - start) * 10:.2f}ms/회")
+
+
+def bench_easyocr(args):
+    """EasyOCR 페이지별 readtext vs 배치 인식 (CPU, pages/sec)"""
+    from pathlib import Path
+
+    import numpy as np
+    from PIL import Image
+
+    from ocr_engine import OCREngine, iter_ocr_page_records, render_page_image
+
+    print_header("🔤 EasyOCR 배치 인식 벤치마크")
+    engine = OCREngine(gpu=False, batch_size=args.batch_size)
+    start = time.perf_counter()
+    engine.warm_up()
+    print(f"  🔸 warm_up() 반환: {(time.perf_counter() - start) * 1000:.1f}ms (로딩은 백그라운드)")
+    reader = engine.get_reader()
+    print(f"  🔸 모델 로딩: {engine.load_ms / 1000:.1f}초")
+
+    image_path = Path(__file__).parent / "test_ocr_image.png"
+    image = np.array(Image.open(image_path).convert("RGB"))
+    images = [image] * args.images
+    start = time.perf_counter()
+    for img in images:
+        reader.readtext(img, detail=0, paragraph=True)
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.readtext_batch(images)
+    batch_time = time.perf_counter() - start
+    print(f"  [{image_path.name} x{args.images}]")
+    print(f"    🔸 한 장씩: {single_time:.2f}초 ({args.images / single_time:.2f} img/sec)")
+    print(f"    🔹 배치:    {batch_time:.2f}초 ({args.images / batch_time:.2f} img/sec, {single_time / batch_time:.2f}배)")
+
+    pdf_bytes = make_synthetic_pdf(args.pages, lines_per_page=30)
+    start = time.perf_counter()
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            reader.readtext(render_page_image(page), detail=0, paragraph=True)
+    single_time = time.perf_counter() - start
+    start = time.perf_counter()
+    records = list(iter_ocr_page_records(pdf_bytes, engine, max_pages=args.pages))
+    batch_time = time.perf_counter() - start
+    print(f"  [합성 PDF {args.pages}페이지]")
+    print(f"    🔸 한 장씩: {single_time:.2f}초 ({args.pages / single_time:.2f} pages/sec)")
+    print(f"    🔹 배치:    {batch_time:.2f}초 ({args.pages / batch_time:.2f} pages/sec, {single_time / batch_time:.2f}배)")
+    for record in records:
+        print(f"      페이지 {record.page}: {record.elapsed_ms:.0f}ms, {len(record.text)}자")
+
+
+def bench_ocr_pool(args):
+    """OCR 워커 풀 1..N 프로세스 확장성 (CPU, pages/sec)"""
+    import os
+
+    from ocr_engine import OCRWorkerPool
+
+    print_header("🧵 OCR 워커 풀 확장성 벤치마크")
+    pdf_bytes = make_synthetic_pdf(args.pages, lines_per_page=30)
+    print(f"  📝 합성 PDF: {args.pages}페이지, CPU 코어 {os.cpu_count()}개")
+
+    baseline = None
+    for workers in args.workers:
+        pool = OCRWorkerPool(workers=workers)
+        # 모델 로딩은 제외하고 측정 (워커 기동 후 첫 페이지 한 장으로 예열)
+        list(pool.iter_page_records(pdf_bytes, max_pages=1))
+        pool.warm_up()
+        start = time.perf_counter()
+        records = list(pool.iter_page_records(pdf_bytes, max_pages=args.pages))
+        elapsed = time.perf_counter() - start
+        pool.close()
+        pages_per_sec = len(records) / elapsed
+        baseline = baseline or pages_per_sec
+        print(
+            f"  🔹 워커 {workers}개 (torch 스레드 {pool.threads_per_worker}개씩): {elapsed:.2f}초, "
+            f"{pages_per_sec:.2f} pages/sec ({pages_per_sec / baseline:.2f}배)"
+        )
+
+
+def bench_ocr_render(args):
+    """2배 RGB 렌더링 + 슬라이싱 vs 적응형 그레이스케일 렌더링 (메모리, 시간/페이지)"""
+    import tracemalloc
+
+    import numpy as np
+
+    from ocr_engine import adaptive_render_scale, render_page_image
+
+    print_header("🖼️ OCR 렌더링 벤치마크")
+
+    def legacy_render(page):
+        # 기존 방식: 2배 RGB(A) 렌더링 후 3채널 슬라이싱 (OCR 입력 시 연속 배열로 다시 복사됨)
+        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
+        img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+        if pix.n == 4:
+            img_array = img_array[:, :, :3]
+        return np.ascontiguousarray(img_array)
+
+    # A4 본문 페이지 + 대형 도면(A1) 페이지
+    doc = fitz.open(stream=make_synthetic_pdf(args.pages, lines_per_page=40), filetype="pdf")
+    for _ in range(max(1, args.pages // 3)):
+        page = doc.new_page(width=1684, height=2384)
+        for line in range(60):
+            page.insert_text((60, 60 + line * 36), f"Drawing note {line + 1}: Capacity 1,200 t/yr", fontsize=18)
+
+    engine = None
+    if args.ocr:
+        from ocr_engine import OCREngine
+        engine = OCREngine()
+        engine.get_reader()
+
+    for label, render in (("2배 RGB", legacy_render), ("적응형 GRAY", render_page_image)):
+        peak_total = pixels = 0
+        render_time = ocr_time = 0.0
+        for page in doc:
+            tracemalloc.start()
+            start = time.perf_counter()
+            image = render(page)
+            render_time += time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peak_total += peak
+            pixels += image.shape[0] * image.shape[1]
+            if engine is not None:
+                start = time.perf_counter()
+                engine.readtext(image)
+                ocr_time += time.perf_counter() - start
+            del image
+        count = len(doc)
+        line = (
+            f"  🔹 {label}: 페이지당 최대 {peak_total / count / 1e6:.1f} MB, "
+            f"{pixels / count / 1e6:.2f} MP, 렌더링 {render_time / count * 1000:.0f}ms"
+        )
+        if engine is not None:
+            line += f", OCR {ocr_time / count:.2f}초"
+        print(line)
+
+    scales = sorted({round(adaptive_render_scale(page), 2) for page in doc})
+    print(f"  📐 적응형 배율: {scales}")
+    doc.close()
+
+
+def bench_local_tables(args):
+    """PyMuPDF 로컬 표 추출 지연시간 (페이지 라우팅 → find_tables)"""
+    import statistics
+
+    from pdf_extraction import ROUTE_TABLE, classify_pages, extract_document, extract_local_tables
+
+    print_header("📊 로컬 표 추출 벤치마크")
+    pdf_bytes = make_synthetic_table_pdf(args.pages)
+    print(f"  📝 합성 재무표 PDF: {args.pages}페이지")
+
+    runs = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        document = extract_document(pdf_bytes, max_pages=args.pages)
+        classifications = classify_pages(pdf_bytes, args.pages, page_texts=[record.text for record in document])
+        table_pages = [c.page for c in classifications if c.route == ROUTE_TABLE]
+        tables = extract_local_tables(pdf_bytes, table_pages)
+        runs.append(time.perf_counter() - start)
+
+    table_count = sum(len(items or []) for items in tables.values())
+    print(f"  🔹 표 페이지 {len(table_pages)}/{args.pages}개, 추출된 표 {table_count}개")
+    print(f"  🔹 텍스트 + 분류 + 표 추출: 중앙값 {statistics.median(runs):.2f}초 ({args.runs}회)")
+    sample = next((items[0] for items in tables.values() if items), None)
+    if sample:
+        print("  📄 첫 표 (Markdown 앞부분):")
+        for line in sample["markdown"].splitlines()[:4]:
+            print(f"     {line}")
+
+
+def bench_ocr_server_concurrency(args):
+    """ocr_server /ocr 동시 클라이언트 수별 처리량 (모의 Upstage 상대)"""
+    import asyncio
+
+    import httpx
+
+    print_header("🌐 OCR 서버 동시성 벤치마크")
+    upstream, server = start_ocr_server_with_mock(args)
+    image_bytes = load_test_image()
+    print(f"  📝 모의 Upstage 지연 {args.latency}초, 클라이언트당 요청 {args.requests}개")
+
+    async def run(concurrency):
+        async with httpx.AsyncClient(timeout=120) as client:
+            async def worker(worker_index):
+                for i in range(args.requests):
+                    response = await client.post(
+                        f"http://127.0.0.1:{args.port}/ocr",
+                        headers={"X-API-Key": "bench-key"},
+                        files={"file": ("test_ocr_image.png", unique_image(image_bytes, worker_index * args.requests + i), "image/png")},
+                    )
+                    response.raise_for_status()
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(i) for i in range(concurrency)))
+            return time.perf_counter() - start
+
+    baseline = None
+    for concurrency in args.concurrency:
+        elapsed = asyncio.run(run(concurrency))
+        throughput = concurrency * args.requests / elapsed
+        baseline = baseline or throughput
+        print(f"  🔹 동시 {concurrency:>2}개: {throughput:6.1f} req/s ({throughput / baseline:.1f}배)")
+
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def bench_ocr_batch(args):
+    """/ocr-batch 동시 처리 (max_in_flight별 배치 지연, 스트리밍 첫 결과 시간)"""
+    import json
+
+    import httpx
+
+    print_header("📦 OCR 배치 동시 처리 벤치마크")
+    upstream, server = start_ocr_server_with_mock(args)
+    image_bytes = load_test_image()
+    files = [("files", (f"page_{i}.png", unique_image(image_bytes, i), "image/png")) for i in range(args.items)]
+    # 손상된 이미지 한 개 - 해당 항목만 실패해야 함
+    files.append(("files", ("broken.png", b"not an image", "image/png")))
+    url = f"http://127.0.0.1:{args.port}/ocr-batch"
+    headers = {"X-API-Key": "bench-key"}
+    print(f"  📝 이미지 {args.items}개 + 손상 파일 1개, 모의 Upstage 지연 {args.latency}초")
+
+    with httpx.Client(timeout=300) as client:
+        for max_in_flight in args.max_in_flight:
+            start = time.perf_counter()
+            response = client.post(url, headers=headers, files=files, params={"max_in_flight": max_in_flight})
+            elapsed = time.perf_counter() - start
+            body = response.json()
+            in_order = [r["index"] for r in body["results"]] == list(range(len(files)))
+            print(
+                f"  🔹 max_in_flight={max_in_flight:>2}: {elapsed:.2f}초, 성공 {body['successful']}/{body['total']}, "
+                f"순서 유지: {'✅' if in_order else '❌'}"
+            )
+
+        start = time.perf_counter()
+        first_at = None
+        lines = 0
+        with client.stream("POST", url, headers=headers, files=files, params={"stream": "true", "max_in_flight": args.max_in_flight[-1]}) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                first_at = first_at or time.perf_counter() - start
+                lines += 1
+                last = json.loads(line)
+        print(
+            f"  🔹 스트리밍: 첫 결과 {first_at:.2f}초, 전체 {time.perf_counter() - start:.2f}초 "
+            f"({lines - 1}개 + 요약 {last.get('summary')})"
+        )
+
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def bench_ocr_cache(args):
+    """ocr_server 결과 캐시 + 동일 요청 합치기 (동시 동일 요청의 upstream 호출 수, 캐시 적중 지연)"""
+    import asyncio
+    import os
+    import tempfile
+
+    import httpx
+
+    print_header("♻️ OCR 결과 캐시 / 동일 요청 합치기 벤치마크")
+    os.environ["OCR_CACHE_ENABLED"] = "true"
+    os.environ["OCR_CACHE_DIR"] = tempfile.mkdtemp(prefix="ocr_cache_bench_")
+    upstream, server = start_ocr_server_with_mock(args)
+    image_bytes = load_test_image()
+    url = f"http://127.0.0.1:{args.port}"
+    headers = {"X-API-Key": "bench-key"}
+    print(f"  📝 동시 동일 요청 {args.clients}개, 모의 Upstage 지연 {args.latency}초")
+
+    async def burst(client, payload):
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(
+            client.post(f"{url}/ocr", headers=headers, files={"file": ("same.png", payload, "image/png")})
+            for _ in range(args.clients)
+        ))
+        for response in responses:
+            response.raise_for_status()
+        return time.perf_counter() - start
+
+    async def run():
+        async with httpx.AsyncClient(timeout=120) as client:
+            calls_before = upstream.config.app.state.mock.calls
+            cold = await burst(client, image_bytes)
+            cold_calls = upstream.config.app.state.mock.calls - calls_before
+            print(f"  🔹 첫 요청 묶음: {cold:.2f}초, upstream 호출 {cold_calls}회 (요청 {args.clients}개)")
+
+            calls_before = upstream.config.app.state.mock.calls
+            warm = await burst(client, image_bytes)
+            warm_calls = upstream.config.app.state.mock.calls - calls_before
+            print(f"  🔹 캐시 적중 묶음: {warm:.2f}초, upstream 호출 {warm_calls}회")
+
+            health = (await client.get(f"{url}/health")).json()
+            cache = health["cache"]
+            print(
+                f"  📊 /health: 적중률 {cache['hit_ratio']:.0%} ({cache['hits']}/{cache['hits'] + cache['misses']}), "
+                f"합쳐진 요청 {health['single_flight']['coalesced']}개, 캐시 {cache['entries']}개 / {cache['bytes']} bytes"
+            )
+
+    asyncio.run(run())
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def bench_ocr_pdf_upload(args):
+    """/ocr-pdf 큰 업로드 부하 테스트 (PDF 크기별 ocr_server 프로세스 최대 메모리)"""
+    import os
+    import subprocess
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from pathlib import Path
+
+    import httpx
+
+    print_header("📤 /ocr-pdf 대용량 업로드 메모리 벤치마크")
+    upstream = serve_in_thread(make_mock_upstage_app(args.latency), args.upstream_port)
+    env = dict(
+        os.environ,
+        UPSTAGE_API_URL=f"http://127.0.0.1:{args.upstream_port}/v1/document-ai/document-parse",
+        UPSTAGE_API_KEY="mock-upstage-key",
+        OCR_API_KEY="bench-key",
+        OCR_CACHE_ENABLED="false",
+    )
+    # 서버를 별도 프로세스로 띄워 서버 메모리만 측정
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "ocr_server:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=Path(__file__).parent,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+
+    def memory_mb(field):
+        with open(f"/proc/{server.pid}/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    try:
+        for _ in range(100):
+            try:
+                httpx.get(f"{url}/health", timeout=1)
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        baseline = memory_mb("VmRSS")
+        print(f"  📝 동시 업로드 {args.clients}개, 서버 시작 직후 RSS {baseline:.0f}MB")
+
+        def upload(path):
+            with open(path, "rb") as f, httpx.Client(timeout=600) as client:
+                response = client.post(
+                    f"{url}/ocr-pdf",
+                    headers={"X-API-Key": "bench-key"},
+                    files={"file": (Path(path).name, f, "application/pdf")},
+                )
+            response.raise_for_status()
+
+        for size_mb in args.sizes:
+            with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+                pdf_file.write(b"%PDF-1.7\n")
+                for _ in range(size_mb):
+                    pdf_file.write(os.urandom(1024 * 1024))
+                pdf_file.flush()
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.clients) as pool:
+                    list(pool.map(upload, [pdf_file.name] * args.clients))
+                elapsed = time.perf_counter() - start
+            print(
+                f"  🔹 {size_mb:>4}MB × {args.clients}: {elapsed:.2f}초, "
+                f"서버 최대 RSS {memory_mb('VmHWM'):.0f}MB (시작 대비 +{memory_mb('VmHWM') - baseline:.0f}MB)"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+        upstream.should_exit = True
+
+
+def bench_ocr_pdf_stream(args):
+    """/ocr-pdf 페이지별 NDJSON 스트리밍 vs 단일 응답 (첫 페이지 수신 시간, 전체 시간)"""
+    import httpx
+
+    from upstage_client import iter_ocr_server_pages, merge_page_stream
+
+    print_header("📨 /ocr-pdf 페이지 스트리밍 벤치마크")
+    upstream, server = start_ocr_server_with_mock(args)
+    pdf_bytes = make_synthetic_pdf(args.pages, lines_per_page=20)
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"  📝 {args.pages}페이지, 모의 Upstage 지연 {args.latency}초 + 페이지당 {args.page_latency}초")
+
+    start = time.perf_counter()
+    response = httpx.post(
+        f"{url}/ocr-pdf",
+        headers={"X-API-Key": "bench-key"},
+        files={"file": ("bench.pdf", pdf_bytes, "application/pdf")},
+        timeout=600,
+    )
+    response.raise_for_status()
+    single = time.perf_counter() - start
+    print(f"  🔹 단일 응답: 첫 페이지 = 전체 {single:.2f}초")
+
+    start = time.perf_counter()
+    first_at = None
+    pages = []
+    for record in iter_ocr_server_pages(url, "bench-key", pdf_bytes, "bench.pdf", window_pages=args.window_pages):
+        if "summary" in record:
+            summary = record["summary"]
+            continue
+        first_at = first_at or time.perf_counter() - start
+        pages.append(record)
+    total = time.perf_counter() - start
+    merged = merge_page_stream(pages)
+    print(
+        f"  🔹 스트리밍 ({args.window_pages}페이지 창): 첫 페이지 {first_at:.2f}초, 전체 {total:.2f}초, "
+        f"{summary['page_count']}페이지 / 요소 {len(merged['elements'])}개 ({summary['status']})"
+    )
+
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def bench_ocr_microbatch(args):
+    """ocr_server 로컬 EasyOCR 엔진: 동시 요청 마이크로 배치 vs 한 장씩 처리 (img/sec)"""
+    import asyncio
+    import io
+    import logging
+
+    from PIL import Image
+
+    import ocr_server
+    from ocr_engine import OCREngine
+
+    logging.getLogger("ocr_server").setLevel(logging.WARNING)
+    print_header("🧺 로컬 OCR 마이크로 배치 벤치마크")
+    engine = OCREngine(gpu=False, batch_size=max(args.max_batch_size))
+    engine.get_reader()
+    print(f"  🔸 모델 로딩: {engine.load_ms / 1000:.1f}초")
+
+    # 크기가 조금씩 다른 이미지 (업로드마다 크기가 다른 상황)
+    base = Image.open(io.BytesIO(load_test_image()))
+    uploads = []
+    for i in range(args.requests):
+        buffer = io.BytesIO()
+        base.crop((0, 0, base.width - (i % 4) * 7, base.height - (i % 3) * 5)).save(buffer, format="PNG")
+        uploads.append(buffer.getvalue())
+    print(f"  📝 동시 요청 {args.requests}개 ({base.width}x{base.height} 전후), 최대 대기 {args.max_wait_ms}ms")
+
+    async def run(max_batch_size):
+        backend = ocr_server.EasyOCRBackend(max_batch_size=max_batch_size, max_wait_ms=args.max_wait_ms, engine=engine)
+        await backend.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(backend.recognize(f"img_{i}.png", data) for i, data in enumerate(uploads)))
+        elapsed = time.perf_counter() - start
+        stats = backend.batcher.stats()
+        await backend.close()
+        return elapsed, stats
+
+    baseline = None
+    for max_batch_size in args.max_batch_size:
+        elapsed, stats = asyncio.run(run(max_batch_size))
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput
+        label = "한 장씩" if max_batch_size == 1 else f"배치 ≤{max_batch_size}"
+        print(
+            f"  🔹 {label:>7}: {throughput:6.2f} img/sec ({throughput / baseline:.2f}배), "
+            f"배치 {stats['batches']}회, 평균 {stats['avg_batch_size']}장"
+        )
+
+
+def bench_metrics_overhead(args):
+    """ocr_server 메트릭 미들웨어 오버헤드 (요청당 µs, 관측 1회 ns)"""
+    import asyncio
+    import logging
+
+    import httpx
+    from fastapi import FastAPI
+
+    import ocr_server
+    from metrics import Histogram
+
+    logging.getLogger("ocr_server").setLevel(logging.WARNING)
+    print_header("📊 메트릭 기록 오버헤드 벤치마크")
+
+    histogram = Histogram("bench_seconds", "bench", ("endpoint",))
+    start = time.perf_counter()
+    for i in range(args.observations):
+        histogram.observe(i % 100 / 1000, endpoint="/ocr")
+    per_observe_ns = (time.perf_counter() - start) / args.observations * 1e9
+    print(f"  🔸 Histogram.observe: {per_observe_ns:.0f}ns/회")
+
+    def make_app(with_metrics):
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping():
+            return {"ok": True}
+
+        if with_metrics:
+            app.add_middleware(ocr_server.MetricsMiddleware)
+        return app
+
+    async def run(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for _ in range(50):
+                await client.get("/ping")
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                await client.get("/ping")
+            return (time.perf_counter() - start) / args.requests * 1e6
+
+    plain_us = min(asyncio.run(run(make_app(False))) for _ in range(3))
+    metered_us = min(asyncio.run(run(make_app(True))) for _ in range(3))
+    print(f"  🔸 미들웨어 없음: {plain_us:.0f}µs/요청")
+    print(f"  🔹 미들웨어 있음: {metered_us:.0f}µs/요청 (+{metered_us - plain_us:.0f}µs)")
+    render_start = time.perf_counter()
+    body = ocr_server.metrics.render()
+    print(f"  🔸 /metrics 렌더링: {(time.perf_counter() - render_start) * 1000:.2f}ms ({len(body)} bytes)")
+
+
+def bench_resilience(args):
+    """장애 주입 모의 Upstage 상대로 재시도 / Retry-After / 동시 호출 제한 / 서킷 브레이커 확인"""
+    import asyncio
+    import logging
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+
+    import httpx
+
+    print_header("🛡️ upstream 보호 계층 벤치마크 (장애 주입)")
+    # 짧은 백오프/리셋으로 빠르게 확인 (모듈 import 전에 설정)
+    os.environ.setdefault("UPSTREAM_BACKOFF_BASE", "0.05")
+    os.environ.setdefault("UPSTREAM_BREAKER_THRESHOLD", "3")
+    os.environ.setdefault("UPSTREAM_BREAKER_RESET", "1")
+    os.environ.setdefault("UPSTREAM_HOST_CONCURRENCY", "4")
+    mock_app = make_mock_upstage_app(args.latency)
+    upstream = serve_in_thread(mock_app, args.upstream_port)
+    os.environ["UPSTAGE_DIGITIZATION_URL"] = f"http://127.0.0.1:{args.upstream_port}/v1/document-digitization"
+    os.environ["UPSTAGE_API_URL"] = f"http://127.0.0.1:{args.upstream_port}/v1/document-ai/document-parse"
+    os.environ["OCR_API_KEY"] = "bench-key"
+    os.environ.setdefault("UPSTAGE_API_KEY", "mock-upstage-key")
+    os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+
+    import ocr_server
+    from upstage_client import post_document
+
+    for name in ("ocr_server", "httpx"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+    guard = ocr_server.get_upstream_guard(os.environ["UPSTAGE_API_URL"])
+    pdf_bytes = make_synthetic_pdf(1, lines_per_page=5)
+
+    def scenario(title, plan, run):
+        mock_app.state.mock.configure(plan=plan)
+        mock_app.state.mock.reset_stats()
+        start = time.perf_counter()
+        try:
+            outcome = run()
+        except Exception as e:
+            outcome = f"{type(e).__name__}: {str(e)[:60]}"
+        elapsed = time.perf_counter() - start
+        print(
+            f"  🔹 {title}: {outcome} | {elapsed:.2f}초, upstream 호출 {mock_app.state.mock.calls}회, "
+            f"최대 동시 {mock_app.state.mock.max_concurrent}, 서킷 {guard.breaker.state}"
+        )
+
+    def sync_call():
+        post_document(pdf_bytes, "bench.pdf", "mock-upstage-key", timeout=10)
+        return "성공"
+
+    # 서킷은 재시도를 다 쓴 호출 단위로 실패를 셈 → threshold건 연속 실패해야 열림
+    threshold = int(os.environ["UPSTREAM_BREAKER_THRESHOLD"])
+
+    def repeat(run, times):
+        """같은 호출 times번 (마지막 결과 반환)"""
+        def calls():
+            for _ in range(times - 1):
+                try:
+                    run()
+                except Exception:
+                    pass
+            return run()
+        return calls
+
+    print("  [upstage_client.post_document (동기 requests)]")
+    scenario("503 두 번 후 성공", [503, 503], sync_call)
+    scenario(f"429 + Retry-After {args.retry_after}초", [(429, args.retry_after)], sync_call)
+    scenario(f"계속 503 ({threshold}건 × 시도 3회 후 실패)", [503] * 10, repeat(sync_call, threshold))
+    scenario("서킷 열림 → 바로 실패", [], sync_call)
+    time.sleep(float(os.environ["UPSTREAM_BREAKER_RESET"]) + 0.1)
+    scenario("리셋 시간 후 시험 호출 성공 → 닫힘", [], sync_call)
+
+    def concurrent_calls():
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            list(pool.map(lambda _: sync_call(), range(args.clients)))
+        return f"{args.clients}건 성공"
+
+    scenario(f"동시 {args.clients}건 (호스트 상한 {guard.max_concurrency})", [], concurrent_calls)
+
+    print("  [ocr_server /ocr (비동기 httpx)]")
+    server = serve_in_thread(ocr_server.app, args.port)
+    image_bytes = load_test_image()
+
+    def http_call():
+        response = httpx.post(
+            f"http://127.0.0.1:{args.port}/ocr",
+            headers={"X-API-Key": "bench-key"},
+            files={"file": ("test.png", image_bytes, "image/png")},
+            timeout=30,
+        )
+        retry_after = response.headers.get("Retry-After")
+        return f"HTTP {response.status_code}" + (f" (Retry-After {retry_after})" if retry_after else "")
+
+    scenario("502 한 번 후 성공", [502], http_call)
+    scenario(f"계속 503 ({threshold}건)", [503] * 10, repeat(http_call, threshold))
+    scenario("서킷 열림 → 503 바로 반환", [], http_call)
+
+    async def concurrent_http():
+        async with httpx.AsyncClient(timeout=30) as client:
+            responses = await asyncio.gather(*(
+                client.post(
+                    f"http://127.0.0.1:{args.port}/ocr",
+                    headers={"X-API-Key": "bench-key"},
+                    files={"file": (f"{i}.png", unique_image(image_bytes, i), "image/png")},
+                )
+                for i in range(args.clients)
+            ))
+        return f"{sum(r.status_code == 200 for r in responses)}/{args.clients}건 성공"
+
+    time.sleep(float(os.environ["UPSTREAM_BREAKER_RESET"]) + 0.1)
+    scenario("리셋 시간 후 시험 호출 성공 → 닫힘", [], http_call)
+    scenario(f"동시 {args.clients}건 (호스트 상한 {guard.max_concurrency})", [], lambda: asyncio.run(concurrent_http()))
+    metrics_text = httpx.get(f"http://127.0.0.1:{args.port}/metrics").text
+    retries = [line for line in metrics_text.splitlines() if line.startswith(("ocr_upstream_retries_total", "ocr_upstream_rejected_total"))]
+    print(f"  📊 {' / '.join(retries)}")
+
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def bench_image_passthrough(args):
+    """ocr_server 이미지 준비: PIL 디코딩/RGB/PNG 재인코딩 vs 헤더 판별 후 원본 전달 (CPU/메가픽셀)"""
+    import asyncio
+    import io
+    import logging
+
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    import ocr_server
+
+    logging.getLogger("ocr_server").setLevel(logging.WARNING)
+    print_header("🖼️ 이미지 원본 전달 벤치마크")
+
+    # 스캔 문서 흉내: 흰 배경 + 텍스트 줄
+    image = Image.new("RGB", (args.width, args.height), "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(40, args.height - 40, 40):
+        draw.text((40, y), f"Line {y // 40}: Revenue 294, Operating profit 43, Net income 24 " * 3, fill="black")
+    megapixels = args.width * args.height / 1e6
+
+    def legacy_prepare(contents):
+        # 기존 /ocr: 디코딩 → RGB → NumPy 배열(로그용) → PNG 재인코딩
+        img = Image.open(io.BytesIO(contents))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        np.array(img)
+        out = io.BytesIO()
+        img.save(out, format="PNG")
+        return out.getvalue()
+
+    for fmt in ("PNG", "JPEG", "WEBP"):
+        buffer = io.BytesIO()
+        image.save(buffer, format=fmt)
+        contents = buffer.getvalue()
+
+        start = time.process_time()
+        for _ in range(args.rounds):
+            legacy_prepare(contents)
+        legacy_cpu = (time.process_time() - start) / args.rounds
+
+        start = time.process_time()
+        for _ in range(args.rounds):
+            _, prepared, content_type = asyncio.run(ocr_server.prepare_upload(f"scan.{fmt.lower()}", contents))
+        new_cpu = (time.process_time() - start) / args.rounds
+        mode = "원본 전달" if prepared is contents else "PNG 변환"
+        print(
+            f"  🔹 {fmt:<4} ({len(contents) / 1e6:.1f} MB, {megapixels:.1f} MP): "
+            f"기존 {legacy_cpu / megapixels * 1000:.1f}ms/MP → {new_cpu / megapixels * 1000:.2f}ms/MP CPU ({mode}, {content_type})"
+        )
+
+
+def bench_ocr_response_encoding(args):
+    """/ocr-pdf 응답 크기 / 서버 CPU: 직렬화(json vs orjson) x 압축(identity/gzip/br) x 표현 선택(formats, elements)"""
+    import json
+
+    import httpx
+    from fastapi.encoders import jsonable_encoder
+
+    print_header("🗜️ /ocr-pdf 응답 직렬화 / 압축 벤치마크")
+    upstream, server = start_ocr_server_with_mock(args)
+    import ocr_server
+
+    pdf_bytes = make_synthetic_pdf(args.pages, lines_per_page=60)
+    url = f"http://127.0.0.1:{args.port}/ocr-pdf"
+    encodings = ["identity", *reversed(ocr_server.SUPPORTED_ENCODINGS)]
+    print(f"  📝 {args.pages}페이지, 직렬화 {ocr_server.JSON_SERIALIZER}, 압축 {', '.join(encodings[1:])}")
+
+    def cpu_seconds():
+        histograms = (ocr_server.RESPONSE_SERIALIZE_SECONDS, ocr_server.RESPONSE_COMPRESS_SECONDS)
+        return sum(series[-1] for h in histograms for series in list(h._series.values()))
+
+    def fetch(params, encoding):
+        """(전송 바이트, 풀린 본문, 서버 CPU 초, 전체 시간)"""
+        cpu_before = cpu_seconds()
+        start = time.perf_counter()
+        with httpx.Client(timeout=600) as client:
+            with client.stream(
+                "POST", url, params=params,
+                headers={"X-API-Key": "bench-key", "Accept-Encoding": encoding},
+                files={"file": ("bench.pdf", pdf_bytes, "application/pdf")},
+            ) as response:
+                response.raise_for_status()
+                body = response.read()
+                wire = response.num_bytes_downloaded
+        return wire, body, cpu_seconds() - cpu_before, time.perf_counter() - start
+
+    def baseline_cpu(body, stream):
+        """변경 전 방식(jsonable_encoder + json.dumps, NDJSON은 줄마다 json.dumps)의 직렬화 CPU"""
+        if stream:
+            records = [json.loads(line) for line in body.splitlines() if line]
+            start = time.thread_time()
+            for record in records:
+                json.dumps(record, ensure_ascii=False)
+        else:
+            payload = json.loads(body)
+            start = time.thread_time()
+            json.dumps(jsonable_encoder(payload), ensure_ascii=False)
+        return time.thread_time() - start
+
+    variants = [("전체", {}), ("formats=text", {"formats": "text"}),
+                ("formats=text, elements=false", {"formats": "text", "elements": "false"})]
+    for stream in (False, True):
+        print(f"\n  [{'stream=true (NDJSON)' if stream else '단일 응답'}]")
+        base_params = {"stream": "true"} if stream else {}
+        baseline_bytes = None
+        for label, params in variants:
+            if not stream and "elements" in params:
+                continue
+            for encoding in encodings:
+                # 첫 요청은 워밍업 (import / 연결), 이후 반복 평균
+                fetch(base_params | params, encoding)
+                results = [fetch(base_params | params, encoding) for _ in range(args.rounds)]
+                wire = results[-1][0]
+                cpu_ms = sum(r[2] for r in results) / len(results) * 1000
+                elapsed = sum(r[3] for r in results) / len(results)
+                if baseline_bytes is None:
+                    baseline_bytes = wire
+                    before_ms = baseline_cpu(results[-1][1], stream) * 1000
+                    print(f"  🔸 변경 전 직렬화(json + jsonable_encoder): {before_ms:.1f}ms, {wire / 1024:,.0f}KB 비압축")
+                print(
+                    f"  🔹 {label:<30} {encoding:<9} {wire / 1024:>9,.1f}KB ({wire / baseline_bytes:>6.1%}) | "
+                    f"서버 CPU {cpu_ms:>6.1f}ms | 응답 {elapsed:.2f}초"
+                )
+
+    server.should_exit = True
+    upstream.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 파이프라인 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("parallel-extract", help=bench_parallel_extract.__doc__)
+    p.add_argument("--pages", type=int, default=240)
+    p.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    p.set_defaults(func=bench_parallel_extract)
+
+    p = subparsers.add_parser("document-buffer", help=bench_document_buffer.__doc__)
+    p.add_argument("--pages", type=int, default=400)
+    p.add_argument("--stages", type=int, default=4)
+    p.add_argument("--spill-mb", type=int, default=1)
+    p.set_defaults(func=bench_document_buffer)
+
+    p = subparsers.add_parser("response-stream", help=bench_response_stream.__doc__)
+    p.add_argument("--elements", type=int, default=2000)
+    p.add_argument("--asset-kb", type=int, default=64)
+    p.set_defaults(func=bench_response_stream)
+
+    p = subparsers.add_parser("document-model", help=bench_document_model.__doc__)
+    p.add_argument("--elements", type=int, default=300)
+    p.set_defaults(func=bench_document_model)
+
+    p = subparsers.add_parser("easyocr", help=bench_easyocr.__doc__)
+    p.add_argument("--pages", type=int, default=8)
+    p.add_argument("--images", type=int, default=8)
+    p.add_argument("--batch-size", type=int, default=4)
+    p.set_defaults(func=bench_easyocr)
+
+    p = subparsers.add_parser("ocr-pool", help=bench_ocr_pool.__doc__)
+    p.add_argument("--pages", type=int, default=16)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.set_defaults(func=bench_ocr_pool)
+
+    p = subparsers.add_parser("ocr-render", help=bench_ocr_render.__doc__)
+    p.add_argument("--pages", type=int, default=6)
+    p.add_argument("--ocr", action="store_true", help="EasyOCR 인식 시간도 측정")
+    p.set_defaults(func=bench_ocr_render)
+
+    p = subparsers.add_parser("local-tables", help=bench_local_tables.__doc__)
+    p.add_argument("--pages", type=int, default=40)
+    p.add_argument("--runs", type=int, default=3)
+    p.set_defaults(func=bench_local_tables)
+
+    p = subparsers.add_parser("ocr-server-concurrency", help=bench_ocr_server_concurrency.__doc__)
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--requests", type=int, default=5)
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_server_concurrency)
+
+    p = subparsers.add_parser("ocr-batch", help=bench_ocr_batch.__doc__)
+    p.add_argument("--items", type=int, default=16)
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--max-in-flight", type=int, nargs="+", default=[1, 8])
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_batch)
+
+    p = subparsers.add_parser("ocr-cache", help=bench_ocr_cache.__doc__)
+    p.add_argument("--clients", type=int, default=16)
+    p.add_argument("--latency", type=float, default=0.5)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_cache)
+
+    p = subparsers.add_parser("ocr-pdf-upload", help=bench_ocr_pdf_upload.__doc__)
+    p.add_argument("--sizes", type=int, nargs="+", default=[8, 32, 128], help="PDF 크기 (MB)")
+    p.add_argument("--clients", type=int, default=4)
+    p.add_argument("--latency", type=float, default=0.1)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_pdf_upload)
+
+    p = subparsers.add_parser("ocr-pdf-stream", help=bench_ocr_pdf_stream.__doc__)
+    p.add_argument("--pages", type=int, default=40)
+    p.add_argument("--window-pages", type=int, default=5)
+    p.add_argument("--latency", type=float, default=0.2)
+    p.add_argument("--page-latency", type=float, default=0.05)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_pdf_stream)
+
+    p = subparsers.add_parser("ocr-microbatch", help=bench_ocr_microbatch.__doc__)
+    p.add_argument("--requests", type=int, default=32)
+    p.add_argument("--max-batch-size", type=int, nargs="+", default=[1, 4, 8])
+    p.add_argument("--max-wait-ms", type=float, default=20)
+    p.set_defaults(func=bench_ocr_microbatch)
+
+    p = subparsers.add_parser("metrics-overhead", help=bench_metrics_overhead.__doc__)
+    p.add_argument("--requests", type=int, default=2000)
+    p.add_argument("--observations", type=int, default=200000)
+    p.set_defaults(func=bench_metrics_overhead)
+
+    p = subparsers.add_parser("resilience", help=bench_resilience.__doc__)
+    p.add_argument("--clients", type=int, default=12)
+    p.add_argument("--latency", type=float, default=0.05)
+    p.add_argument("--retry-after", type=int, default=1)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_resilience)
+
+    p = subparsers.add_parser("image-passthrough", help=bench_image_passthrough.__doc__)
+    p.add_argument("--width", type=int, default=2480)
+    p.add_argument("--height", type=int, default=3508)
+    p.add_argument("--rounds", type=int, default=3)
+    p.set_defaults(func=bench_image_passthrough)
+
+    p = subparsers.add_parser("ocr-response-encoding", help=bench_ocr_response_encoding.__doc__)
+    p.add_argument("--pages", type=int, default=40)
+    p.add_argument("--rounds", type=int, default=3)
+    p.add_argument("--latency", type=float, default=0.01)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--upstream-port", type=int, default=8766)
+    p.set_defaults(func=bench_ocr_response_encoding)
+
+    args = parser.parse_args()
+    args.func(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+🗂️ 업로드 PDF 공유 버퍼
+업로드 파일을 한 번만 읽어 모든 단계(텍스트 추출, Upstage, EasyOCR, Storage 저장)가
+같은 버퍼의 memoryview를 공유하도록 하는 문서 핸들
+- 이미 메모리에 있는 업로드(Streamlit UploadedFile 등)는 복사 없이 bytes를 그대로 참조
+- 스트림에서 읽어야 하는 큰 파일은 임시 파일로 내려 쓰고 mmap으로 매핑
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+
+# 이 크기를 넘는 스트림은 메모리 대신 mmap 임시 파일에 보관
+DEFAULT_SPILL_THRESHOLD = int(os.getenv("PDF_SPILL_THRESHOLD_MB", "32")) * 1024 * 1024
+
+# 스트림 복사 단위
+_COPY_CHUNK = 1024 * 1024
+
+
+class PDFDocumentHandle:
+    """PDF 바이트 한 벌을 여러 단계가 공유하기 위한 핸들"""
+
+    def __init__(self, data, name="document.pdf"):
+        """data: bytes / bytearray / memoryview (복사하지 않고 참조)"""
+        self.name = name
+        self.path = None  # mmap 임시 파일 경로 (스필된 경우)
+        self._mmap = None
+        self._file = None
+        self._view = memoryview(data).cast("B")
+        self._sha256 = None
+
+    @classmethod
+    def from_upload(cls, uploaded_file, spill_threshold=DEFAULT_SPILL_THRESHOLD):
+        """업로드 파일(또는 파일 객체)에서 핸들 생성 - 파일을 한 번만 읽음"""
+        if isinstance(uploaded_file, cls):
+            return uploaded_file
+
+        name = getattr(uploaded_file, "name", "document.pdf")
+
+        # BytesIO 계열: getvalue()는 내부 bytes 객체를 복사 없이 돌려줌
+        # (getbuffer()는 공유 중인 버퍼를 분리하느라 오히려 전체 복사가 일어남)
+        if isinstance(uploaded_file, io.BytesIO):
+            return cls(uploaded_file.getvalue(), name=name)
+
+        uploaded_file.seek(0)
+        size = _stream_size(uploaded_file)
+        if size is not None and size <= spill_threshold:
+            return cls(uploaded_file.read(), name=name)
+
+        handle = cls(b"", name=name)
+        handle._spill(uploaded_file)
+        return handle
+
+    def _spill(self, stream):
+        """스트림을 임시 파일로 복사 후 읽기 전용 mmap"""
+        fd, path = tempfile.mkstemp(prefix="pdf_", suffix=".pdf")
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(_COPY_CHUNK)
+                if not chunk:
+                    break
+                out.write(chunk)
+        self.path = path
+        self._file = open(path, "rb")
+        if os.path.getsize(path) == 0:
+            self._view = memoryview(b"")
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    @property
+    def size(self):
+        return self._view.nbytes
+
+    @property
+    def is_spilled(self):
+        return self._mmap is not None
+
+    def view(self):
+        """공유 버퍼의 memoryview (복사 없음)"""
+        return self._view
+
+    @property
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self._view).hexdigest()
+        return self._sha256
+
+    def tobytes(self):
+        """bytes가 꼭 필요한 API용 복사본 (가능하면 view() 사용)"""
+        return self._view.tobytes()
+
+    def close(self):
+        """mmap/임시 파일 정리 (파생 memoryview가 남아 있으면 GC에 맡김)"""
+        try:
+            self._view.release()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+        except BufferError:
+            return
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _stream_size(stream):
+    """남은 스트림 크기 (알 수 없으면 None)"""
+    size = getattr(stream, "size", None)
+    if isinstance(size, int):
+        return size
+    try:
+        current = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        end = stream.tell()
+        stream.seek(current)
+        return end - current
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def as_document_handle(pdf_file):
+    """파일 객체 또는 핸들을 PDFDocumentHandle로 변환"""
+    return PDFDocumentHandle.from_upload(pdf_file)
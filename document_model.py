@@ -0,0 +1,261 @@
+"""
+🧱 구조화 문서 모델 (Upstage Parse 결과)
+표/차트/제목/리스트/단락 요소를 __slots__ 객체로 보관하고 페이지·종류별 인덱스를 유지
+- 페이지별 표 조회 O(1), 제목 아웃라인(섹션) 탐색
+- 저장 형식은 기존 structured_elements dict 그대로 (to_dict / from_dict)
+- 기존 코드의 structured_data.get("tables", []) / table.get("page") 호출과 호환
+"""
+
+import re
+from bisect import bisect_right
+
+# 요소 종류 (structured_elements의 키와 동일)
+KIND_TABLE = "tables"
+KIND_CHART = "charts"
+KIND_HEADING = "headings"
+KIND_PARAGRAPH = "paragraphs"
+KIND_LIST = "lists"
+KINDS = (KIND_TABLE, KIND_CHART, KIND_HEADING, KIND_PARAGRAPH, KIND_LIST)
+
+# 종류별 저장 필드 (기존 structured_elements 항목 형식)
+_FIELDS_BY_KIND = {
+    KIND_TABLE: ("page", "content", "html", "markdown"),
+    KIND_CHART: ("page", "content", "html", "markdown", "category"),
+    KIND_HEADING: ("page", "content", "category"),
+    KIND_PARAGRAPH: ("page", "content"),
+    KIND_LIST: ("page", "content"),
+}
+
+# 카테고리 → 종류 판정 규칙 (앞에서부터 먼저 일치하는 규칙 적용)
+_CATEGORY_RULES = (
+    (("table",), KIND_TABLE),
+    (("figure", "chart", "image"), KIND_CHART),
+    (("heading", "title"), KIND_HEADING),
+    (("list",), KIND_LIST),
+    (("paragraph",), KIND_PARAGRAPH),
+)
+
+# 카테고리 문자열은 종류가 몇 가지뿐이므로 판정 결과를 캐시
+_kind_cache = {}
+
+_HEADING_LEVEL = re.compile(r"(\d+)")
+
+
+def category_kind(category):
+    """Upstage 요소 카테고리 → 요소 종류 (해당 없으면 None)"""
+    try:
+        return _kind_cache[category]
+    except KeyError:
+        pass
+    lowered = (category or "").lower()
+    kind = None
+    for keywords, rule_kind in _CATEGORY_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            kind = rule_kind
+            break
+    _kind_cache[category] = kind
+    return kind
+
+
+def heading_level(category):
+    """제목 수준 (title=0, heading1=1, heading2=2 ...)"""
+    lowered = (category or "").lower()
+    if "title" in lowered:
+        return 0
+    match = _HEADING_LEVEL.search(lowered)
+    return int(match.group(1)) if match else 1
+
+
+class StructuredElement:
+    """구조화 요소 하나 - dict 대신 __slots__로 요소당 메모리 절감"""
+
+    __slots__ = ("kind", "page", "content", "html", "markdown", "category")
+
+    def __init__(self, kind, page=0, content="", html="", markdown="", category=""):
+        self.kind = kind
+        self.page = page
+        self.content = content
+        self.html = html
+        self.markdown = markdown
+        self.category = category
+
+    @classmethod
+    def from_upstage(cls, element):
+        """Upstage elements 항목에서 생성 (해당 종류가 아니면 None)"""
+        category = element.get("category", "")
+        kind = category_kind(category)
+        if kind is None:
+            return None
+
+        elem_content = element.get("content", {})
+        if isinstance(elem_content, dict):
+            html = elem_content.get("html", "")
+            text = elem_content.get("text", "")
+            markdown = elem_content.get("markdown", "")
+        else:
+            html, text, markdown = "", str(elem_content), ""
+
+        if kind in (KIND_TABLE, KIND_CHART):
+            return cls(kind, element.get("page", 0), text or html or markdown, html, markdown, category)
+        # 제목/리스트/단락은 본문만 보관 (기존 형식과 동일)
+        return cls(kind, element.get("page", 0), text or html, category=category)
+
+    @classmethod
+    def from_dict(cls, kind, data):
+        return cls(
+            kind,
+            data.get("page", 0),
+            data.get("content", ""),
+            data.get("html", ""),
+            data.get("markdown", ""),
+            data.get("category", ""),
+        )
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in _FIELDS_BY_KIND[self.kind]}
+
+    @property
+    def level(self):
+        return heading_level(self.category) if self.kind == KIND_HEADING else None
+
+    # 기존 dict 기반 코드 호환 (table.get("page"), heading["content"])
+    def get(self, key, default=None):
+        if key in _FIELDS_BY_KIND[self.kind]:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in _FIELDS_BY_KIND[self.kind]:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __repr__(self):
+        return f"StructuredElement({self.kind!r}, page={self.page}, content={self.content[:30]!r})"
+
+
+class StructuredDocument:
+    """구조화 요소 묶음 + 종류별/페이지별 인덱스"""
+
+    __slots__ = ("_by_kind", "_by_page", "_tables_by_page", "_heading_pages")
+
+    def __init__(self, elements=()):
+        self._by_kind = {kind: [] for kind in KINDS}
+        for element in elements:
+            self._by_kind[element.kind].append(element)
+        self._reindex()
+
+    @classmethod
+    def from_upstage_elements(cls, elements_list):
+        """Upstage 응답의 elements 배열에서 생성 (관심 없는 카테고리는 제외)"""
+        elements = (StructuredElement.from_upstage(element) for element in elements_list)
+        return cls(element for element in elements if element is not None)
+
+    @classmethod
+    def from_dict(cls, data):
+        """저장된 structured_elements dict에서 복원 (이미 모델이면 그대로)"""
+        if data is None or isinstance(data, cls):
+            return data
+        return cls(
+            StructuredElement.from_dict(kind, item)
+            for kind in KINDS
+            for item in data.get(kind) or []
+            if isinstance(item, dict)
+        )
+
+    def to_dict(self):
+        """기존 structured_elements 형식 (JSON 저장용)"""
+        return {kind: [element.to_dict() for element in items] for kind, items in self._by_kind.items()}
+
+    def _reindex(self):
+        self._by_page = {}
+        self._tables_by_page = {}
+        for kind in KINDS:
+            for element in self._by_kind[kind]:
+                self._by_page.setdefault(element.page, []).append(element)
+                if kind == KIND_TABLE:
+                    self._tables_by_page.setdefault(element.page, []).append(element)
+        # 섹션 탐색(bisect)용 - 페이지 순 정렬 (같은 페이지 안에서는 문서 순서 유지)
+        self._by_kind[KIND_HEADING].sort(key=lambda heading: heading.page)
+        self._heading_pages = [heading.page for heading in self._by_kind[KIND_HEADING]]
+
+    def add(self, element):
+        self._by_kind[element.kind].append(element)
+        self._by_page.setdefault(element.page, []).append(element)
+        if element.kind == KIND_TABLE:
+            self._tables_by_page.setdefault(element.page, []).append(element)
+        elif element.kind == KIND_HEADING:
+            self._reindex()
+
+    def remap_pages(self, page_map):
+        """부분 PDF 기준 페이지 번호 → 원본 페이지 번호 (page_map[i] = i+1번째 페이지의 원본 번호)"""
+        for items in self._by_kind.values():
+            for element in items:
+                if isinstance(element.page, int) and 1 <= element.page <= len(page_map):
+                    element.page = page_map[element.page - 1]
+        self._reindex()
+        return self
+
+    # 조회
+    def tables_on_page(self, page):
+        return self._tables_by_page.get(page, [])
+
+    def tables_in_page_order(self):
+        """페이지 순 표 목록 (같은 페이지 안에서는 문서 순서)"""
+        return [table for page in sorted(self._tables_by_page) for table in self._tables_by_page[page]]
+
+    def elements_on_page(self, page):
+        return self._by_page.get(page, [])
+
+    @property
+    def pages(self):
+        return sorted(self._by_page)
+
+    def counts(self):
+        return {kind: len(items) for kind, items in self._by_kind.items()}
+
+    def outline(self):
+        """제목 아웃라인 [(수준, 페이지, 제목)] (문서 순서)"""
+        return [(heading.level, heading.page, heading.content) for heading in self._by_kind[KIND_HEADING]]
+
+    def section_for_page(self, page):
+        """해당 페이지가 속한 섹션 (그 페이지 이전의 마지막 제목, 없으면 None)"""
+        index = bisect_right(self._heading_pages, page)
+        return self._by_kind[KIND_HEADING][index - 1] if index else None
+
+    def reconstruct_text(self, max_paragraphs=50):
+        """원문 텍스트가 없을 때 표 + 단락으로 텍스트 재구성"""
+        parts = [f"\n{table.content}\n" for table in self._by_kind[KIND_TABLE]]
+        parts.extend(f"{para.content}\n" for para in self._by_kind[KIND_PARAGRAPH][:max_paragraphs])
+        return "".join(parts)
+
+    # 기존 dict 기반 코드 호환 (structured_data.get("tables", []))
+    def get(self, kind, default=None):
+        return self._by_kind.get(kind, default)
+
+    def __getitem__(self, kind):
+        return self._by_kind[kind]
+
+    def __contains__(self, kind):
+        return kind in self._by_kind
+
+    def keys(self):
+        return self._by_kind.keys()
+
+    def values(self):
+        return self._by_kind.values()
+
+    def items(self):
+        return self._by_kind.items()
+
+    def __len__(self):
+        return sum(len(items) for items in self._by_kind.values())
+
+    def __repr__(self):
+        return f"StructuredDocument({self.counts()})"
+
+
+def structured_to_dict(structured):
+    """모델/dict/None 모두 JSON 저장 가능한 dict로 변환"""
+    if isinstance(structured, StructuredDocument):
+        return structured.to_dict()
+    return structured
@@ -0,0 +1,157 @@
+"""
+♻️ PDF 추출 결과 캐시 (콘텐츠 주소 기반)
+같은 PDF를 다시 올리면 Upstage/EasyOCR 호출 없이 이전 결과 재사용
+- 키: SHA-256(PDF 바이트) + 추출 모드
+- 로컬 디스크 저장 (용량 초과 시 LRU 삭제)
+- 선택적으로 Supabase extraction_cache 테이블에 미러링
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from pdf_extraction import ExtractedDocument
+
+# 기본 저장 위치 / 용량 (환경변수로 변경 가능)
+DEFAULT_CACHE_DIR = Path(__file__).parent / ".extraction_cache"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024  # 500MB
+
+# Supabase 미러 테이블 (extraction_cache_setup.sql)
+SUPABASE_TABLE = "extraction_cache"
+
+
+def make_cache_key(pdf_bytes, mode, max_pages=50, pages=None):
+    """PDF 내용 + 추출 모드로 캐시 키 생성 (pages: 원본 중 일부 페이지만 처리할 때 페이지 목록)"""
+    digest = hashlib.sha256(pdf_bytes).hexdigest()
+    key = f"{digest}-{mode}-p{max_pages}"
+    if pages is not None:
+        page_digest = hashlib.sha256(",".join(map(str, pages)).encode()).hexdigest()[:16]
+        key += f"-pg{page_digest}"
+    return key
+
+
+class ExtractionCache:
+    """추출 결과(텍스트 레코드 + structured_elements) 디스크 캐시"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, supabase_client=None):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.supabase_client = supabase_client
+        self._lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        """캐시 조회 - (ExtractedDocument, structured_elements) 또는 None"""
+        payload = self._get_local(key)
+        if payload is None and self.supabase_client:
+            payload = self._get_remote(key)
+            if payload is not None:
+                # 다른 서버에서 만든 결과도 로컬에 받아 두기
+                self._put_local(key, payload)
+        if payload is None:
+            return None
+        return ExtractedDocument.from_dict(payload["document"]), payload.get("structured_elements")
+
+    def put(self, key, document, structured_elements=None):
+        """추출 결과 저장 (로컬 + 선택적 Supabase 미러)"""
+        payload = {
+            "key": key,
+            "created_at": time.time(),
+            "document": document.to_dict(),
+            "structured_elements": structured_elements,
+        }
+        self._put_local(key, payload)
+        if self.supabase_client:
+            self._put_remote(key, payload)
+
+    def _get_local(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 최근 사용 시각 갱신 (LRU 기준)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return payload
+
+    def _put_local(self, key, payload):
+        path = self._path(key)
+        tmp_path = path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def _evict(self):
+        """총 용량이 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 삭제"""
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def _get_remote(self, key):
+        try:
+            response = self.supabase_client.table(SUPABASE_TABLE).select("payload").eq("cache_key", key).limit(1).execute()
+            if response.data:
+                return response.data[0]["payload"]
+        except Exception as e:
+            print(f"⚠️ 캐시 원격 조회 실패: {e}")
+        return None
+
+    def _put_remote(self, key, payload):
+        try:
+            self.supabase_client.table(SUPABASE_TABLE).upsert({
+                "cache_key": key,
+                "payload": payload,
+            }).execute()
+        except Exception as e:
+            print(f"⚠️ 캐시 원격 저장 실패: {e}")
+
+    def stats(self):
+        """캐시 항목 수 / 총 용량"""
+        sizes = [path.stat().st_size for path in self.cache_dir.glob("*.json")]
+        return {"entries": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes}
+
+
+_default_cache = None
+
+
+def get_extraction_cache(supabase_client=None):
+    """프로세스 공용 캐시 (Streamlit 재실행에도 유지)"""
+    global _default_cache
+    if _default_cache is None:
+        cache_dir = os.getenv("EXTRACTION_CACHE_DIR") or DEFAULT_CACHE_DIR
+        max_mb = os.getenv("EXTRACTION_CACHE_MAX_MB")
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        mirror = os.getenv("EXTRACTION_CACHE_SUPABASE", "false").lower() == "true"
+        _default_cache = ExtractionCache(
+            cache_dir=cache_dir,
+            max_bytes=max_bytes,
+            supabase_client=supabase_client if mirror else None,
+        )
+    return _default_cache
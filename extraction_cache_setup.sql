@@ -0,0 +1,15 @@
+-- ============================================
+-- PDF 추출 결과 캐시 테이블 (선택)
+-- ============================================
+-- EXTRACTION_CACHE_SUPABASE=true 일 때 로컬 디스크 캐시를 미러링합니다.
+-- 같은 PDF(SHA-256)를 같은 모드로 다시 추출하면 Upstage/EasyOCR 호출을 생략합니다.
+
+CREATE TABLE IF NOT EXISTS public.extraction_cache (
+    cache_key TEXT PRIMARY KEY,           -- {sha256}-{mode}-p{max_pages}
+    payload JSONB NOT NULL,               -- 페이지 레코드 + structured_elements
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_created ON public.extraction_cache(created_at DESC);
+
+COMMENT ON TABLE public.extraction_cache IS 'PDF 추출 결과 캐시 (콘텐츠 해시 기반)';
@@ -0,0 +1,549 @@
+"""
+🏋️ 부하 테스트 (모의 Upstage / OpenAI / Supabase 대상)
+Streamlit 파이프라인과 ocr_server가 하는 호출을 그대로 재현해 동시 사용자 수에 따른 처리량 / 지연 분포를 측정
+
+워크로드:
+- upload: ocr_server /ocr-pdf로 PDF 업로드 (ocr_server → Upstage)
+- extract: Upstage 파싱(upstage_client.post_document) → 항목 추출 채팅 → 청크 임베딩 → Supabase 저장
+  (companies · Storage · pdf_files · extracted_data · document_embeddings)
+- report: 기업 목록 조회 → 질의 임베딩 + match_documents 검색 → 보고서 채팅 → reports 저장
+
+부하 모델:
+- 기본(closed loop): --users 명이 각자 작업을 끝내는 대로 다음 작업 실행
+- --rate N(open loop): 초당 N건을 일정 간격으로 시작, 지연은 예정 시작 시각부터 측정 (밀린 대기 시간 포함)
+
+사용법:
+    python load_test.py --start-mocks --users 8 --duration 30
+    python load_test.py --start-mocks --start-ocr-server --mix upload=2 extract=1 report=3 --rate 4
+    python load_test.py --start-mocks --latency 0.3 --error-rate 0.05 --error-status 429 --retry-after 1
+    python load_test.py --upstage-url http://127.0.0.1:8801/v1/document-digitization \\
+        --openai-url http://127.0.0.1:8802/v1 --supabase-url http://127.0.0.1:8803 (mock_services.py 따로 실행 시)
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+
+from resilience import RETRYABLE_STATUS, RetryPolicy, parse_retry_after
+
+# 부하 테스트 전용 키 (모의 서버는 값을 확인하지 않음)
+MOCK_KEYS = {
+    "upstage": "mock-upstage-key",
+    "openai": "mock-openai-key",
+    "supabase": "mock.mock.mock",
+    "ocr_server": "load-test-key",
+}
+# 추출 채팅 프롬프트에 넣는 항목 (앱의 기본 키워드 흉내)
+EXTRACT_FIELDS = ["기업명", "업종", "매출액", "영업이익", "영업이익률", "당기순이익", "주요 제품", "주요 고객사"]
+# 보고서 검색 질의
+REPORT_QUERIES = ["매출액과 영업이익 추이", "주요 제품과 사업 분야", "재무 건전성과 부채 비율", "주요 고객사와 경쟁사"]
+# 보고서 워크로드가 고를 최근 기업 수
+RECENT_COMPANIES = 200
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LoadTestError(Exception):
+    """워크로드 단계 실패 (HTTP 오류 등)"""
+
+
+def percentile(sorted_values, p):
+    """nearest-rank 백분위수 (정렬된 목록)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class LatencyRecorder:
+    """이름별 지연 / 성공 여부 기록 (스레드 안전)"""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self._errors = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error=None):
+        with self._lock:
+            self._samples[name].append((seconds, error is None))
+            if error is not None:
+                self._errors[name][error] += 1
+
+    def summary(self, elapsed):
+        """[{name, count, errors, throughput, p50, ..., max}] (지연은 성공한 건 기준, ms)"""
+        rows = []
+        with self._lock:
+            items = sorted(self._samples.items())
+            errors = {name: dict(kinds) for name, kinds in self._errors.items()}
+        for name, samples in items:
+            latencies = sorted(seconds for seconds, ok in samples if ok)
+            row = {
+                "name": name,
+                "count": len(samples),
+                "errors": len(samples) - len(latencies),
+                "throughput": len(latencies) / elapsed if elapsed else 0.0,
+                "error_kinds": errors.get(name, {}),
+            }
+            for p in PERCENTILES:
+                row[f"p{p}_ms"] = percentile(latencies, p) * 1000
+            row["max_ms"] = latencies[-1] * 1000 if latencies else 0.0
+            rows.append(row)
+        return rows
+
+
+def _check(response, what):
+    if response.status_code >= 400:
+        raise LoadTestError(f"{what} HTTP {response.status_code}")
+    return response
+
+
+def split_chunks(text, chunk_chars):
+    """임베딩용 청크 (앱의 500토큰 청크 ≈ 2000자)"""
+    text = text.strip()
+    return [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+
+
+def result_text(result):
+    """Upstage 응답 → 본문 텍스트 (요소 순서대로)"""
+    texts = []
+    for element in result.get("elements", []):
+        content = element.get("content", {})
+        texts.append(content.get("text") or content.get("markdown", "") if isinstance(content, dict) else str(content))
+    return "\n\n".join(t for t in texts if t)
+
+
+class LoadContext:
+    """워크로드 공용 설정 + 스레드별 HTTP 세션 + 기록기"""
+
+    def __init__(self, args, recorder, pdf_bytes):
+        self.args = args
+        self.recorder = recorder
+        self.pdf_bytes = pdf_bytes
+        self.openai_url = args.openai_url.rstrip("/")
+        self.supabase_url = args.supabase_url.rstrip("/")
+        self.ocr_server_url = args.ocr_server_url.rstrip("/") if args.ocr_server_url else None
+        # OpenAI SDK 기본값: 429/5xx/연결 오류 2회 재시도
+        self.openai_policy = RetryPolicy(max_attempts=args.openai_retries + 1)
+        self.companies = deque(maxlen=RECENT_COMPANIES)
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def next_pdf(self):
+        """(파일명, PDF 바이트) - 요청마다 내용을 다르게 해 캐시 / 동일 요청 합치기를 피함"""
+        with self._lock:
+            self._counter += 1
+            index = self._counter
+        pdf_bytes = self.pdf_bytes
+        if self.args.unique_uploads:
+            # %%EOF 뒤 주석은 PDF 파서가 무시
+            pdf_bytes += f"\n% load-test {index}\n".encode()
+        return f"load-test-{index}.pdf", pdf_bytes
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.recorder.record(name, time.perf_counter() - start, error=_error_kind(e))
+            raise
+        self.recorder.record(name, time.perf_counter() - start)
+
+    # OpenAI ---------------------------------------------------------------
+
+    def _openai_post(self, path, payload):
+        headers = {"Authorization": f"Bearer {MOCK_KEYS['openai']}"}
+        for attempt in range(self.openai_policy.max_attempts):
+            last = attempt == self.openai_policy.max_attempts - 1
+            try:
+                response = self.session.post(f"{self.openai_url}{path}", json=payload, headers=headers,
+                                             timeout=self.args.timeout)
+            except requests.ConnectionError:
+                if last:
+                    raise
+                time.sleep(self.openai_policy.delay(attempt))
+                continue
+            if response.status_code not in RETRYABLE_STATUS or last:
+                return _check(response, f"OpenAI {path}").json()
+            time.sleep(self.openai_policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After"))))
+
+    def chat(self, system, prompt, max_tokens):
+        body = self._openai_post("/chat/completions", {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": 0.05,
+        })
+        return body["choices"][0]["message"]["content"]
+
+    def embed(self, texts):
+        body = self._openai_post("/embeddings", {"model": "text-embedding-3-small", "input": texts,
+                                                 "encoding_format": "float"})
+        return [item["embedding"] for item in sorted(body["data"], key=lambda item: item["index"])]
+
+    # Supabase -------------------------------------------------------------
+
+    def _supabase_headers(self, **extra):
+        key = MOCK_KEYS["supabase"]
+        return {"apikey": key, "Authorization": f"Bearer {key}", **extra}
+
+    def insert(self, table, rows):
+        response = self.session.post(
+            f"{self.supabase_url}/rest/v1/{table}", json=rows, timeout=self.args.timeout,
+            headers=self._supabase_headers(Prefer="return=representation"),
+        )
+        return _check(response, f"insert {table}").json()
+
+    def select(self, table, **params):
+        response = self.session.get(f"{self.supabase_url}/rest/v1/{table}", params=params,
+                                    headers=self._supabase_headers(), timeout=self.args.timeout)
+        return _check(response, f"select {table}").json()
+
+    def rpc(self, function, params):
+        response = self.session.post(f"{self.supabase_url}/rest/v1/rpc/{function}", json=params,
+                                     headers=self._supabase_headers(), timeout=self.args.timeout)
+        return _check(response, f"rpc {function}").json()
+
+    def upload_object(self, bucket, path, data):
+        response = self.session.post(
+            f"{self.supabase_url}/storage/v1/object/{bucket}/{path}", data=data, timeout=self.args.timeout,
+            headers=self._supabase_headers(**{"Content-Type": "application/pdf"}),
+        )
+        return _check(response, f"storage {bucket}").json()
+
+
+def _error_kind(error):
+    """오류 분류 (요약 표에 종류별 건수로 표시)"""
+    status = getattr(error, "status_code", None)
+    if status:
+        return f"HTTP {status}"
+    message = str(error)
+    if isinstance(error, LoadTestError) and "HTTP" in message:
+        return message[message.index("HTTP"):]
+    return type(error).__name__
+
+
+# ============================================
+# 워크로드
+# ============================================
+
+def run_upload(ctx):
+    """ocr_server /ocr-pdf 업로드"""
+    filename, pdf_bytes = ctx.next_pdf()
+    with ctx.step("upload.ocr_pdf"):
+        response = ctx.session.post(
+            f"{ctx.ocr_server_url}/ocr-pdf",
+            headers={"X-API-Key": MOCK_KEYS["ocr_server"]},
+            files={"file": (filename, pdf_bytes, "application/pdf")},
+            timeout=ctx.args.timeout,
+        )
+        _check(response, "ocr-pdf")
+
+
+def run_extract(ctx):
+    """Upstage 파싱 → 항목 추출 → 임베딩 → Supabase 저장 (save_to_supabase 순서)"""
+    from upstage_client import post_document
+
+    filename, pdf_bytes = ctx.next_pdf()
+    with ctx.step("extract.upstage"):
+        result = post_document(pdf_bytes, filename, MOCK_KEYS["upstage"], timeout=ctx.args.timeout)
+    text = result_text(result)
+
+    with ctx.step("extract.chat"):
+        fields = "\n".join(f"- [{field}]" for field in EXTRACT_FIELDS)
+        answer = ctx.chat("문서에서 정확한 정보를 추출합니다. '[항목명]: 내용' 형식으로 답변합니다.",
+                          f"다음 항목을 추출하세요:\n{fields}\n\n문서:\n{text[:12000]}", max_tokens=1500)
+
+    chunks = split_chunks(text, ctx.args.chunk_chars)
+    embeddings = []
+    with ctx.step("extract.embeddings"):
+        # 앱은 청크마다 한 번씩 호출 (--embedding-batch로 묶음 호출 효과 비교)
+        for i in range(0, len(chunks), ctx.args.embedding_batch):
+            embeddings.extend(ctx.embed(chunks[i:i + ctx.args.embedding_batch]))
+
+    with ctx.step("extract.supabase"):
+        company = ctx.insert("companies", {"company_name": f"부하테스트 {filename}", "industry": "제조업"})[0]
+        company_id = company["id"]
+        ctx.upload_object("company-pdfs", f"{company_id}/main.pdf", pdf_bytes)
+        ctx.insert("pdf_files", {
+            "company_id": company_id, "file_name": filename, "file_type": "main",
+            "storage_path": f"{company_id}/main.pdf", "file_size": len(pdf_bytes),
+            "extracted_text": text[:50000], "pages_count": ctx.args.pages,
+        })
+        ctx.insert("extracted_data", [
+            {"company_id": company_id, "field_name": line.split("]")[0].lstrip("["), "field_value": line[:5000]}
+            for line in answer.splitlines() if line.startswith("[")
+        ] or [{"company_id": company_id, "field_name": "기업명", "field_value": filename}])
+        entries = [
+            {"company_id": company_id, "file_type": "main", "chunk_index": i, "chunk_text": chunk[:5000],
+             "embedding": embedding, "token_count": len(chunk) // 4}
+            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+        ]
+        for i in range(0, len(entries), 100):
+            ctx.insert("document_embeddings", entries[i:i + 100])
+    ctx.companies.append(company_id)
+
+
+def run_report(ctx):
+    """기업 조회 → 유사도 검색 → 보고서 생성 → 저장"""
+    with ctx.step("report.companies"):
+        ctx.select("companies", select="*", order="created_at.desc", limit="50")
+    company_id = random.choice(ctx.companies) if ctx.companies else None
+    query = random.choice(REPORT_QUERIES)
+
+    with ctx.step("report.search"):
+        params = {"query_embedding": ctx.embed([query])[0], "match_threshold": 0.1, "match_count": 10}
+        if company_id:
+            params["filter_company_id"] = company_id
+        matches = ctx.rpc("match_documents", params)
+    context = "\n\n".join(match["chunk_text"] for match in matches)[:12000]
+
+    with ctx.step("report.chat"):
+        report = ctx.chat("기업 분석 보고서를 작성합니다.", f"질문: {query}\n\n참고 자료:\n{context}", max_tokens=2000)
+    if company_id:
+        with ctx.step("report.save"):
+            ctx.insert("reports", {"company_id": company_id, "report_content": report[:100000]})
+
+
+WORKLOADS = {"upload": run_upload, "extract": run_extract, "report": run_report}
+
+
+# ============================================
+# 실행
+# ============================================
+
+def parse_mix(items):
+    """["upload=1", "extract=2"] → {"upload": 1.0, "extract": 2.0}"""
+    mix = {}
+    for item in items:
+        name, _, weight = item.partition("=")
+        if name not in WORKLOADS:
+            raise SystemExit(f"알 수 없는 워크로드: {name} (가능: {', '.join(WORKLOADS)})")
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def run_operation(ctx, name, scheduled=None):
+    """워크로드 1건 실행 - open loop면 예정 시작 시각부터 지연 측정"""
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        WORKLOADS[name](ctx)
+    except Exception as e:
+        ctx.recorder.record(name, time.perf_counter() - start, error=_error_kind(e))
+    else:
+        ctx.recorder.record(name, time.perf_counter() - start)
+
+
+def run_closed_loop(ctx, mix, users, deadline, iterations):
+    names, weights = list(mix), list(mix.values())
+    remaining = [iterations]
+    lock = threading.Lock()
+
+    def user(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            if iterations:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+            run_operation(ctx, rng.choices(names, weights)[0])
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(ctx, mix, users, deadline, iterations, rate):
+    names, weights = list(mix), list(mix.values())
+    rng = random.Random(0)
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        start = time.perf_counter()
+        index = 0
+        while not iterations or index < iterations:
+            scheduled = start + index / rate
+            if scheduled >= deadline:
+                break
+            time.sleep(max(0.0, scheduled - time.perf_counter()))
+            executor.submit(run_operation, ctx, rng.choices(names, weights)[0], scheduled)
+            index += 1
+
+
+def start_mocks(args):
+    """모의 서버를 이 프로세스에서 실행하고 URL 인자를 채움 - [(이름, MockBehavior)]"""
+    from mock_services import MockBehavior, make_openai_app, make_supabase_app, make_upstage_app, serve_in_thread
+
+    def behavior(latency):
+        return MockBehavior(latency=args.latency if latency is None else latency, jitter=args.jitter,
+                            error_rate=args.error_rate, error_status=args.error_status,
+                            retry_after=args.retry_after, seed=0)
+
+    services = [
+        ("upstage", make_upstage_app(behavior(args.upstage_latency), page_latency=args.page_latency),
+         args.mock_port),
+        ("openai", make_openai_app(behavior(args.openai_latency), token_latency=args.token_latency),
+         args.mock_port + 1),
+        ("supabase", make_supabase_app(behavior(args.supabase_latency)), args.mock_port + 2),
+    ]
+    for _, app, port in services:
+        serve_in_thread(app, port)
+    base = "http://127.0.0.1"
+    args.upstage_url = f"{base}:{args.mock_port}/v1/document-digitization"
+    args.openai_url = f"{base}:{args.mock_port + 1}/v1"
+    args.supabase_url = f"{base}:{args.mock_port + 2}"
+    return [(name, app.state.mock) for name, app, _ in services]
+
+
+def start_ocr_server(args):
+    """모의 Upstage를 바라보는 ocr_server를 이 프로세스에서 실행"""
+    import logging
+
+    from mock_services import serve_in_thread
+
+    upstage = urlsplit(args.upstage_url)
+    os.environ["UPSTAGE_API_URL"] = f"{upstage.scheme}://{upstage.netloc}/v1/document-ai/document-parse"
+    os.environ["UPSTAGE_API_KEY"] = MOCK_KEYS["upstage"]
+    os.environ["OCR_API_KEY"] = MOCK_KEYS["ocr_server"]
+    os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+    import ocr_server
+
+    for name in ("ocr_server", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    serve_in_thread(ocr_server.app, args.ocr_server_port)
+    args.ocr_server_url = f"http://127.0.0.1:{args.ocr_server_port}"
+
+
+def check_local(args):
+    """실수로 실제 API를 부하 테스트하지 않도록 로컬 주소만 허용 (--allow-remote로 해제)"""
+    urls = [args.upstage_url, args.openai_url, args.supabase_url, args.ocr_server_url]
+    for url in filter(None, urls):
+        host = urlsplit(url).hostname or ""
+        if host not in ("127.0.0.1", "localhost", "::1") and not args.allow_remote:
+            raise SystemExit(f"⚠️ 로컬이 아닌 주소: {url} - 실제 API에 부하를 주려면 --allow-remote")
+
+
+def print_summary(rows, elapsed, mock_stats):
+    print(f"\n📊 결과 ({elapsed:.1f}초)")
+    print(f"  {'이름':<20}{'건수':>7}{'실패':>6}{'처리량/s':>10}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+          + f"{'max':>9}  (ms)")
+    for row in rows:
+        if "." in row["name"]:
+            continue
+        print(_format_row(row))
+    print("  ── 단계별")
+    for row in rows:
+        if "." in row["name"]:
+            print(_format_row(row))
+    for row in rows:
+        if row["error_kinds"]:
+            kinds = ", ".join(f"{kind} {count}" for kind, count in row["error_kinds"].items())
+            print(f"  ⚠️ {row['name']} 실패: {kinds}")
+    for name, stats in mock_stats.items():
+        print(f"  🧪 {name}: 요청 {stats['calls']}회, 주입 실패 {stats['failures']}회, 최대 동시 {stats['max_concurrent']}")
+
+
+def _format_row(row):
+    return (f"  {row['name']:<20}{row['count']:>7}{row['errors']:>6}{row['throughput']:>10.2f}"
+            + "".join(f"{row[f'p{p}_ms']:>9.0f}" for p in PERCENTILES) + f"{row['max_ms']:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모의 Upstage / OpenAI / Supabase 대상 부하 테스트")
+    parser.add_argument("--users", type=int, default=8, help="동시 사용자 수 (open loop에서는 최대 동시 실행 수)")
+    parser.add_argument("--duration", type=float, default=30, help="실행 시간(초)")
+    parser.add_argument("--iterations", type=int, default=0, help="총 작업 수 (0이면 시간 기준)")
+    parser.add_argument("--rate", type=float, default=0, help="초당 시작할 작업 수 (open loop, 0이면 closed loop)")
+    parser.add_argument("--mix", nargs="+", default=["extract=1", "report=3"],
+                        help="워크로드 비율 (upload / extract / report)")
+    parser.add_argument("--pages", type=int, default=10, help="합성 PDF 페이지 수")
+    parser.add_argument("--chunk-chars", type=int, default=2000)
+    parser.add_argument("--embedding-batch", type=int, default=1, help="임베딩 호출 1회당 청크 수 (앱: 1)")
+    parser.add_argument("--openai-retries", type=int, default=2, help="OpenAI 재시도 횟수 (SDK 기본값 2)")
+    parser.add_argument("--no-unique-uploads", dest="unique_uploads", action="store_false",
+                        help="같은 PDF를 반복 전송 (캐시 적중 측정용)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="결과를 JSON 파일로 저장")
+
+    target = parser.add_argument_group("대상 서버")
+    target.add_argument("--upstage-url", default=os.getenv("UPSTAGE_DIGITIZATION_URL"))
+    target.add_argument("--openai-url", default=os.getenv("OPENAI_BASE_URL"))
+    target.add_argument("--supabase-url", default=os.getenv("SUPABASE_URL"))
+    target.add_argument("--ocr-server-url", default=None)
+    target.add_argument("--allow-remote", action="store_true")
+
+    mocks = parser.add_argument_group("모의 서버 (--start-mocks)")
+    mocks.add_argument("--start-mocks", action="store_true", help="모의 서버를 이 프로세스에서 실행")
+    mocks.add_argument("--start-ocr-server", action="store_true", help="ocr_server를 이 프로세스에서 실행")
+    mocks.add_argument("--mock-port", type=int, default=8801, help="Upstage 포트 (OpenAI +1, Supabase +2)")
+    mocks.add_argument("--ocr-server-port", type=int, default=8810)
+    mocks.add_argument("--latency", type=float, default=0.1)
+    mocks.add_argument("--jitter", type=float, default=0.0)
+    mocks.add_argument("--error-rate", type=float, default=0.0)
+    mocks.add_argument("--error-status", type=int, default=503)
+    mocks.add_argument("--retry-after", type=float, default=None)
+    mocks.add_argument("--upstage-latency", type=float)
+    mocks.add_argument("--openai-latency", type=float)
+    mocks.add_argument("--supabase-latency", type=float)
+    mocks.add_argument("--page-latency", type=float, default=0.05)
+    mocks.add_argument("--token-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if not mix:
+        raise SystemExit("실행할 워크로드가 없습니다 (--mix)")
+    mock_behaviors = start_mocks(args) if args.start_mocks else []
+    if not all([args.upstage_url, args.openai_url, args.supabase_url]):
+        raise SystemExit("대상 서버 URL이 없습니다 - --start-mocks 또는 --upstage-url/--openai-url/--supabase-url")
+    if args.start_ocr_server:
+        start_ocr_server(args)
+    if "upload" in mix and not args.ocr_server_url:
+        raise SystemExit("upload 워크로드에는 --ocr-server-url 또는 --start-ocr-server가 필요합니다")
+    check_local(args)
+    # upstage_client는 import 시점에 URL을 읽음
+    os.environ["UPSTAGE_DIGITIZATION_URL"] = args.upstage_url
+
+    from benchmarks import make_synthetic_pdf
+
+    ctx = LoadContext(args, LatencyRecorder(), make_synthetic_pdf(args.pages, lines_per_page=40))
+
+    mode = f"open loop {args.rate}/s" if args.rate else "closed loop"
+    print(f"🏋️ 부하 테스트: {', '.join(f'{k}={v:g}' for k, v in mix.items())} | 사용자 {args.users}명, {mode}, "
+          f"{args.iterations or f'{args.duration:g}초'}")
+    start = time.perf_counter()
+    deadline = start + args.duration if not args.iterations else float("inf")
+    if args.rate:
+        run_open_loop(ctx, mix, args.users, deadline, args.iterations, args.rate)
+    else:
+        run_closed_loop(ctx, mix, args.users, deadline, args.iterations)
+    elapsed = time.perf_counter() - start
+
+    rows = ctx.recorder.summary(elapsed)
+    mock_stats = {name: behavior.stats() for name, behavior in mock_behaviors}
+    print_summary(rows, elapsed, mock_stats)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"elapsed": elapsed, "mix": mix, "users": args.users, "rate": args.rate,
+                       "results": rows, "mocks": mock_stats}, f, ensure_ascii=False, indent=2)
+        print(f"💾 {args.json} 저장")
+
+
+if __name__ == "__main__":
+    main()
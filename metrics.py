@@ -0,0 +1,158 @@
+"""
+📊 프로세스 내 메트릭 (Prometheus 텍스트 형식)
+외부 서비스/라이브러리 없이 카운터 · 게이지 · 히스토그램을 메모리에 모으고 /metrics에서 그대로 출력
+- 라벨 조합별 시계열은 첫 기록 시 생성 (라벨 값은 엔드포인트 템플릿 등 개수가 정해진 값만 사용)
+- 기록은 이벤트 루프 스레드에서만 하므로 잠금 없음 (관측 1회 = 리스트 인덱스 증가 몇 번)
+- 출력은 시계열 목록을 복사한 뒤 만들므로 워커 스레드에서 해도 됨
+- 캐시 적중 수처럼 다른 객체가 이미 세고 있는 값은 수집 시점에 콜백으로 읽음
+"""
+
+from bisect import bisect_left
+
+# 기본 버킷 (초) - 로컬 처리 수 ms ~ Upstage 수십 초
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 페이로드 크기 버킷 (바이트) - 1KB ~ 256MB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        # list()는 GIL 아래 한 번에 복사되므로 다른 스레드에서 렌더링해도 안전
+        for key, value in sorted(list(self._series.items()), key=lambda item: tuple(map(str, item[0]))):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self._series[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            # [버킷별 개수..., +Inf 개수, 합계]
+            series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def _render_series(self, key, series):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, f'le="{_format_value(float(bound))}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """수집 시점에 callback() → {라벨 값 튜플: 값} 을 읽어 출력 (다른 객체가 세는 값)"""
+
+    def __init__(self, name, documentation, callback, labelnames=(), kind="gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self):
+        try:
+            self._series = dict(self.callback())
+        except Exception as e:
+            print(f"⚠️ 메트릭 수집 실패 ({self.name}): {e}")
+            self._series = {}
+        return super().render()
+
+
+class MetricsRegistry:
+    """메트릭 묶음 - 이름별로 하나씩 생성하고 Prometheus 텍스트로 출력"""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"이미 등록된 메트릭: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, callback, labelnames=(), kind="gauge"):
+        return self._register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
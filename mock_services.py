@@ -0,0 +1,792 @@
+"""
+🧪 로컬 모의 서버 (Upstage · OpenAI · Supabase)
+실제 API 비용 / 요청 한도 없이 ocr_server와 Streamlit 파이프라인을 부하 테스트하기 위한 대역 서버
+- Upstage: document-digitization 응답 형식 (동기 / 비동기 작업 + 배치 다운로드, 구 document-parse 경로 포함)
+- OpenAI: /v1/chat/completions, /v1/embeddings (SDK 기본값인 base64 인코딩 포함)
+- Supabase: PostgREST 테이블 조회/추가/수정/삭제, rpc/match_documents, Storage 업로드 (메모리 저장)
+- 서버마다 지연(고정 + 지터) / 장애(확률 또는 순서 지정, Retry-After) 설정, 실행 중에도 /_mock/config로 변경
+- /_mock/stats: 받은 요청 수, 주입한 실패 수, 최대 동시 처리 수
+
+사용법:
+    python mock_services.py --latency 0.2 --error-rate 0.02 --error-status 429 --retry-after 1
+    → 출력되는 환경변수(UPSTAGE_DIGITIZATION_URL, OPENAI_BASE_URL, SUPABASE_URL 등)로 앱/ocr_server 실행
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+
+import fitz  # PyMuPDF
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import UploadFile
+
+# 기본 포트
+DEFAULT_UPSTAGE_PORT = 8801
+DEFAULT_OPENAI_PORT = 8802
+DEFAULT_SUPABASE_PORT = 8803
+
+# text-embedding-3-small 차원 (supabase_setup.sql의 vector(1536))
+EMBEDDING_DIMENSIONS = 1536
+# 요청 본문이 이보다 크면 PDF로 열지 않음 (대용량 업로드 부하 테스트는 내용 무시)
+MAX_PARSE_BYTES = 16 * 1024 * 1024
+# 비동기 작업 배치 크기 (페이지)
+ASYNC_BATCH_PAGES = 10
+# 테이블별 최대 행 수 (넘으면 오래된 행부터 삭제 - 장시간 부하 테스트 메모리 상한)
+DEFAULT_MAX_ROWS = 20000
+
+# base64_encoding 요청 시 표/그림 요소에 넣는 1x1 PNG
+_PIXEL_PNG = "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+
+
+def serve_in_thread(app, port, host="127.0.0.1"):
+    """uvicorn 서버를 백그라운드 스레드에서 실행 - Server 객체 반환 (server.config.app으로 앱 접근)"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class MockBehavior:
+    """모의 서버 하나의 지연 / 장애 설정 + 호출 통계
+
+    - latency ± jitter 초 대기 후 응답 (extra_delay: 페이지/토큰 수에 비례하는 추가 지연)
+    - plan: 앞에서부터 하나씩 꺼내 응답 결정 (200 / 상태 코드 / (상태 코드, Retry-After 초)), 비면 error_rate 확률로 실패
+    - calls / failures / active / max_concurrent: /_mock/ 경로를 제외한 요청 기준
+    """
+
+    FIELDS = ("latency", "jitter", "error_rate", "error_status", "retry_after")
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, retry_after=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.plan = deque()
+        self._random = random.Random(seed)
+        self.active = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """누적 통계 초기화 (처리 중인 요청 수는 유지)"""
+        self.calls = 0
+        self.failures = 0
+        self.max_concurrent = self.active
+
+    def configure(self, **changes):
+        """설정 변경 (알 수 없는 항목은 ValueError) - plan 항목은 목록으로 교체"""
+        for name, value in changes.items():
+            if name == "plan":
+                self.plan = deque(tuple(step) if isinstance(step, list) else step for step in value)
+            elif name in self.FIELDS:
+                setattr(self, name, value)
+            else:
+                raise ValueError(f"알 수 없는 설정: {name}")
+
+    def delay(self, extra_delay=0.0):
+        jitter = self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        return max(0.0, self.latency + extra_delay + jitter)
+
+    def next_failure(self):
+        """이번 요청에 주입할 실패 (상태 코드, Retry-After) - 성공이면 None"""
+        if self.plan:
+            step = self.plan.popleft()
+            status, retry_after = step if isinstance(step, tuple) else (step, None)
+            return None if status == 200 else (status, retry_after)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status, self.retry_after
+        return None
+
+    async def gate(self, extra_delay=0.0, error_body=None):
+        """지연 후 주입할 실패 응답 반환 (성공이면 None) - 데이터를 바꾸는 요청은 이걸 먼저 통과한 뒤 반영"""
+        await asyncio.sleep(self.delay(extra_delay))
+        failure = self.next_failure()
+        if failure is None:
+            return None
+        status, retry_after = failure
+        self.failures += 1
+        body = error_body(status) if error_body else {"error": f"injected {status}"}
+        headers = {"Retry-After": str(retry_after)} if retry_after is not None else None
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    async def respond(self, content, extra_delay=0.0, status_code=200, error_body=None, headers=None):
+        """지연 후 장애 주입 여부를 정해 응답 (content가 Response면 그대로 반환)"""
+        error = await self.gate(extra_delay, error_body)
+        if error is not None:
+            return error
+        if isinstance(content, Response):
+            return content
+        return JSONResponse(content, status_code=status_code, headers=headers)
+
+    def settings(self):
+        return {name: getattr(self, name) for name in self.FIELDS} | {"plan": list(self.plan)}
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+def _create_mock_app(title, behavior):
+    """공통 부분 - 호출 통계 미들웨어 + /_mock/stats · /_mock/config · /_mock/reset"""
+    app = FastAPI(title=title)
+    app.state.mock = behavior
+
+    @app.middleware("http")
+    async def count_calls(request, call_next):
+        if request.url.path.startswith("/_mock/"):
+            return await call_next(request)
+        behavior.calls += 1
+        behavior.active += 1
+        behavior.max_concurrent = max(behavior.max_concurrent, behavior.active)
+        try:
+            return await call_next(request)
+        finally:
+            behavior.active -= 1
+
+    @app.get("/_mock/stats")
+    async def mock_stats():
+        return behavior.stats() | {"settings": behavior.settings()}
+
+    @app.post("/_mock/config")
+    async def mock_config(request: Request):
+        try:
+            behavior.configure(**await request.json())
+        except (TypeError, ValueError) as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        return behavior.settings()
+
+    @app.post("/_mock/reset")
+    async def mock_reset():
+        behavior.reset_stats()
+        behavior.plan.clear()
+        return behavior.stats()
+
+    return app
+
+
+# ============================================
+# Upstage (document-digitization)
+# ============================================
+
+def _requested_formats(value, default=("html",)):
+    """output_formats 폼 값("['text', 'html']" 등) → 형식 집합 (없으면 default - API 기본값 html)"""
+    return set(re.findall(r"text|html|markdown", value or "")) or set(default)
+
+
+def _element(element_id, page, category, text, html, formats, coordinates, table_image=False):
+    element = {
+        "category": category,
+        "content": {
+            "html": html if "html" in formats else "",
+            "markdown": text if "markdown" in formats else "",
+            "text": text if "text" in formats else "",
+        },
+        "id": element_id,
+        "page": page,
+    }
+    if coordinates:
+        top = 0.05 + 0.1 * (element_id % 8)
+        element["coordinates"] = [
+            {"x": 0.08, "y": top}, {"x": 0.92, "y": top}, {"x": 0.92, "y": top + 0.08}, {"x": 0.08, "y": top + 0.08},
+        ]
+    if table_image:
+        element["base64_encoding"] = _PIXEL_PNG
+    return element
+
+
+def _page_elements(page_number, text, first_id, formats, coordinates, encode_tables, tables_per_page):
+    """페이지 하나 → 제목 + 본문 + 표 요소"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    heading = lines[0] if lines else f"Page {page_number}"
+    body = "\n".join(lines[1:]) or f"모의 본문 {page_number}페이지"
+    elements = [
+        _element(first_id, page_number, "heading1", heading,
+                 f"<h1 id='{first_id}' style='font-size:20px'>{heading}</h1>", formats, coordinates),
+        _element(first_id + 1, page_number, "paragraph", body,
+                 f"<p id='{first_id + 1}' data-category='paragraph' style='font-size:14px'>{body}</p>",
+                 formats, coordinates),
+    ]
+    for t in range(tables_per_page):
+        element_id = first_id + 2 + t
+        rows = [("항목", "2023", "2024"), ("매출액", f"{1000 + page_number * 7:,}", f"{1100 + page_number * 9:,}"),
+                ("영업이익", f"{100 + page_number:,}", f"{120 + page_number * 2:,}")]
+        html = f"<table id='{element_id}'>" + "".join(
+            "<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows
+        ) + "</table>"
+        markdown = "\n".join("| " + " | ".join(row) + " |" for row in rows)
+        elements.append(_element(element_id, page_number, "table", markdown, html, formats, coordinates,
+                                 table_image=encode_tables))
+    return elements
+
+
+def build_digitization_result(page_texts, form=None, tables_per_page=1, first_page=1, default_formats=("html",)):
+    """페이지 텍스트 목록 → document-digitization 응답 (content / elements / usage)"""
+    form = form or {}
+    formats = _requested_formats(form.get("output_formats"), default_formats)
+    coordinates = str(form.get("coordinates", "true")).lower() != "false"
+    encode_tables = "table" in str(form.get("base64_encoding", ""))
+
+    elements = []
+    for offset, text in enumerate(page_texts):
+        elements.extend(_page_elements(first_page + offset, text, len(elements), formats, coordinates,
+                                       encode_tables, tables_per_page))
+    content = {
+        name: "\n".join(e["content"][name] for e in elements if e["content"][name]) if name in formats else ""
+        for name in ("html", "markdown", "text")
+    }
+    return {
+        "api": "2.0",
+        "model": "document-parse-mock",
+        "content": content,
+        "elements": elements,
+        "usage": {"pages": len(page_texts)},
+    }
+
+
+async def _read_document(document):
+    """업로드 문서 → (바이트 수, 페이지 텍스트 목록) - PDF가 아니면 한 페이지짜리 문서로 취급"""
+    size = 0
+    head = bytearray()
+    while chunk := await document.read(1024 * 1024):
+        size += len(chunk)
+        if size <= MAX_PARSE_BYTES:
+            head += chunk
+    try:
+        with fitz.open(stream=bytes(head), filetype="pdf") as doc:
+            page_texts = [page.get_text() for page in doc]
+    except Exception:
+        page_texts = [f"모의 인식 결과 {document.filename} ({size} bytes)"]
+    return size, page_texts or [""]
+
+
+def make_upstage_app(behavior=None, page_latency=0.0, tables_per_page=1, async_batch_pages=ASYNC_BATCH_PAGES):
+    """모의 Upstage 서버
+
+    - POST /v1/document-digitization: 동기 파싱 (지연 = latency + page_latency × 페이지 수)
+    - POST /v1/document-digitization/async → request_id, GET .../requests/{id}: 배치별 진행 상황
+      (배치는 제출 후 page_latency × 누적 페이지 수 시점에 완료, download_url로 결과 다운로드)
+    - POST /v1/document-ai/document-parse: 구 Document Parse 경로 (ocr_server 기본값, top-level text 포함)
+    """
+    behavior = behavior or MockBehavior()
+    app = _create_mock_app("Mock Upstage", behavior)
+    app.state.jobs = {}
+
+    def error_body(status):
+        return {"error": {"message": f"injected {status}", "type": "mock_error", "code": str(status)}}
+
+    async def parse(request, legacy=False):
+        form = await request.form()
+        document = form.get("document")
+        if not isinstance(document, UploadFile):
+            return JSONResponse({"error": {"message": "document 필드가 없습니다"}}, status_code=400)
+        _, page_texts = await _read_document(document)
+        # 구 document-parse는 형식 지정 없이 text / html / markdown 모두 반환
+        default_formats = ("text", "html", "markdown") if legacy else ("html",)
+        result = build_digitization_result(page_texts, form, tables_per_page, default_formats=default_formats)
+        if legacy:
+            result["text"] = result["content"]["text"] or "\n".join(page_texts)
+        return await behavior.respond(result, page_latency * len(page_texts), error_body=error_body)
+
+    @app.post("/v1/document-digitization")
+    async def digitize(request: Request):
+        return await parse(request)
+
+    @app.post("/v1/document-ai/document-parse")
+    async def document_parse(request: Request):
+        return await parse(request, legacy=True)
+
+    @app.post("/v1/document-digitization/async")
+    async def submit_async(request: Request):
+        form = await request.form()
+        document = form.get("document")
+        if not isinstance(document, UploadFile):
+            return JSONResponse({"error": {"message": "document 필드가 없습니다"}}, status_code=400)
+        _, page_texts = await _read_document(document)
+        request_id = str(uuid.uuid4())
+        batches = []
+        for start in range(0, len(page_texts), async_batch_pages):
+            texts = page_texts[start:start + async_batch_pages]
+            batches.append({
+                "start_page": start + 1,
+                "end_page": start + len(texts),
+                "ready_at": page_latency * (start + len(texts)),
+                "result": build_digitization_result(texts, form, tables_per_page, first_page=start + 1),
+            })
+        app.state.jobs[request_id] = {"submitted_at": time.monotonic(), "pages": len(page_texts), "batches": batches}
+        return await behavior.respond({"request_id": request_id}, status_code=202, error_body=error_body)
+
+    @app.get("/v1/document-digitization/requests/{request_id}")
+    async def async_status(request_id: str, request: Request):
+        job = app.state.jobs.get(request_id)
+        if job is None:
+            return JSONResponse({"error": {"message": "작업 없음"}}, status_code=404)
+        elapsed = time.monotonic() - job["submitted_at"]
+        batches = []
+        completed_pages = 0
+        for index, batch in enumerate(job["batches"]):
+            done = elapsed >= batch["ready_at"]
+            entry = {"id": index, "start_page": batch["start_page"], "end_page": batch["end_page"],
+                     "status": "completed" if done else "started"}
+            if done:
+                completed_pages = batch["end_page"]
+                entry["download_url"] = str(request.url_for("download_batch", request_id=request_id, index=index))
+            batches.append(entry)
+        status = "completed" if completed_pages >= job["pages"] else "started"
+        return await behavior.respond({
+            "id": request_id, "status": status, "total_pages": job["pages"],
+            "completed_pages": completed_pages, "batches": batches,
+        }, error_body=error_body)
+
+    @app.get("/_mock/upstage/results/{request_id}/{index}", name="download_batch")
+    async def download_batch(request_id: str, index: int):
+        job = app.state.jobs.get(request_id)
+        if job is None or index >= len(job["batches"]):
+            return JSONResponse({"error": {"message": "결과 없음"}}, status_code=404)
+        return job["batches"][index]["result"]
+
+    return app
+
+
+# ============================================
+# OpenAI (chat / embeddings)
+# ============================================
+
+def estimate_tokens(text):
+    """대략적인 토큰 수 (4글자 ≈ 1토큰)"""
+    return max(1, len(text) // 4)
+
+
+def mock_embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    """단어 해시 기반 결정적 임베딩 (단위 벡터) - 같은 단어가 많은 텍스트일수록 코사인 유사도가 높음"""
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "little") % dimensions
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def make_openai_app(behavior=None, completion_tokens=200, token_latency=0.0):
+    """모의 OpenAI 서버 (OPENAI_BASE_URL=http://host:port/v1 로 SDK를 그대로 사용)
+
+    - chat.completions: min(max_tokens, completion_tokens) 토큰 분량 응답, 지연 += 토큰 수 × token_latency
+    - embeddings: 입력(문자열 또는 목록)별 결정적 벡터, encoding_format=base64 지원
+    """
+    behavior = behavior or MockBehavior()
+    app = _create_mock_app("Mock OpenAI", behavior)
+    app.state.requests = 0
+
+    def error_body(status):
+        kind = "rate_limit_exceeded" if status == 429 else "server_error"
+        return {"error": {"message": f"injected {status}", "type": kind, "param": None, "code": kind}}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        tokens = min(body.get("max_tokens") or body.get("max_completion_tokens") or completion_tokens,
+                     completion_tokens)
+        # 추출 프롬프트의 "[항목명]" 형식을 흉내내 파싱 경로도 타도록
+        fields = list(dict.fromkeys(re.findall(r"\[([^\[\]\n]{1,30})\]", prompt)))[:20]
+        lines = [f"[{field}]: 모의 값 {i + 1}" for i, field in enumerate(fields)]
+        filler = max(0, tokens - sum(estimate_tokens(line) for line in lines))
+        content = "\n".join(lines + ["모의 응답 " * (filler // 2)]).strip()
+        app.state.requests += 1
+        prompt_tokens = estimate_tokens(prompt)
+        return await behavior.respond({
+            "id": f"chatcmpl-mock-{app.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": tokens,
+                      "total_tokens": prompt_tokens + tokens},
+        }, tokens * token_latency, error_body=error_body)
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dimensions = body.get("dimensions") or EMBEDDING_DIMENSIONS
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for index, text in enumerate(inputs):
+            vector = mock_embedding(str(text), dimensions)
+            embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode() if as_base64 else vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+        tokens = sum(estimate_tokens(str(text)) for text in inputs)
+        return await behavior.respond({
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }, error_body=error_body)
+
+    return app
+
+
+# ============================================
+# Supabase (PostgREST / RPC / Storage)
+# ============================================
+
+_FILTER_OPERATORS = {
+    "eq": lambda value, arg: _text(value) == arg,
+    "neq": lambda value, arg: _text(value) != arg,
+    "gt": lambda value, arg: value is not None and _compare(value, arg) > 0,
+    "gte": lambda value, arg: value is not None and _compare(value, arg) >= 0,
+    "lt": lambda value, arg: value is not None and _compare(value, arg) < 0,
+    "lte": lambda value, arg: value is not None and _compare(value, arg) <= 0,
+    "is": lambda value, arg: {"null": value is None, "true": value is True, "false": value is False}.get(arg, False),
+    "in": lambda value, arg: _text(value) in [v.strip().strip('"') for v in arg.strip("()").split(",")],
+    "like": lambda value, arg: value is not None and re.fullmatch(_like_pattern(arg), str(value)) is not None,
+    "ilike": lambda value, arg: value is not None and re.fullmatch(_like_pattern(arg), str(value), re.I) is not None,
+}
+# PostgREST 쿼리 파라미터 중 필터가 아닌 것
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _compare(value, arg):
+    try:
+        left, right = float(value), float(arg)
+    except (TypeError, ValueError):
+        left, right = str(value), arg
+    return (left > right) - (left < right)
+
+
+def _like_pattern(arg):
+    return ".*".join(re.escape(part) for part in arg.replace("*", "%").split("%"))
+
+
+def _parse_filters(query_params):
+    """쿼리 파라미터 → [(컬럼, 연산자, 인자, 부정 여부)]"""
+    filters = []
+    for column, expression in query_params.multi_items():
+        if column in _RESERVED_PARAMS:
+            continue
+        negate = expression.startswith("not.")
+        if negate:
+            expression = expression[4:]
+        operator, _, arg = expression.partition(".")
+        if operator not in _FILTER_OPERATORS:
+            raise ValueError(f"지원하지 않는 필터: {column}={expression}")
+        filters.append((column, operator, arg, negate))
+    return filters
+
+
+def _matches(row, filters):
+    for column, operator, arg, negate in filters:
+        if _FILTER_OPERATORS[operator](row.get(column), arg) == negate:
+            return False
+    return True
+
+
+def _apply_order(rows, order):
+    """order=created_at.desc,id.asc 형식 정렬 (NULL은 뒤로)"""
+    for term in reversed([t for t in (order or "").split(",") if t]):
+        column, *modifiers = term.split(".")
+        descending = "desc" in modifiers
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: r[column], reverse=descending)
+        rows = present + missing
+    return rows
+
+
+def _project(row, select):
+    if not select or select.strip() == "*":
+        return dict(row)
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    return {c: row.get(c) for c in columns}
+
+
+def _prefers(request, option):
+    return option in request.headers.get("prefer", "")
+
+
+class MockDatabase:
+    """테이블별 행 목록 (메모리) - 임베딩은 float32 배열로 보관"""
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS):
+        self.max_rows = max_rows
+        self.tables = {}
+        self.objects = {}  # Storage "버킷/경로" → 바이트 수
+
+    def table(self, name):
+        return self.tables.setdefault(name, [])
+
+    def insert(self, name, rows):
+        table = self.table(name)
+        inserted = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", _now_iso())
+            if isinstance(row.get("embedding"), (list, str)):
+                embedding = json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"]
+                row["embedding"] = np.asarray(embedding, dtype=np.float32)
+            table.append(row)
+            inserted.append(row)
+        if len(table) > self.max_rows:
+            del table[:len(table) - self.max_rows]
+        return inserted
+
+    def match_documents(self, query_embedding, match_threshold=0.5, match_count=5,
+                        filter_company_id=None, filter_file_type=None):
+        """supabase_setup.sql의 match_documents와 같은 결과 (코사인 유사도 내림차순)"""
+        rows = [
+            r for r in self.table("document_embeddings")
+            if isinstance(r.get("embedding"), np.ndarray)
+            and (filter_company_id is None or r.get("company_id") == filter_company_id)
+            and (filter_file_type is None or r.get("file_type") == filter_file_type)
+        ]
+        if not rows:
+            return []
+        matrix = np.stack([r["embedding"] for r in rows])
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        similarity = matrix @ query / np.where(norms == 0, 1.0, norms)
+        order = np.argsort(-similarity)
+        results = []
+        for index in order[:match_count]:
+            if similarity[index] <= match_threshold:
+                break
+            row = rows[index]
+            results.append({
+                "id": row["id"], "company_id": row.get("company_id"), "chunk_text": row.get("chunk_text"),
+                "similarity": float(similarity[index]), "token_count": row.get("token_count"),
+                "file_type": row.get("file_type"),
+            })
+        return results
+
+
+def _serialize_row(row):
+    if isinstance(row.get("embedding"), np.ndarray):
+        row = dict(row)
+        # pgvector는 문자열 "[0.1,0.2,...]"로 반환
+        row["embedding"] = "[" + ",".join(f"{v:.6g}" for v in row["embedding"]) + "]"
+    return row
+
+
+def make_supabase_app(behavior=None, max_rows=DEFAULT_MAX_ROWS):
+    """모의 Supabase 서버 (SUPABASE_URL=http://host:port, SUPABASE_KEY는 JWT 형식 아무 값)
+
+    - /rest/v1/{table}: GET(select/필터/order/limit/offset, Prefer: count=exact) · POST · PATCH · DELETE
+      (Prefer: return=representation이면 변경된 행 반환)
+    - /rest/v1/rpc/match_documents: document_embeddings 코사인 유사도 검색
+    - /storage/v1/object/{bucket}/{path}: 업로드 (x-upsert가 아니면 중복 경로는 409)
+    """
+    behavior = behavior or MockBehavior()
+    app = _create_mock_app("Mock Supabase", behavior)
+    db = app.state.db = MockDatabase(max_rows)
+
+    def error_body(status):
+        return {"code": f"MOCK{status}", "details": None, "hint": None, "message": f"injected {status}"}
+
+    def bad_request(message, status=400, code="PGRST100"):
+        return JSONResponse({"code": code, "details": None, "hint": None, "message": message}, status_code=status)
+
+    def rows_response(request, rows, status=200, total=None):
+        if not _prefers(request, "return=representation") and request.method != "GET":
+            return Response(status_code=204 if request.method != "POST" else 201)
+        select = request.query_params.get("select")
+        body = [_serialize_row(_project(row, select)) for row in rows]
+        headers = {}
+        if request.method == "GET":
+            offset = int(request.query_params.get("offset", 0))
+            end = offset + len(body) - 1
+            headers["Content-Range"] = f"{offset}-{end}/{total if total is not None else '*'}" if body \
+                else f"*/{total if total is not None else '*'}"
+        return JSONResponse(body, status_code=status, headers=headers)
+
+    @app.get("/rest/v1/{table}")
+    async def select_rows(table: str, request: Request):
+        try:
+            filters = _parse_filters(request.query_params)
+        except ValueError as e:
+            return bad_request(str(e))
+        rows = [r for r in db.table(table) if _matches(r, filters)]
+        total = len(rows) if _prefers(request, "count=exact") else None
+        rows = _apply_order(rows, request.query_params.get("order"))
+        offset = int(request.query_params.get("offset", 0))
+        limit = request.query_params.get("limit")
+        rows = rows[offset:offset + int(limit) if limit else None]
+        return await behavior.respond(rows_response(request, rows, total=total), error_body=error_body)
+
+    @app.post("/rest/v1/{table}")
+    async def insert_rows(table: str, request: Request):
+        payload = await request.json()
+        rows = payload if isinstance(payload, list) else [payload]
+        if not all(isinstance(row, dict) for row in rows):
+            return bad_request("행은 JSON 객체여야 합니다")
+        if error := await behavior.gate(error_body=error_body):
+            return error
+        return rows_response(request, db.insert(table, rows), status=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def update_rows(table: str, request: Request):
+        changes = await request.json()
+        try:
+            filters = _parse_filters(request.query_params)
+        except ValueError as e:
+            return bad_request(str(e))
+        if error := await behavior.gate(error_body=error_body):
+            return error
+        updated = []
+        for row in db.table(table):
+            if _matches(row, filters):
+                row.update(changes)
+                updated.append(row)
+        return rows_response(request, updated)
+
+    @app.delete("/rest/v1/{table}")
+    async def delete_rows(table: str, request: Request):
+        try:
+            filters = _parse_filters(request.query_params)
+        except ValueError as e:
+            return bad_request(str(e))
+        if error := await behavior.gate(error_body=error_body):
+            return error
+        rows = db.table(table)
+        deleted = [r for r in rows if _matches(r, filters)]
+        rows[:] = [r for r in rows if not _matches(r, filters)]
+        return rows_response(request, deleted)
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def rpc(function: str, request: Request):
+        if function != "match_documents":
+            return bad_request(f"Could not find the function public.{function}", status=404, code="PGRST202")
+        params = await request.json()
+        query = params.get("query_embedding")
+        if isinstance(query, str):
+            query = json.loads(query)
+        if not query:
+            return bad_request("query_embedding이 필요합니다")
+        results = db.match_documents(
+            query,
+            match_threshold=params.get("match_threshold", 0.5),
+            match_count=params.get("match_count", 5),
+            filter_company_id=params.get("filter_company_id"),
+            filter_file_type=params.get("filter_file_type"),
+        )
+        return await behavior.respond(results, error_body=error_body)
+
+    @app.api_route("/storage/v1/object/{bucket}/{path:path}", methods=["POST", "PUT"])
+    async def upload_object(bucket: str, path: str, request: Request):
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+        error = await behavior.gate(error_body=lambda status: {
+            "statusCode": str(status), "error": "Mock", "message": f"injected {status}",
+        })
+        if error is not None:
+            return error
+        key = f"{bucket}/{path}"
+        upsert = request.headers.get("x-upsert", "false").lower() == "true" or request.method == "PUT"
+        if key in db.objects and not upsert:
+            return JSONResponse({"statusCode": "409", "error": "Duplicate",
+                                 "message": "The resource already exists"}, status_code=400)
+        db.objects[key] = size
+        return JSONResponse({"Key": key, "Id": str(uuid.uuid4())})
+
+    return app
+
+
+def _print_settings(host, ports):
+    upstage, openai, supabase = (f"http://{host}:{port}" for port in ports)
+    print("🧪 모의 서버 실행 중 - 아래 환경변수로 앱 / ocr_server 실행")
+    print(f"UPSTAGE_DIGITIZATION_URL={upstage}/v1/document-digitization")
+    print(f"UPSTAGE_API_URL={upstage}/v1/document-ai/document-parse")
+    print("UPSTAGE_API_KEY=mock-upstage-key")
+    print(f"OPENAI_BASE_URL={openai}/v1")
+    print("OPENAI_API_KEY=mock-openai-key")
+    print(f"SUPABASE_URL={supabase}")
+    print("SUPABASE_KEY=mock.mock.mock")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 모의 Upstage / OpenAI / Supabase 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--upstage-port", type=int, default=DEFAULT_UPSTAGE_PORT)
+    parser.add_argument("--openai-port", type=int, default=DEFAULT_OPENAI_PORT)
+    parser.add_argument("--supabase-port", type=int, default=DEFAULT_SUPABASE_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="모든 서버 기본 지연(초)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="지연 ± 범위(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="실패 주입 확률 (0~1)")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", type=float, default=None, help="실패 응답의 Retry-After(초)")
+    parser.add_argument("--upstage-latency", type=float, help="Upstage 지연(초) - 기본값 --latency")
+    parser.add_argument("--openai-latency", type=float, help="OpenAI 지연(초) - 기본값 --latency")
+    parser.add_argument("--supabase-latency", type=float, help="Supabase 지연(초) - 기본값 --latency")
+    parser.add_argument("--page-latency", type=float, default=0.0, help="Upstage 페이지당 추가 지연(초)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="OpenAI 응답 토큰당 추가 지연(초)")
+    parser.add_argument("--completion-tokens", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    def behavior(latency):
+        return MockBehavior(
+            latency=args.latency if latency is None else latency, jitter=args.jitter, error_rate=args.error_rate,
+            error_status=args.error_status, retry_after=args.retry_after, seed=args.seed,
+        )
+
+    apps = [
+        (make_upstage_app(behavior(args.upstage_latency), page_latency=args.page_latency), args.upstage_port),
+        (make_openai_app(behavior(args.openai_latency), completion_tokens=args.completion_tokens,
+                         token_latency=args.token_latency), args.openai_port),
+        (make_supabase_app(behavior(args.supabase_latency)), args.supabase_port),
+    ]
+    servers = [serve_in_thread(app, port, args.host) for app, port in apps]
+    _print_settings(args.host, [port for _, port in apps])
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
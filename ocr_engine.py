@@ -0,0 +1,349 @@
+"""
+🔤 로컬 EasyOCR 엔진
+Upstage가 없을 때 쓰는 EasyOCR 폴백을 배치/사전 로딩 방식으로 실행
+- 프로세스 시작 시 백그라운드 스레드에서 easyocr.Reader 로딩 (첫 요청이 모델 로딩을 기다리지 않음)
+- 렌더링한 페이지를 readtext_batched로 묶어 검출/인식
+- 페이지별 소요 시간(렌더링 + 배치 OCR 분담분) 기록
+- 스캔 PDF용 멀티 프로세스 워커 풀 (프로세스마다 Reader, 이미지는 공유 메모리로 전달)
+- 페이지 크기/글자 높이에 맞춘 적응형 렌더링 배율, 그레이스케일 직접 렌더링
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from pdf_extraction import PageRecord
+
+# 기본 언어 / 배치 크기
+DEFAULT_LANGUAGES = ("ko", "en")
+DEFAULT_BATCH_SIZE = int(os.getenv("EASYOCR_BATCH_SIZE", "4"))
+
+# 렌더링 배율: 본문 글자가 목표 픽셀 높이가 되도록 (A4 10pt 본문 → 2배)
+TARGET_GLYPH_PX = float(os.getenv("OCR_TARGET_GLYPH_PX", "20"))
+DEFAULT_GLYPH_PT = 10.0  # 텍스트 레이어가 없는 스캔 페이지의 가정 본문 크기
+# EasyOCR 검출기는 긴 변 2560px(canvas_size)로 줄여서 처리하므로 그 이상은 낭비
+MAX_RENDER_SIDE = int(os.getenv("OCR_MAX_RENDER_SIDE", "2560"))
+MIN_RENDER_SCALE = 1.0
+MAX_RENDER_SCALE = 4.0
+
+# 워커 풀 프로세스 수 (1 이하면 풀 없이 현재 프로세스에서 처리)
+DEFAULT_OCR_WORKERS = int(os.getenv("EASYOCR_WORKERS", "1"))
+
+
+class OCREngine:
+    """easyocr.Reader 래퍼 - 백그라운드 사전 로딩 + 배치 인식"""
+
+    def __init__(self, languages=DEFAULT_LANGUAGES, gpu=False, batch_size=DEFAULT_BATCH_SIZE):
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.batch_size = max(1, batch_size)
+        self.load_ms = None
+        self.load_error = None
+        self._reader = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def warm_up(self):
+        """백그라운드 스레드에서 Reader 로딩 시작 (이미 시작했으면 무시)"""
+        with self._lock:
+            if self._thread is None and not self._ready.is_set():
+                self._thread = threading.Thread(target=self._load, name="easyocr-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            import easyocr
+            self._reader = easyocr.Reader(self.languages, gpu=self.gpu, verbose=False)
+        except Exception as e:
+            self.load_error = e
+            print(f"⚠️ EasyOCR 로딩 실패: {e}")
+        finally:
+            self.load_ms = (time.perf_counter() - start) * 1000
+            self._ready.set()
+
+    @property
+    def is_ready(self):
+        return self._ready.is_set() and self._reader is not None
+
+    def get_reader(self, timeout=None):
+        """로딩된 Reader 반환 (로딩 중이면 완료까지 대기)"""
+        self.warm_up()
+        if not self._ready.wait(timeout):
+            raise TimeoutError("EasyOCR 모델 로딩 대기 시간 초과")
+        if self._reader is None:
+            raise RuntimeError(f"EasyOCR 로딩 실패: {self.load_error}")
+        return self._reader
+
+    def readtext(self, image):
+        """이미지 한 장 OCR (문단 단위 텍스트 리스트)"""
+        return self.get_reader().readtext(image, detail=0, paragraph=True)
+
+    def readtext_batch(self, images, pad_multiple=None):
+        """여러 이미지 OCR - 같은 크기끼리 묶어 readtext_batched 호출, 입력 순서대로 반환
+
+        pad_multiple을 주면 크기가 제각각인 이미지도 흰 여백으로 그 배수 크기에 맞춰 같이 묶음
+        """
+        reader = self.get_reader()
+        if pad_multiple:
+            images = [pad_image(image, pad_multiple) for image in images]
+        results = [None] * len(images)
+        groups = {}
+        for index, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(index)
+
+        # readtext_batched는 한 배치 안의 이미지 크기가 같아야 함 (PDF 페이지는 대부분 동일)
+        for indexes in groups.values():
+            if len(indexes) == 1:
+                results[indexes[0]] = reader.readtext(images[indexes[0]], detail=0, paragraph=True)
+                continue
+            batch_results = reader.readtext_batched(
+                [images[i] for i in indexes],
+                detail=0,
+                paragraph=True,
+                batch_size=self.batch_size,
+            )
+            for index, texts in zip(indexes, batch_results):
+                results[index] = texts
+        return results
+
+
+def pad_image(image, multiple):
+    """그레이스케일 이미지 오른쪽/아래를 흰색으로 채워 가로·세로를 multiple의 배수로 맞춤"""
+    height, width = image.shape[:2]
+    padded_height = -(-height // multiple) * multiple
+    padded_width = -(-width // multiple) * multiple
+    if (padded_height, padded_width) == (height, width):
+        return image
+    padded = np.full((padded_height, padded_width) + image.shape[2:], 255, dtype=image.dtype)
+    padded[:height, :width] = image
+    return padded
+
+
+def estimate_glyph_pt(page):
+    """본문 글자 크기(pt) 추정 - 텍스트 레이어 span 크기의 중앙값, 없으면 기본값"""
+    sizes = sorted(
+        span["size"]
+        for block in page.get_text("dict").get("blocks", [])
+        for line in block.get("lines", [])
+        for span in line.get("spans", [])
+        if span.get("text", "").strip()
+    )
+    return sizes[len(sizes) // 2] if sizes else DEFAULT_GLYPH_PT
+
+
+def adaptive_render_scale(page, glyph_pt=None):
+    """글자가 TARGET_GLYPH_PX 높이가 되는 배율 (긴 변 MAX_RENDER_SIDE 이내)"""
+    glyph_pt = glyph_pt or estimate_glyph_pt(page)
+    scale = TARGET_GLYPH_PX / glyph_pt
+    long_side = max(page.rect.width, page.rect.height) or 1
+    scale = min(scale, MAX_RENDER_SIDE / long_side)
+    return max(MIN_RENDER_SCALE, min(scale, MAX_RENDER_SCALE))
+
+
+def render_page_image(page, scale=None):
+    """페이지를 OCR 입력용 그레이스케일 배열(연속 uint8, H x W)로 렌더링
+
+    colorspace=GRAY, alpha=False로 바로 렌더링하므로 RGB(A) → 3채널 슬라이싱 복사가 없고
+    픽셀 데이터도 1/3로 줄어듭니다. scale을 생략하면 adaptive_render_scale 사용.
+    """
+    if scale is None:
+        scale = adaptive_render_scale(page)
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+    img_array = np.frombuffer(pix.samples, dtype=np.uint8)
+    if pix.stride != pix.width:
+        # 행 패딩이 있는 경우에만 잘라서 연속 배열로 복사
+        return np.ascontiguousarray(img_array.reshape(pix.height, pix.stride)[:, :pix.width])
+    return img_array.reshape(pix.height, pix.width)
+
+
+def iter_ocr_page_records(pdf_bytes, engine, max_pages=50, pages=None, batch_size=None):
+    """PDF 페이지를 batch_size장씩 렌더링 → 배치 OCR → PageRecord 생성 (pages: 1부터)"""
+    batch_size = batch_size or engine.batch_size
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        num_pages = min(len(doc), max_pages)
+        page_nums = [p - 1 for p in pages if 1 <= p <= num_pages] if pages else list(range(num_pages))
+        for batch_start in range(0, len(page_nums), batch_size):
+            batch = page_nums[batch_start:batch_start + batch_size]
+            images, render_ms = [], []
+            for page_num in batch:
+                render_start = time.perf_counter()
+                images.append(render_page_image(doc[page_num]))
+                render_ms.append((time.perf_counter() - render_start) * 1000)
+
+            ocr_start = time.perf_counter()
+            batch_texts = engine.readtext_batch(images)
+            # 배치 OCR 시간은 페이지 수로 균등 분담
+            ocr_share_ms = (time.perf_counter() - ocr_start) * 1000 / len(batch)
+            del images
+
+            for page_num, texts, page_render_ms in zip(batch, batch_texts, render_ms):
+                yield PageRecord(page_num + 1, "\n".join(texts), "easyocr", page_render_ms + ocr_share_ms)
+    finally:
+        doc.close()
+
+
+_default_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_ocr_engine():
+    """프로세스 공용 OCR 엔진 (Streamlit 재실행에도 유지)"""
+    global _default_engine
+    with _engine_lock:
+        if _default_engine is None:
+            _default_engine = OCREngine(gpu=os.getenv("EASYOCR_GPU", "false").lower() == "true")
+    return _default_engine
+
+
+# 워커 프로세스별 Reader (initializer에서 한 번만 로딩)
+_worker_reader = None
+
+
+def _init_ocr_worker(languages, gpu, num_threads):
+    """워커 초기화: torch 스레드 수 제한 후 자체 Reader 로딩"""
+    global _worker_reader
+    import torch
+    import easyocr
+
+    # 프로세스마다 전체 코어를 쓰면 서로 경쟁하므로 코어를 나눠 가짐
+    torch.set_num_threads(num_threads)
+    _worker_reader = easyocr.Reader(list(languages), gpu=gpu, verbose=False)
+
+
+def _ocr_worker_ping():
+    """워커 사전 기동용 (initializer 완료 확인)"""
+    return os.getpid()
+
+
+def _ocr_worker_image(shm_name, shape):
+    """워커: 공유 메모리의 이미지를 복사 없이 배열로 보고 OCR"""
+    start = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        texts = _worker_reader.readtext(image, detail=0, paragraph=True)
+        del image
+    finally:
+        shm.close()
+    return texts, (time.perf_counter() - start) * 1000
+
+
+class OCRWorkerPool:
+    """EasyOCR 멀티 프로세스 풀 - 프로세스마다 Reader를 들고 페이지 이미지를 나눠 처리"""
+
+    def __init__(self, workers=DEFAULT_OCR_WORKERS, threads_per_worker=None, languages=DEFAULT_LANGUAGES, gpu=False):
+        self.workers = max(1, workers)
+        cpu_count = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.workers)
+        self.languages = tuple(languages)
+        self.gpu = gpu
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # torch는 fork 후 스레드 풀이 꼬일 수 있으므로 spawn 사용
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_ocr_worker,
+                    initargs=(self.languages, self.gpu, self.threads_per_worker),
+                )
+            return self._executor
+
+    def warm_up(self):
+        """워커 프로세스를 미리 띄워 모델 로딩 (백그라운드, 결과는 기다리지 않음)"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(_ocr_worker_ping)
+        return self
+
+    def iter_page_records(self, pdf_bytes, max_pages=50, pages=None):
+        """페이지를 렌더링해 공유 메모리로 워커에 전달, 페이지 순서대로 PageRecord 생성
+
+        렌더링은 현재 프로세스에서 하고, 동시에 떠 있는 이미지는 워커 수의 2배로 제한해
+        공유 메모리 사용량을 묶어 둡니다.
+        """
+        executor = self._get_executor()
+        max_in_flight = self.workers * 2
+        pending = deque()  # (page_num, render_ms, shm, future)
+
+        def finish(item):
+            page_num, render_ms, shm, future = item
+            try:
+                texts, ocr_ms = future.result()
+            finally:
+                shm.close()
+                shm.unlink()
+            return PageRecord(page_num + 1, "\n".join(texts), "easyocr", render_ms + ocr_ms)
+
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            num_pages = min(len(doc), max_pages)
+            page_nums = [p - 1 for p in pages if 1 <= p <= num_pages] if pages else range(num_pages)
+            for page_num in page_nums:
+                render_start = time.perf_counter()
+                image = render_page_image(doc[page_num])
+                shape = image.shape
+                shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+                np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[...] = image
+                render_ms = (time.perf_counter() - render_start) * 1000
+                del image
+                try:
+                    future = executor.submit(_ocr_worker_image, shm.name, shape)
+                except Exception:
+                    shm.close()
+                    shm.unlink()
+                    raise
+                pending.append((page_num, render_ms, shm, future))
+                if len(pending) >= max_in_flight:
+                    yield finish(pending.popleft())
+            while pending:
+                yield finish(pending.popleft())
+        finally:
+            doc.close()
+            # 중간에 중단된 경우 남은 공유 메모리 정리
+            while pending:
+                _, _, shm, future = pending.popleft()
+                future.cancel()
+                try:
+                    future.exception()
+                except Exception:
+                    pass
+                shm.close()
+                shm.unlink()
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_default_pool = None
+
+
+def get_ocr_pool():
+    """프로세스 공용 OCR 워커 풀 (EASYOCR_WORKERS가 1 이하면 None)"""
+    global _default_pool
+    if DEFAULT_OCR_WORKERS <= 1:
+        return None
+    with _engine_lock:
+        if _default_pool is None:
+            _default_pool = OCRWorkerPool(
+                workers=DEFAULT_OCR_WORKERS,
+                gpu=os.getenv("EASYOCR_GPU", "false").lower() == "true",
+            )
+    return _default_pool
@@ -6,20 +6,100 @@ Upstage Document Parse API를 FastAPI로 감싸서 원격 호출
 - 이미지 + 텍스트 통합 분석
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Header
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+from starlette.formparsers import MultiPartException, MultiPartParser, parse_options_header
+from pathlib import Path
+import asyncio
+import hashlib
+import threading
+import time
+from PIL import Image, UnidentifiedImageError
+import httpx
 import io
+import mmap
 import os
+import struct
 import logging
 import json
-import base64
+import zlib
+
+from metrics import MetricsRegistry, SIZE_BUCKETS
+from resilience import CircuitOpenError, get_upstream_guard
+
+try:
+    import fitz  # PyMuPDF (선택 - /ocr-pdf 스트리밍 시 페이지 창 분할)
+except ImportError:
+    fitz = None
+
+try:
+    import orjson  # 선택 - 큰 응답 JSON 직렬화 가속
+except ImportError:
+    orjson = None
+
+try:
+    import brotli  # 선택 - Accept-Encoding: br 응답 압축
+except ImportError:
+    brotli = None
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Document Parse API Server (Upstage)", version="3.0.0")
+# Upstage 호출용 공용 비동기 HTTP 클라이언트 (연결 풀 + keep-alive)
+# 동기 requests.post는 이벤트 루프를 막아 다른 요청까지 직렬화되므로 사용하지 않음
+UPSTAGE_MAX_CONNECTIONS = int(os.getenv("UPSTAGE_MAX_CONNECTIONS", "20"))
+UPSTAGE_MAX_KEEPALIVE = int(os.getenv("UPSTAGE_MAX_KEEPALIVE", "10"))
+http_client: httpx.AsyncClient | None = None
+
+# /ocr-batch 동시 처리 항목 수 상한
+OCR_BATCH_MAX_IN_FLIGHT = int(os.getenv("OCR_BATCH_MAX_IN_FLIGHT", "8"))
+
+# /ocr-pdf 업로드 파일은 이 크기까지만 메모리에, 넘으면 임시 파일(디스크)로 보관
+OCR_SPOOL_THRESHOLD = int(float(os.getenv("OCR_SPOOL_THRESHOLD_MB", "1")) * 1024 * 1024)
+
+# /ocr-pdf 스트리밍 시 한 번에 Upstage로 보내는 페이지 수
+OCR_PDF_WINDOW_PAGES = int(os.getenv("OCR_PDF_WINDOW_PAGES", "5"))
+
+# 응답 압축 (Accept-Encoding 협상) - 이 크기 미만의 단일 응답은 압축하지 않음
+OCR_COMPRESSION_ENABLED = os.getenv("OCR_COMPRESSION_ENABLED", "true").lower() == "true"
+OCR_COMPRESSION_MIN_BYTES = int(os.getenv("OCR_COMPRESSION_MIN_BYTES", "1024"))
+OCR_GZIP_LEVEL = int(os.getenv("OCR_GZIP_LEVEL", "6"))
+OCR_BROTLI_QUALITY = int(os.getenv("OCR_BROTLI_QUALITY", "4"))
+
+# 업로드 해시 계산 시 한 번에 읽는 크기
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """서버 시작 시 HTTP 클라이언트 생성, 종료 시 연결 정리"""
+    global http_client
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=UPSTAGE_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTAGE_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    logger.info(f"🔌 HTTP 클라이언트 준비 (최대 연결 {UPSTAGE_MAX_CONNECTIONS}개)")
+    global ocr_backend
+    ocr_backend = create_ocr_backend(OCR_ENGINE)
+    await ocr_backend.start()
+    logger.info(f"🔤 OCR 엔진: {ocr_backend.name}")
+    try:
+        yield
+    finally:
+        await ocr_backend.close()
+        await http_client.aclose()
+        http_client = None
+
+
+app = FastAPI(title="Document Parse API Server (Upstage)", version="3.0.0", lifespan=lifespan)
 
 # CORS 설정 (모든 출처 허용)
 app.add_middleware(
@@ -30,6 +110,333 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ============================================
+# 메트릭 (/metrics, Prometheus 텍스트 형식)
+# ============================================
+metrics = MetricsRegistry()
+HTTP_REQUESTS = metrics.counter(
+    "ocr_http_requests_total", "HTTP 요청 수", ("endpoint", "method", "status")
+)
+HTTP_DURATION = metrics.histogram(
+    "ocr_http_request_duration_seconds", "HTTP 요청 처리 시간 (스트리밍 응답은 마지막 바이트까지)", ("endpoint",)
+)
+HTTP_IN_FLIGHT = metrics.gauge("ocr_http_requests_in_flight", "처리 중인 HTTP 요청 수", ("endpoint",))
+HTTP_REQUEST_BYTES = metrics.histogram(
+    "ocr_http_request_size_bytes", "요청 본문 크기", ("endpoint",), buckets=SIZE_BUCKETS
+)
+HTTP_RESPONSE_BYTES = metrics.histogram(
+    "ocr_http_response_size_bytes", "응답 본문 크기", ("endpoint",), buckets=SIZE_BUCKETS
+)
+UPSTREAM_DURATION = metrics.histogram(
+    "ocr_upstream_request_duration_seconds", "upstream 호출 시간", ("upstream", "status")
+)
+UPSTREAM_IN_FLIGHT = metrics.gauge("ocr_upstream_requests_in_flight", "진행 중인 upstream 호출 수", ("upstream",))
+UPSTREAM_RESPONSE_BYTES = metrics.histogram(
+    "ocr_upstream_response_size_bytes", "upstream 응답 크기", ("upstream",), buckets=SIZE_BUCKETS
+)
+UPSTREAM_RETRIES = metrics.counter("ocr_upstream_retries_total", "upstream 재시도 수", ("upstream",))
+metrics.callback(
+    "ocr_upstream_circuit_open", "upstream 서킷 열림 여부 (1: 열림/시험 중, 0: 정상)",
+    lambda: {("upstage",): int(get_upstream_guard(UPSTAGE_API_URL).breaker.state != "closed")},
+    labelnames=("upstream",),
+)
+metrics.callback(
+    "ocr_upstream_rejected_total", "서킷이 열려 호출 없이 바로 실패한 수",
+    lambda: {("upstage",): get_upstream_guard(UPSTAGE_API_URL).breaker.rejected},
+    labelnames=("upstream",), kind="counter",
+)
+LOCAL_BATCH_DURATION = metrics.histogram(
+    "ocr_local_batch_duration_seconds", "로컬 OCR 엔진 배치 처리 시간", ("engine",)
+)
+LOCAL_BATCH_SIZE = metrics.histogram(
+    "ocr_local_batch_size", "로컬 OCR 엔진 배치 크기", ("engine",), buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+metrics.callback(
+    "ocr_cache_lookups_total", "결과 캐시 조회 수",
+    lambda: dict(zip((("hit",), ("miss",)), result_cache.lookup_counts())) if result_cache is not None else {},
+    labelnames=("result",), kind="counter",
+)
+metrics.callback(
+    "ocr_cache_entries", "결과 캐시 항목 수",
+    lambda: {(): result_cache.stats()["entries"]} if result_cache is not None else {},
+)
+metrics.callback(
+    "ocr_cache_size_bytes", "결과 캐시 디스크 사용량",
+    lambda: {(): result_cache.stats()["bytes"]} if result_cache is not None else {},
+)
+metrics.callback(
+    "ocr_single_flight_coalesced_total", "진행 중인 동일 요청에 합쳐진 요청 수",
+    lambda: {(): single_flight.coalesced}, kind="counter",
+)
+
+
+class MetricsMiddleware:
+    """요청별 처리 시간 / 본문 크기 / 진행 중 수 기록
+
+    순수 ASGI 미들웨어라 응답을 감싸 복사하지 않고, 스트리밍 응답도 마지막 조각까지 측정합니다.
+    라벨은 등록된 경로만 그대로 쓰고 나머지는 "other" (시계열 수 고정)
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._endpoints = None
+
+    def _endpoint(self, scope):
+        if self._endpoints is None:
+            self._endpoints = {route.path for route in scope["app"].routes}
+        return scope["path"] if scope["path"] in self._endpoints else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        endpoint = self._endpoint(scope)
+        start = time.perf_counter()
+        state = {"status": 500, "request_bytes": 0, "response_bytes": 0}
+        
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["request_bytes"] += len(message.get("body", b""))
+            return message
+        
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["response_bytes"] += len(message.get("body", b""))
+            await send(message)
+        
+        HTTP_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+            HTTP_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+            HTTP_REQUEST_BYTES.observe(state["request_bytes"], endpoint=endpoint)
+            HTTP_RESPONSE_BYTES.observe(state["response_bytes"], endpoint=endpoint)
+            HTTP_REQUESTS.inc(endpoint=endpoint, method=scope["method"], status=state["status"])
+
+
+# ============================================
+# 응답 직렬화 / 압축
+# ============================================
+JSON_SERIALIZER = "orjson" if orjson is not None else "json"
+# 서버 선호 순서 (q값이 같으면 앞쪽)
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+# 응답에 담을 수 있는 표현 형식 (문서 / 페이지 / 요소 content 단위)
+REPRESENTATIONS = ("text", "html", "markdown")
+
+RESPONSE_SERIALIZE_SECONDS = metrics.histogram(
+    "ocr_response_serialize_seconds", "응답 JSON 직렬화 CPU 시간 (NDJSON은 줄마다)", ("serializer",)
+)
+RESPONSE_COMPRESS_SECONDS = metrics.histogram(
+    "ocr_response_compress_seconds", "응답 하나의 압축 CPU 시간", ("encoding",)
+)
+RESPONSE_UNCOMPRESSED_BYTES = metrics.histogram(
+    "ocr_response_uncompressed_size_bytes", "압축 전 응답 본문 크기 (압축한 응답만)", ("encoding",),
+    buckets=SIZE_BUCKETS,
+)
+
+
+def _json_default(value):
+    # numpy 값 등 (로컬 OCR 엔진 결과)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"JSON으로 직렬화할 수 없는 값: {type(value).__name__}")
+
+
+def dumps_json(content):
+    """JSON 직렬화 → UTF-8 바이트 (orjson이 있으면 사용, 없으면 표준 json)"""
+    start = time.thread_time()
+    if orjson is not None:
+        body = orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+    RESPONSE_SERIALIZE_SECONDS.observe(time.thread_time() - start, serializer=JSON_SERIALIZER)
+    return body
+
+
+class FastJSONResponse(Response):
+    """dumps_json으로 직렬화하는 JSON 응답
+
+    엔드포인트에서 직접 반환하면 FastAPI의 jsonable_encoder 변환(응답 전체 복사)도 생략됩니다.
+    """
+    media_type = "application/json"
+    
+    def render(self, content):
+        return dumps_json(content)
+
+
+def parse_formats(value):
+    """formats 쿼리 값("text,html") → 남길 표현 집합 (비어 있으면 None = 전부)"""
+    if not value:
+        return None
+    formats = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = formats - set(REPRESENTATIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown formats: {', '.join(sorted(unknown))} (allowed: {', '.join(REPRESENTATIONS)})",
+        )
+    return formats
+
+
+def _trim_element(element, formats):
+    content = element.get("content")
+    if not isinstance(content, dict):
+        return element
+    element = dict(element)
+    element["content"] = {k: v for k, v in content.items() if k not in REPRESENTATIONS or k in formats}
+    return element
+
+
+def trim_representations(payload, formats=None, include_elements=True):
+    """요청하지 않은 표현(text/html/markdown)과 요소 목록을 뺀 응답 (얕은 복사 - 캐시된 원본은 그대로)"""
+    if formats is None and include_elements:
+        return payload
+    payload = dict(payload)
+    if formats is not None:
+        for name in REPRESENTATIONS:
+            if name not in formats:
+                payload.pop(name, None)
+    if "elements" in payload:
+        if not include_elements:
+            del payload["elements"]
+        elif formats is not None:
+            payload["elements"] = [_trim_element(element, formats) for element in payload["elements"]]
+    if "pages" in payload:
+        payload["pages"] = [trim_representations(page, formats, include_elements) for page in payload["pages"]]
+    return payload
+
+
+def negotiate_encoding(accept_encoding):
+    """Accept-Encoding 헤더 → 사용할 압축 방식 (없으면 None) - q값이 같으면 서버 선호 순서"""
+    if not accept_encoding:
+        return None
+    offered = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = offered.get(encoding, offered.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class ResponseCompressor:
+    """압축 스트림 하나 - 조각마다 flush해 지금까지 받은 데이터를 바로 풀 수 있게 함"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.cpu_seconds = 0.0
+        self.input_bytes = 0
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=OCR_BROTLI_QUALITY)
+        else:
+            # wbits 31: gzip 헤더/트레일러
+            self._compressor = zlib.compressobj(OCR_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data, final=False):
+        start = time.thread_time()
+        self.input_bytes += len(data)
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            out += self._compressor.finish() if final else self._compressor.flush()
+        else:
+            out = self._compressor.compress(data)
+            out += self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        self.cpu_seconds += time.thread_time() - start
+        return out
+
+
+class CompressionMiddleware:
+    """Accept-Encoding에 따라 JSON / NDJSON / 텍스트 응답 압축 (br은 brotli 설치 시)
+
+    - 한 번에 보내는 응답은 OCR_COMPRESSION_MIN_BYTES 이상일 때만 압축하고 Content-Length를 다시 계산
+    - 스트리밍 응답은 조각마다 sync flush - 압축해도 페이지 결과가 준비되는 즉시 전달됨
+    - 이미 Content-Encoding이 있는 응답은 그대로
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not OCR_COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        
+        accept_encoding = next(
+            (value.decode("latin-1") for name, value in scope["headers"] if name == b"accept-encoding"), ""
+        )
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        state = {"start": None, "compressor": None, "passthrough": False}
+        
+        async def compressing_send(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    state["passthrough"] = True
+                    await send(message)
+                else:
+                    headers.add_vary_header("Accept-Encoding")
+                    # 첫 본문 조각을 보고 압축 여부 결정
+                    state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start_message = state["start"]
+            if start_message is not None:
+                state["start"] = None
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not more_body and len(body) < OCR_COMPRESSION_MIN_BYTES:
+                    state["passthrough"] = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                state["compressor"] = ResponseCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["Content-Length"]
+                    await send(start_message)
+            
+            compressor = state["compressor"]
+            compressed = compressor.compress(body, final=not more_body)
+            if not more_body:
+                RESPONSE_COMPRESS_SECONDS.observe(compressor.cpu_seconds, encoding=encoding)
+                RESPONSE_UNCOMPRESSED_BYTES.observe(compressor.input_bytes, encoding=encoding)
+            if start_message is not None and not more_body:
+                headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+        
+        await self.app(scope, receive, compressing_send)
+
+
+# 미들웨어는 나중에 추가한 것이 바깥 - 메트릭은 압축 후(실제 전송) 크기를 기록
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 # API 키 설정
 API_KEY = os.getenv("OCR_API_KEY", "your-secret-ocr-key-12345")  # 내부 인증용
 UPSTAGE_API_KEY = os.getenv("UPSTAGE_API_KEY", "")  # Upstage API 키
@@ -39,8 +446,628 @@ if not UPSTAGE_API_KEY:
 else:
     logger.info("✅ Upstage API 키 로드 완료")
 
-# Upstage API 엔드포인트
-UPSTAGE_API_URL = "https://api.upstage.ai/v1/document-ai/document-parse"
+# Upstage API 엔드포인트 (테스트 시 모의 서버 주소로 변경 가능)
+UPSTAGE_API_URL = os.getenv("UPSTAGE_API_URL", "https://api.upstage.ai/v1/document-ai/document-parse")
+
+
+# Upstage가 그대로 받는 형식 - 원본 바이트를 디코딩 없이 전달
+PASSTHROUGH_FORMATS = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "bmp": "image/bmp",
+    "tiff": "image/tiff",
+    "heic": "image/heic",
+    "pdf": "application/pdf",
+}
+
+
+class InvalidImageError(ValueError):
+    """업로드 이미지 헤더가 잘렸거나 읽을 수 없음 - 클라이언트에는 400"""
+
+
+def invalid_image_exception(error):
+    return HTTPException(status_code=400, detail=f"Invalid image: {error}")
+
+
+class InvalidPDFError(ValueError):
+    """업로드 PDF가 비어 있거나 열 수 없음 - 클라이언트에는 400"""
+
+
+def invalid_pdf_exception(error):
+    return HTTPException(status_code=400, detail=f"Invalid PDF: {error}")
+
+
+def sniff_image(contents):
+    """헤더만 보고 형식과 크기 판별 (전체 디코딩 없음) - (형식, (가로, 세로) 또는 None)
+
+    서명은 맞는데 크기 필드까지 헤더가 없으면 InvalidImageError
+    """
+    head = contents[:32]
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        if len(contents) < 24:
+            raise InvalidImageError(f"truncated PNG header ({len(contents)} bytes)")
+        width, height = struct.unpack(">II", contents[16:24])
+        return "png", (width, height)
+    if head.startswith(b"\xff\xd8"):
+        return "jpeg", _jpeg_size(contents)
+    if head.startswith(b"BM") and len(contents) >= 26:
+        width, height = struct.unpack("<ii", contents[18:26])
+        return "bmp", (width, abs(height))
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff", None
+    if head[4:8] == b"ftyp" and head[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "heic", None
+    if head.startswith(b"%PDF"):
+        return "pdf", None
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "webp", None
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        if len(contents) < 10:
+            raise InvalidImageError(f"truncated GIF header ({len(contents)} bytes)")
+        width, height = struct.unpack("<HH", contents[6:10])
+        return "gif", (width, height)
+    return "unknown", None
+
+
+def _jpeg_size(contents):
+    """JPEG SOF 마커에서 크기 읽기 (세그먼트 헤더만 따라감)"""
+    pos = 2
+    while pos + 9 < len(contents):
+        if contents[pos] != 0xFF:
+            return None
+        marker = contents[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        length = struct.unpack(">H", contents[pos + 2:pos + 4])[0]
+        # SOF0~SOF15 (DHT/JPG/DAC 제외)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", contents[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def _transcode_png(contents):
+    """지원하지 않는 형식만 PNG로 변환 (CPU 작업 - 스레드에서 실행)"""
+    try:
+        image = Image.open(io.BytesIO(contents))
+    except UnidentifiedImageError as e:
+        raise InvalidImageError("unrecognized image format") from e
+    
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    
+    image_bytes = io.BytesIO()
+    image.save(image_bytes, format='PNG')
+    return image_bytes.getvalue()
+
+
+async def prepare_upload(filename, contents):
+    """업로드 이미지를 Upstage 전송용 (파일명, 바이트, MIME)으로 준비
+
+    지원 형식은 원본 그대로, 나머지(WEBP/GIF 등)만 PNG로 변환합니다.
+    """
+    image_format, size = sniff_image(contents)
+    if image_format in PASSTHROUGH_FORMATS:
+        logger.info(f"🖼️ {image_format.upper()} 원본 전달 (크기: {size or '알 수 없음'})")
+        return filename, contents, PASSTHROUGH_FORMATS[image_format]
+    
+    logger.info(f"🔄 {image_format} 형식 → PNG 변환")
+    png_bytes = await asyncio.to_thread(_transcode_png, contents)
+    return f"{os.path.splitext(filename or 'image')[0]}.png", png_bytes, "image/png"
+
+
+async def post_to_upstage(files, data=None, timeout=30):
+    """공용 클라이언트로 Upstage에 업로드 (이벤트 루프를 막지 않음)
+
+    429/5xx/연결 오류는 resilience 계층에서 백오프 재시도 (Retry-After 존중),
+    연속 실패로 서킷이 열려 있으면 호출 없이 CircuitOpenError
+    """
+    headers = {"Authorization": f"Bearer {UPSTAGE_API_KEY}"}
+    
+    async def send():
+        start = time.perf_counter()
+        status = "error"
+        UPSTREAM_IN_FLIGHT.inc(upstream="upstage")
+        try:
+            response = await http_client.post(UPSTAGE_API_URL, headers=headers, files=files, data=data, timeout=timeout)
+            status = response.status_code
+            UPSTREAM_RESPONSE_BYTES.observe(len(response.content), upstream="upstage")
+            return response
+        finally:
+            UPSTREAM_IN_FLIGHT.dec(upstream="upstage")
+            UPSTREAM_DURATION.observe(time.perf_counter() - start, upstream="upstage", status=status)
+    
+    def on_retry(attempt, wait):
+        UPSTREAM_RETRIES.inc(upstream="upstage")
+        logger.warning(f"⚠️ Upstage 재시도 {attempt + 1}회 ({wait:.1f}초 후)")
+    
+    return await get_upstream_guard(UPSTAGE_API_URL).call_async(
+        send, retryable_exceptions=(httpx.TransportError,), on_retry=on_retry
+    )
+
+
+# ============================================
+# 결과 캐시 + 동일 요청 합치기 (single-flight)
+# ============================================
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR") or str(Path(__file__).parent / ".ocr_cache")
+OCR_CACHE_MAX_BYTES = int(float(os.getenv("OCR_CACHE_MAX_MB", "500")) * 1024 * 1024)
+OCR_CACHE_TTL_SECONDS = float(os.getenv("OCR_CACHE_TTL_HOURS", "24")) * 3600
+
+
+class UpstageAPIError(Exception):
+    """Upstage가 200이 아닌 응답을 반환"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code}: {text[:500]}")
+        self.status_code = status_code
+        self.text = text
+
+
+def hash_upload(fileobj):
+    """업로드 파일을 조금씩 읽어 (sha256, 크기) 계산 - 전체를 메모리에 올리지 않음"""
+    digest = hashlib.sha256()
+    size = 0
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(0)
+    return digest.hexdigest(), size
+
+
+def reopen_upload(fileobj):
+    """업로드 파일의 별도 핸들 - 요청이 끝나 원본 UploadFile이 닫혀도 계속 읽을 수 있음
+
+    디스크로 넘어간 임시 파일은 디스크립터를 복제해 복사 없이 열고 (이후 원본은 읽지 않음),
+    메모리에 있는 작은 파일(OCR_SPOOL_THRESHOLD 이하)만 복사합니다.
+    """
+    # SpooledTemporaryFile이 아직 메모리에 있으면 fileno() 호출 자체가 디스크로 넘기므로 먼저 확인
+    if getattr(fileobj, "_rolled", True):
+        try:
+            return os.fdopen(os.dup(fileobj.fileno()), "rb")
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            pass
+    position = fileobj.tell()
+    fileobj.seek(0)
+    data = fileobj.read()
+    fileobj.seek(position)
+    return io.BytesIO(data)
+
+
+class SpoolingMultiPartParser(MultiPartParser):
+    """파일 파트를 OCR_SPOOL_THRESHOLD까지만 메모리에 두고 넘으면 임시 파일로 보관"""
+    
+    spool_max_size = OCR_SPOOL_THRESHOLD
+    max_file_size = OCR_SPOOL_THRESHOLD  # Starlette 0.33 이전 속성 이름
+
+
+class SpoolingRequest(Request):
+    """multipart 본문을 SpoolingMultiPartParser로 읽는 요청 (SpoolingRoute 전용)"""
+    
+    async def _get_form(self, **kwargs):
+        content_type, _ = parse_options_header(self.headers.get("Content-Type"))
+        if self._form is None and content_type == b"multipart/form-data":
+            try:
+                self._form = await SpoolingMultiPartParser(self.headers, self.stream(), **kwargs).parse()
+            except MultiPartException as exc:
+                raise HTTPException(status_code=400, detail=exc.message)
+        return await super()._get_form(**kwargs)
+
+
+class SpoolingRoute(APIRoute):
+    """업로드 스풀 크기를 이 라우트에만 적용 (Starlette 전역 설정은 건드리지 않음)"""
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def spooling_handler(request):
+            return await handler(SpoolingRequest(request.scope, request.receive))
+        
+        return spooling_handler
+
+
+class UpstreamUnavailableError(UpstageAPIError):
+    """서킷이 열려 Upstage를 호출하지 않음 - 클라이언트에는 503 + Retry-After"""
+
+    def __init__(self, retry_in, text):
+        super().__init__(503, text)
+        self.retry_in = retry_in
+
+
+def unavailable_exception(error):
+    return HTTPException(
+        status_code=503,
+        detail=f"Upstage temporarily unavailable: {error.text}",
+        headers={"Retry-After": str(max(1, int(error.retry_in + 0.5)))},
+    )
+
+
+def make_result_key(contents, options=None, digest=None):
+    """파일 내용(또는 미리 계산한 sha256) + 요청 옵션으로 캐시 키 생성"""
+    digest = digest or hashlib.sha256(contents).hexdigest()
+    options_digest = hashlib.sha256(json.dumps(options or {}, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{digest}-{options_digest}"
+
+
+class ResultCache:
+    """Upstage 응답 디스크 캐시 (용량 초과 시 LRU 삭제, TTL 지나면 무효)"""
+
+    def __init__(self, cache_dir, max_bytes, ttl_seconds):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # get()은 여러 워커 스레드에서 동시에 호출되므로 카운터는 별도 락으로 보호 (정리 작업과 분리)
+        self._counter_lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+        if time.time() - payload.get("created_at", 0) > self.ttl_seconds:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            self._count(hit=False)
+            return None
+        # 최근 사용 시각 갱신 (LRU 기준)
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self._count(hit=True)
+        return payload["result"]
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def lookup_counts(self):
+        """(적중 수, 실패 수)"""
+        with self._counter_lock:
+            return self.hits, self.misses
+
+    def put(self, key, result):
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"created_at": time.time(), "result": result}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """TTL 동안 한 번도 쓰이지 않은 항목 삭제 후, 용량 초과분을 오래 안 쓴 순서로 삭제"""
+        now = time.time()
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        sizes = [path.stat().st_size for path in self.cache_dir.glob("*.json")]
+        hits, misses = self.lookup_counts()
+        lookups = hits + misses
+        return {
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SingleFlight:
+    """같은 키의 동시 요청은 진행 중인 upstream 호출 하나를 함께 기다림"""
+
+    def __init__(self):
+        self._calls = {}
+        self.coalesced = 0
+
+    async def do(self, key, func):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._calls.pop(key, None) if self._calls.get(key) is done else None)
+        else:
+            self.coalesced += 1
+        # 한 클라이언트가 끊겨도 다른 대기자를 위해 호출은 계속 진행
+        return await asyncio.shield(task)
+
+    def in_progress(self, key):
+        return key in self._calls
+
+    @property
+    def in_flight(self):
+        return len(self._calls)
+
+
+result_cache = ResultCache(OCR_CACHE_DIR, OCR_CACHE_MAX_BYTES, OCR_CACHE_TTL_SECONDS) if OCR_CACHE_ENABLED else None
+single_flight = SingleFlight()
+
+
+async def parse_with_upstage(filename, contents, data=None, timeout=30, content_type=None, digest=None):
+    """Upstage Document Parse 결과 (캐시 → 진행 중인 동일 요청 → upstream 순서로 확인)
+
+    content_type을 주면 이미지 준비(형식 확인/변환) 없이 그대로 전송합니다.
+    이때 contents는 파일 객체여도 되며, multipart 본문을 조각 단위로 읽어 전송합니다 (digest 필수).
+    """
+    key = make_result_key(contents, data, digest=digest)
+    if result_cache is not None:
+        cached = await asyncio.to_thread(result_cache.get, key)
+        if cached is not None:
+            logger.info(f"♻️ 캐시 적중: {filename}")
+            return cached
+
+    # 파일 객체는 요청(UploadFile)이 끝나면 닫히므로, 공유 호출을 시작하는 요청만 별도 핸들을 열어 넘김
+    # (첫 요청 클라이언트가 끊겨도 합쳐진 다른 요청은 계속 진행 / 확인~시작 사이에 await 없음)
+    handle = None
+    if not isinstance(contents, (bytes, bytearray, memoryview)) and not single_flight.in_progress(key):
+        handle = reopen_upload(contents)
+
+    async def call_upstream():
+        try:
+            if content_type is None:
+                # 지원 형식은 원본 그대로 전달 (헤더만 확인, 디코딩/재인코딩 없음)
+                upload = await prepare_upload(filename, contents)
+            else:
+                upload = (filename, handle if handle is not None else contents, content_type)
+            try:
+                response = await post_to_upstage({"document": upload}, data=data, timeout=timeout)
+            except CircuitOpenError as e:
+                logger.error(f"❌ Upstage 서킷 열림: {e}")
+                raise UpstreamUnavailableError(e.retry_in, str(e)) from e
+        finally:
+            if handle is not None:
+                handle.close()
+        if response.status_code != 200:
+            logger.error(f"❌ Upstage API 오류: {response.status_code}")
+            raise UpstageAPIError(response.status_code, response.text)
+        result = response.json()
+        if result_cache is not None:
+            await asyncio.to_thread(result_cache.put, key, result)
+        return result
+
+    return await single_flight.do(key, call_upstream)
+
+
+# ============================================
+# 이미지 OCR 엔진 (Upstage 프록시 / 로컬 EasyOCR)
+# ============================================
+# upstage: Upstage Document Parse 프록시 (기본) / easyocr: 로컬 모델 (오프라인, 비용 없음)
+OCR_ENGINE = os.getenv("OCR_ENGINE", "upstage").lower()
+# 로컬 엔진 마이크로 배치: 최대 배치 크기 / 첫 이미지 도착 후 더 모으며 기다리는 최대 시간
+OCR_MICROBATCH_MAX_SIZE = int(os.getenv("OCR_MICROBATCH_MAX_SIZE", "8"))
+OCR_MICROBATCH_MAX_WAIT_MS = float(os.getenv("OCR_MICROBATCH_MAX_WAIT_MS", "20"))
+# 크기가 다른 이미지도 한 배치로 묶도록 흰 여백으로 이 배수 크기에 맞춤
+OCR_MICROBATCH_PAD_MULTIPLE = int(os.getenv("OCR_MICROBATCH_PAD_MULTIPLE", "256"))
+
+
+class MicroBatcher:
+    """동시 요청의 입력을 큐에 모아 배치 단위로 처리하고 결과를 각 요청에 돌려줌
+
+    첫 입력이 들어오면 max_batch_size개가 찰 때까지 최대 max_wait초 기다린 뒤
+    run_batch(입력 목록) → 결과 목록(같은 순서)을 워커 스레드에서 한 번에 하나씩 실행
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait=0.02, name="local"):
+        self.run_batch = run_batch
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._worker = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # 기다리는 동안 연결이 끊긴 요청은 제외
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                results = await asyncio.to_thread(self.run_batch, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                LOCAL_BATCH_DURATION.observe(time.perf_counter() - start, engine=self.name)
+                LOCAL_BATCH_SIZE.observe(len(batch), engine=self.name)
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+class OCRBackend:
+    """이미지 OCR 엔진 인터페이스 - recognize(파일명, 바이트) → {"text", "elements"}"""
+
+    name = ""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def recognize(self, filename, contents):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class UpstageBackend(OCRBackend):
+    """Upstage Document Parse 프록시 (결과 캐시 + 동일 요청 합치기)"""
+
+    name = "Upstage Document Parse"
+
+    async def recognize(self, filename, contents):
+        result = await parse_with_upstage(filename, contents, timeout=30)
+        return {"text": result.get("text", ""), "elements": result.get("elements", [])}
+
+
+def decode_gray_image(contents):
+    """업로드 이미지 → OCR 입력용 그레이스케일 배열"""
+    import numpy as np
+    
+    try:
+        image = Image.open(io.BytesIO(contents))
+    except UnidentifiedImageError as e:
+        raise InvalidImageError("unrecognized image format") from e
+    with image:
+        return np.asarray(image.convert("L"))
+
+
+class EasyOCRBackend(OCRBackend):
+    """로컬 EasyOCR - 미리 로딩한 Reader 하나로 동시 요청을 마이크로 배치 처리"""
+
+    name = "EasyOCR (local)"
+
+    def __init__(self, max_batch_size=OCR_MICROBATCH_MAX_SIZE, max_wait_ms=OCR_MICROBATCH_MAX_WAIT_MS,
+                 pad_multiple=OCR_MICROBATCH_PAD_MULTIPLE, engine=None):
+        if engine is None:
+            from ocr_engine import OCREngine
+            engine = OCREngine(
+                gpu=os.getenv("EASYOCR_GPU", "false").lower() == "true", batch_size=max_batch_size
+            )
+        self.engine = engine
+        self.pad_multiple = pad_multiple
+        self.batcher = MicroBatcher(self._run_batch, max_batch_size, max_wait_ms / 1000, name="easyocr")
+
+    def _run_batch(self, images):
+        return self.engine.readtext_batch(images, pad_multiple=self.pad_multiple)
+
+    async def start(self):
+        self.engine.warm_up()
+        await self.batcher.start()
+
+    async def close(self):
+        await self.batcher.close()
+
+    async def recognize(self, filename, contents):
+        image = await asyncio.to_thread(decode_gray_image, contents)
+        texts = await self.batcher.submit(image)
+        return {
+            "text": "\n".join(texts),
+            "elements": [{"id": i, "category": "paragraph", "content": {"text": text}} for i, text in enumerate(texts)],
+        }
+
+    def stats(self):
+        return {"model_ready": self.engine.is_ready, "microbatch": self.batcher.stats()}
+
+
+OCR_BACKENDS = {
+    "upstage": UpstageBackend,
+    "easyocr": EasyOCRBackend,
+}
+
+
+def create_ocr_backend(name):
+    """이름으로 OCR 엔진 생성 (알 수 없는 이름이면 upstage)"""
+    backend_class = OCR_BACKENDS.get(name)
+    if backend_class is None:
+        logger.warning(f"⚠️ 알 수 없는 OCR_ENGINE={name} - upstage 사용")
+        backend_class = UpstageBackend
+    return backend_class()
+
+
+ocr_backend: OCRBackend | None = None
 
 
 @app.get("/")
@@ -50,18 +1077,36 @@ async def root():
         "message": "Document Parse API Server (Upstage)",
         "version": "3.0.0",
         "engine": "Upstage Document Parse",
-        "endpoints": ["/ocr", "/ocr-pdf", "/health"],
+        "endpoints": ["/ocr", "/ocr-pdf", "/ocr-batch", "/health", "/metrics"],
         "features": ["table_structure", "text_extraction", "layout_analysis", "korean_optimized"]
     }
 
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus 스크레이프용 메트릭 (텍스트 형식)"""
+    # 캐시 디스크 사용량 계산(glob)이 들어 있으므로 스레드에서 렌더링
+    body = await asyncio.to_thread(metrics.render)
+    return Response(body, media_type=MetricsRegistry.CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     """헬스 체크"""
+    # 캐시 통계는 디스크를 순회(glob/stat)하므로 이벤트 루프를 막지 않도록 스레드에서 계산
+    cache_stats = await asyncio.to_thread(result_cache.stats) if result_cache is not None else {"enabled": False}
     return {
         "status": "healthy",
-        "engine": "Upstage Document Parse",
+        "engine": ocr_backend.name if ocr_backend is not None else OCR_ENGINE,
+        "engine_stats": ocr_backend.stats() if ocr_backend is not None else {},
         "api_configured": bool(UPSTAGE_API_KEY),
+        "cache": cache_stats,
+        "single_flight": {"coalesced": single_flight.coalesced, "in_flight": single_flight.in_flight},
+        "upstream": get_upstream_guard(UPSTAGE_API_URL).stats(),
+        "response": {
+            "serializer": JSON_SERIALIZER,
+            "compression": list(SUPPORTED_ENCODINGS) if OCR_COMPRESSION_ENABLED else [],
+        },
         "languages": ["korean", "english", "multilingual"],
         "features": ["table_recognition", "layout_analysis", "ocr", "document_understanding"]
     }
@@ -70,64 +1115,32 @@ async def health_check():
 @app.post("/ocr")
 async def process_ocr(
     file: UploadFile = File(..., description="이미지 파일 (PNG, JPG, etc.)"),
-    api_key: str = Header(..., alias="X-API-Key", description="API 인증 키")
+    api_key: str = Header(..., alias="X-API-Key", description="API 인증 키"),
+    formats: str | None = Query(None, description="남길 표현 형식 (쉼표 구분: text,html,markdown) - 생략 시 전부"),
+    include_elements: bool = Query(True, alias="elements", description="false면 요소 목록(elements) 생략"),
 ):
     """
     이미지에서 텍스트 추출 (OCR)
     
     - **file**: 업로드할 이미지 파일
     - **X-API-Key**: HTTP 헤더에 포함할 API 키
+    - **formats** / **elements**: 필요 없는 표현(html 등)과 요소 목록을 빼서 응답 크기 감소
     """
     
     # API 키 검증
     if api_key != API_KEY:
         logger.warning(f"❌ 잘못된 API 키 시도: {api_key[:10]}...")
         raise HTTPException(status_code=401, detail="Invalid API key")
+    formats = parse_formats(formats)
     
     try:
         # 파일 읽기
         contents = await file.read()
         logger.info(f"📄 파일 수신: {file.filename} ({len(contents)} bytes)")
         
-        # 이미지 변환
-        image = Image.open(io.BytesIO(contents))
-        
-        # RGB로 변환 (RGBA 등 처리)
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        img_array = np.array(image)
-        logger.info(f"🖼️ 이미지 크기: {img_array.shape}")
-        
-        # Upstage API 호출
-        logger.info("🔍 Upstage Document Parse API 호출 중...")
-        
-        # 이미지를 바이트로 변환
-        image_bytes = io.BytesIO()
-        image.save(image_bytes, format='PNG')
-        image_bytes.seek(0)
-        
-        # Upstage API 요청
-        headers = {
-            "Authorization": f"Bearer {UPSTAGE_API_KEY}"
-        }
-        
-        files = {
-            "document": (file.filename, image_bytes, "image/png")
-        }
-        
-        response = requests.post(
-            UPSTAGE_API_URL,
-            headers=headers,
-            files=files,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"❌ Upstage API 오류: {response.status_code}")
-            raise HTTPException(status_code=500, detail=f"Upstage API error: {response.text}")
-        
-        result = response.json()
+        # OCR 엔진 호출 (Upstage: 캐시/진행 중인 요청 재사용, 로컬: 마이크로 배치)
+        logger.info(f"🔍 {ocr_backend.name} 호출 중...")
+        result = await ocr_backend.recognize(file.filename, contents)
         
         # 텍스트 추출
         text = result.get("text", "")
@@ -135,69 +1148,266 @@ async def process_ocr(
         
         logger.info(f"✅ 문서 파싱 완료: {len(text)} 글자, {len(elements)}개 요소 추출")
         
-        return {
+        response = {
             "text": text,
             "elements": elements,  # 구조화된 요소 (표, 제목, 문단 등)
             "status": "success",
             "char_count": len(text),
             "element_count": len(elements),
             "filename": file.filename,
-            "engine": "Upstage Document Parse"
+            "engine": ocr_backend.name
         }
+        return FastJSONResponse(trim_representations(response, formats, include_elements))
         
+    except InvalidImageError as e:
+        logger.warning(f"⚠️ 잘못된 이미지: {file.filename} ({e})")
+        raise invalid_image_exception(e)
+    except UpstreamUnavailableError as e:
+        raise unavailable_exception(e)
     except Exception as e:
         logger.error(f"❌ OCR 처리 실패: {str(e)}")
         raise HTTPException(status_code=500, detail=f"OCR processing failed: {str(e)}")
 
 
-@app.post("/ocr-pdf")
+class PDFWindowSource:
+    """업로드 PDF에서 페이지 창(부분 PDF)을 필요할 때 하나씩 생성
+
+    디스크로 넘어간 업로드는 mmap으로 열어 메모리에 복사하지 않고,
+    창 바이트는 처리 차례가 된 창만 만듭니다 (동시에 최대 max_in_flight개).
+    PyMuPDF가 없으면 전체를 창 하나로 처리 (마지막 페이지는 None)
+    비어 있거나 PDF로 열 수 없으면 InvalidPDFError (handle은 닫힘)
+    """
+    
+    def __init__(self, handle):
+        self._handle = handle
+        self._mmap = None
+        self._view = None
+        self._doc = None
+        self._lock = threading.Lock()  # fitz 문서는 스레드 간 동시 접근 불가
+        try:
+            self._open()
+        except BaseException:
+            self.close()
+            raise
+    
+    def _open(self):
+        if isinstance(self._handle, io.BytesIO):
+            # 메모리에 있는 작은 업로드 (OCR_SPOOL_THRESHOLD 이하) - 버퍼 export를 잡아 두지 않도록 bytes로 넘김
+            stream = self._handle.getvalue()
+            if not stream:
+                raise InvalidPDFError("empty file")
+        else:
+            try:
+                self._mmap = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise InvalidPDFError("empty file")  # 길이 0인 파일은 mmap 불가
+            # PyMuPDF 1.25.4부터 memoryview 스트림 지원 (requirements-ocr-server.txt)
+            stream = self._view = memoryview(self._mmap)
+        if fitz is None:
+            return
+        try:
+            self._doc = fitz.open(stream=stream, filetype="pdf")
+        except RuntimeError as e:  # fitz.FileDataError 등
+            raise InvalidPDFError(str(e)) from e
+        if len(self._doc) == 0:
+            raise InvalidPDFError("no pages")
+    
+    def ranges(self, window_pages):
+        """[(첫 페이지, 마지막 페이지), ...] (1부터)"""
+        if self._doc is None:
+            return [(1, None)]
+        page_count = len(self._doc)
+        return [
+            (start + 1, min(start + window_pages, page_count))
+            for start in range(0, page_count, window_pages)
+        ]
+    
+    def window(self, first_page, last_page):
+        """창 하나의 PDF (PyMuPDF가 없으면 업로드 파일 핸들 그대로)"""
+        if self._doc is None:
+            return self._handle
+        with self._lock, fitz.open() as window_doc:
+            window_doc.insert_pdf(self._doc, from_page=first_page - 1, to_page=last_page - 1)
+            # no_new_id: 트레일러 /ID를 새로 만들지 않아 같은 입력이면 같은 바이트
+            return window_doc.tobytes(no_new_id=True)
+    
+    def close(self):
+        # 취소된 요청의 창 생성 스레드가 아직 문서를 쓰고 있을 수 있으므로 락을 잡고 닫음
+        # 순서 중요: 문서 → memoryview → mmap → 파일 (export가 남아 있으면 mmap.close()가 BufferError)
+        with self._lock:
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            self._handle.close()
+
+
+def page_records(result, first_page):
+    """창 하나의 Upstage 응답 → 원본 페이지 번호 기준 페이지별 레코드 (페이지 순)"""
+    offset = first_page - 1
+    by_page = {}
+    for element in result.get("elements", []):
+        element = dict(element)
+        element["page"] = element.get("page", 1) + offset
+        by_page.setdefault(element["page"], []).append(element)
+    
+    records = []
+    for page in sorted(by_page):
+        texts, htmls = [], []
+        for element in by_page[page]:
+            content = element.get("content", {})
+            if isinstance(content, dict):
+                texts.append(content.get("text", ""))
+                htmls.append(content.get("html", ""))
+            else:
+                texts.append(str(content))
+        text = "\n\n".join(t for t in texts if t)
+        records.append({
+            "page": page,
+            "text": text,
+            "html": "\n".join(h for h in htmls if h),
+            "elements": by_page[page],
+            "char_count": len(text),
+            "status": "success",
+        })
+    return records
+
+
+async def _parse_pdf_window(filename, source, window, digest, data, semaphore):
+    """페이지 창 하나 분석 - (창, 페이지 레코드 목록 또는 오류 메시지)
+
+    캐시 키는 창 바이트가 아니라 (업로드 sha256, 페이지 범위, 옵션)
+    """
+    first_page, last_page = window
+    async with semaphore:
+        try:
+            window_pdf = await asyncio.to_thread(source.window, first_page, last_page)
+            result = await parse_with_upstage(
+                f"{os.path.splitext(filename or 'document')[0]}_p{first_page}.pdf",
+                window_pdf, data=data, timeout=60, content_type="application/pdf",
+                digest=f"{digest}-p{first_page}-{last_page or 'end'}",
+            )
+            return window, page_records(result, first_page)
+        except Exception as e:
+            return window, str(e)
+
+
+async def stream_pdf_pages(filename, source, digest, data, window_pages, max_in_flight, formats=None, include_elements=True):
+    """페이지 창을 동시에 분석하고, 끝나는 창부터 페이지별 NDJSON 한 줄씩 반환
+
+    source(PDFWindowSource)는 이 함수가 닫음 - 응답 전에 열어 잘못된 PDF는 400으로 거름
+    """
+    semaphore = asyncio.Semaphore(max_in_flight)
+    tasks = [
+        asyncio.create_task(_parse_pdf_window(filename, source, window, digest, data, semaphore))
+        for window in source.ranges(window_pages)
+    ]
+    
+    page_count = char_count = 0
+    failed = []
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            (first_page, last_page), records = await next_done
+            if isinstance(records, str):
+                logger.error(f"❌ 페이지 {first_page}-{last_page} 분석 실패: {records}")
+                failed.append([first_page, last_page])
+                yield dumps_json({"pages": [first_page, last_page], "status": "failed", "error": records}) + b"\n"
+                continue
+            for record in records:
+                page_count += 1
+                char_count += record["char_count"]
+                yield dumps_json(trim_representations(record, formats, include_elements)) + b"\n"
+        
+        logger.info(f"✅ PDF 스트리밍 분석 완료: {page_count}페이지, {char_count} 글자")
+        summary = {
+            "page_count": page_count,
+            "char_count": char_count,
+            "failed_pages": failed,
+            "status": "success" if not failed else ("partial" if page_count else "failed"),
+            "filename": filename,
+            "engine": "Upstage Document Parse",
+        }
+        yield dumps_json({"summary": summary}) + b"\n"
+    finally:
+        # 클라이언트가 연결을 끊으면 남은 창 취소 (창 생성 스레드가 끝난 뒤 원본 닫기)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(source.close)
+
+
 async def process_pdf_document(
     file: UploadFile = File(..., description="PDF 파일"),
-    api_key: str = Header(..., alias="X-API-Key")
+    api_key: str = Header(..., alias="X-API-Key"),
+    stream: bool = Query(False, description="true면 페이지별 결과를 준비되는 대로 NDJSON으로 스트리밍"),
+    window_pages: int = Query(OCR_PDF_WINDOW_PAGES, ge=1, le=100, description="스트리밍 시 한 번에 분석할 페이지 수"),
+    max_in_flight: int = Query(OCR_BATCH_MAX_IN_FLIGHT, ge=1, le=64, description="스트리밍 시 동시 분석 창 수"),
+    formats: str | None = Query(None, description="남길 표현 형식 (쉼표 구분: text,html,markdown) - 생략 시 전부"),
+    include_elements: bool = Query(True, alias="elements", description="false면 요소 목록(elements) 생략"),
+    lean: bool = Query(False, description="true면 경량 모드 (text/markdown만 요청, 좌표 생략)"),
 ):
     """
     PDF 파일 전체를 구조화하여 분석 (표, 이미지, 텍스트 모두 포함)
+    
+    - stream=true: PDF를 window_pages 단위로 나눠 동시에 분석하고, 끝나는 창부터
+      페이지별 결과를 한 줄씩(NDJSON) 반환 (page로 원래 순서 확인)
+      실패한 창은 {"pages": [첫 페이지, 마지막 페이지], "status": "failed", ...}
+      마지막 줄은 {"summary": {...}}
+    - formats=text 등: 필요 없는 표현(html 등)은 문서 / 페이지 / 요소 모두에서 제외, elements=false면 요소 목록 제외
+      (Upstage 호출과 캐시는 그대로 - 응답만 줄임)
+    - lean=true: Upstage에 text/markdown만 요청하고 좌표 생략 (클라이언트 UPSTAGE_LEAN과 같은 파라미터)
     """
     
     # API 키 검증
     if api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
+    formats = parse_formats(formats)
+    
+    # OCR 옵션 추가 (표 인식 강화)
+    data = {
+        "ocr": "force"  # 항상 OCR 사용 (이미지 기반 PDF도 처리)
+    }
+    if lean:
+        data.update({
+            "model": "document-parse",
+            "output_formats": "['text', 'markdown']",
+            "coordinates": "false",
+        })
+    
+    if stream:
+        # 응답 전에 업로드 파일이 닫힐 수 있으므로 별도 핸들로 넘김 (디스크 임시 파일은 복사 없음)
+        digest, size = await asyncio.to_thread(hash_upload, file.file)
+        logger.info(f"📄 PDF 파일 수신 (스트리밍): {file.filename} ({size} bytes)")
+        # 헤더를 보내기 전에 PDF를 열어 봄 (실패하면 잘린 NDJSON 대신 400)
+        try:
+            source = await asyncio.to_thread(PDFWindowSource, reopen_upload(file.file))
+        except InvalidPDFError as e:
+            logger.warning(f"⚠️ 잘못된 PDF: {file.filename} ({e})")
+            raise invalid_pdf_exception(e)
+        return StreamingResponse(
+            stream_pdf_pages(file.filename, source, digest, data, window_pages, max_in_flight, formats, include_elements),
+            media_type="application/x-ndjson",
+        )
     
     try:
-        # 파일 읽기
-        contents = await file.read()
-        logger.info(f"📄 PDF 파일 수신: {file.filename} ({len(contents)} bytes)")
+        # 파일 전체를 읽지 않고 해시만 계산 (큰 파일은 이미 디스크에 임시 저장됨)
+        digest, size = await asyncio.to_thread(hash_upload, file.file)
+        logger.info(f"📄 PDF 파일 수신: {file.filename} ({size} bytes)")
         
         # Upstage API 호출
         logger.info("🔍 Upstage Document Parse API로 PDF 분석 중...")
         
-        headers = {
-            "Authorization": f"Bearer {UPSTAGE_API_KEY}"
-        }
-        
-        files = {
-            "document": (file.filename, io.BytesIO(contents), "application/pdf")
-        }
-        
-        # OCR 옵션 추가 (표 인식 강화)
-        data = {
-            "ocr": "force"  # 항상 OCR 사용 (이미지 기반 PDF도 처리)
-        }
-        
-        response = requests.post(
-            UPSTAGE_API_URL,
-            headers=headers,
-            files=files,
-            data=data,
-            timeout=60  # PDF는 시간이 더 걸릴 수 있음
+        # PDF는 시간이 더 걸릴 수 있음 (같은 PDF는 캐시/진행 중인 요청 재사용)
+        # 임시 파일에서 바로 multipart 본문을 스트리밍 (BytesIO 복사 없음)
+        result = await parse_with_upstage(
+            file.filename, file.file, data=data, timeout=60, content_type="application/pdf", digest=digest
         )
         
-        if response.status_code != 200:
-            logger.error(f"❌ Upstage API 오류: {response.status_code}")
-            raise HTTPException(status_code=500, detail=f"Upstage API error: {response.text}")
-        
-        result = response.json()
-        
         # 구조화된 데이터 추출
         content = result.get("content", {})
         text = content.get("text", "")
@@ -214,7 +1424,7 @@ async def process_pdf_document(
         
         logger.info(f"✅ PDF 분석 완료: {len(pages)}페이지, {len(text)} 글자")
         
-        return {
+        response = {
             "text": text,
             "html": html,  # HTML 형태로도 제공
             "pages": pages,
@@ -224,77 +1434,99 @@ async def process_pdf_document(
             "filename": file.filename,
             "engine": "Upstage Document Parse"
         }
+        return FastJSONResponse(trim_representations(response, formats, include_elements))
         
+    except UpstreamUnavailableError as e:
+        raise unavailable_exception(e)
     except Exception as e:
         logger.error(f"❌ PDF 분석 실패: {str(e)}")
         raise HTTPException(status_code=500, detail=f"PDF parse failed: {str(e)}")
 
 
+# 업로드 스풀 크기(OCR_SPOOL_THRESHOLD)는 PDF 라우트에만 적용
+app.router.add_api_route("/ocr-pdf", process_pdf_document, methods=["POST"], route_class_override=SpoolingRoute)
+
+
+async def _process_batch_item(index, filename, contents, semaphore):
+    """배치 항목 하나 처리 - 실패해도 예외 대신 실패 결과 반환 (다른 항목에 영향 없음)"""
+    async with semaphore:
+        try:
+            # OCR 엔진 호출 (Upstage: 캐시/진행 중인 요청 재사용, 로컬: 마이크로 배치)
+            try:
+                result = await ocr_backend.recognize(filename, contents)
+            except UpstageAPIError as e:
+                raise Exception(f"API error: {e.status_code}")
+            text = result.get("text", "")
+            return {
+                "index": index,
+                "filename": filename,
+                "text": text,
+                "status": "success",
+                "char_count": len(text),
+                "engine": ocr_backend.name
+            }
+        except Exception as e:
+            return {
+                "index": index,
+                "filename": filename,
+                "status": "failed",
+                "error": str(e)
+            }
+
+
 @app.post("/ocr-batch")
 async def process_ocr_batch(
     files: list[UploadFile] = File(..., description="여러 이미지 파일"),
-    api_key: str = Header(..., alias="X-API-Key")
+    api_key: str = Header(..., alias="X-API-Key"),
+    stream: bool = Query(False, description="true면 끝나는 항목부터 NDJSON으로 스트리밍"),
+    max_in_flight: int = Query(OCR_BATCH_MAX_IN_FLIGHT, ge=1, le=64, description="동시 처리 항목 수"),
 ):
     """
-    여러 이미지를 한 번에 OCR 처리
+    여러 이미지를 동시에 OCR 처리 (최대 max_in_flight개씩)
+    
+    - 기본: 모든 항목이 끝나면 업로드 순서대로 결과 반환
+    - stream=true: 끝나는 순서대로 한 줄씩(NDJSON) 반환, 각 결과의 index로 원래 순서 확인
+      마지막 줄은 {"summary": {...}}
     """
     
     # API 키 검증
     if api_key != API_KEY:
         raise HTTPException(status_code=401, detail="Invalid API key")
     
-    results = []
+    # 업로드 파일은 응답이 끝나기 전에 닫힐 수 있으므로 (스트리밍) 먼저 읽어 둠
+    contents = [await file.read() for file in files]
     
-    for file in files:
-        try:
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents))
-            
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # 이미지를 바이트로 변환
-            image_bytes = io.BytesIO()
-            image.save(image_bytes, format='PNG')
-            image_bytes.seek(0)
-            
-            # Upstage API 호출
-            headers = {"Authorization": f"Bearer {UPSTAGE_API_KEY}"}
-            files_data = {"document": (file.filename, image_bytes, "image/png")}
-            
-            response = requests.post(
-                UPSTAGE_API_URL,
-                headers=headers,
-                files=files_data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                text = result.get("text", "")
-                
-                results.append({
-                    "filename": file.filename,
-                    "text": text,
-                    "status": "success",
-                    "char_count": len(text),
-                    "engine": "Upstage"
-                })
-            else:
-                raise Exception(f"API error: {response.status_code}")
-            
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "status": "failed",
-                "error": str(e)
-            })
+    semaphore = asyncio.Semaphore(max_in_flight)
+    tasks = [
+        asyncio.create_task(_process_batch_item(index, file.filename, data, semaphore))
+        for index, (file, data) in enumerate(zip(files, contents))
+    ]
+    del contents
     
-    return {
+    if stream:
+        async def stream_results():
+            successful = 0
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    successful += result["status"] == "success"
+                    yield dumps_json(result) + b"\n"
+                summary = {"total": len(files), "successful": successful}
+                yield dumps_json({"summary": summary}) + b"\n"
+            finally:
+                # 클라이언트가 연결을 끊으면 남은 항목 취소
+                for task in tasks:
+                    task.cancel()
+        
+        return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+    
+    results = await asyncio.gather(*tasks)
+    
+    return FastJSONResponse({
         "total": len(files),
         "successful": len([r for r in results if r["status"] == "success"]),
         "results": results
-    }
+    })
 
 
 if __name__ == "__main__":
@@ -303,9 +1535,9 @@ if __name__ == "__main__":
     print("=" * 50)
     print("🚀 OCR API 서버 시작")
     print("=" * 50)
-    print(f"📍 URL: http://localhost:8000")
+    print("📍 URL: http://localhost:8000")
     print(f"🔑 API Key: {API_KEY}")
-    print(f"📚 Docs: http://localhost:8000/docs")
+    print("📚 Docs: http://localhost:8000/docs")
     print("=" * 50)
     
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
@@ -0,0 +1,468 @@
+"""
+📄 PDF 텍스트 추출 모듈
+Streamlit에 의존하지 않는 PyMuPDF 기반 추출 로직
+- 프로세스 풀 워커에서도 import 가능 (streamlit_app.py를 다시 실행하지 않음)
+- 페이지 범위를 여러 프로세스로 나눠 병렬 추출
+- 페이지별 분류로 OCR/표 파싱이 필요한 페이지만 골라내기
+- 벡터 텍스트 표는 PyMuPDF 표 인식기로 로컬 추출 (Upstage 호출 없이)
+"""
+
+import html
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+# 페이지 구분 마커 (기존 추출 결과와 동일한 형식 유지)
+PAGE_MARKER = "\n\n=== 페이지 {page} ===\n\n"
+
+# 이 페이지 수 미만이면 프로세스 풀 생성 비용이 더 크므로 직렬 처리
+# spawn 워커는 시작(인터프리터 + fitz import)에 약 0.4~0.5초, 직렬 추출은 페이지당 약 2ms
+# (benchmarks.py parallel-extract: 50페이지 직렬 0.16초 vs 병렬 x2 1.02초, 400페이지에서도 직렬이 빠름)
+# → 수백 페이지 이상에서만 이득이므로 앱의 max_pages(50)에서는 항상 직렬
+PARALLEL_MIN_PAGES = 500
+
+# 워커 수 상한 (PDF 파싱은 메모리를 많이 쓰므로 과도한 분할 방지)
+MAX_EXTRACT_WORKERS = 8
+
+# 페이지 라우팅 (텍스트 레이어 / OCR / 표 파싱)
+ROUTE_TEXT = "text"
+ROUTE_OCR = "ocr"
+ROUTE_TABLE = "table"
+
+# 텍스트 레이어가 이 글자 수 미만이면 스캔 페이지로 판단
+MIN_PAGE_TEXT_CHARS = 50
+# 이미지가 페이지 면적의 이 비율 이상을 덮고 텍스트가 적으면 OCR
+OCR_IMAGE_COVERAGE = 0.5
+# 수평/수직 괘선이 이 개수 이상이면 표 레이아웃
+TABLE_MIN_RULES = 12
+# 숫자 토큰 비율이 이 이상이고 줄이 충분하면 (괘선 없는) 표 레이아웃
+TABLE_NUMERIC_RATIO = 0.35
+TABLE_MIN_LINES = 8
+
+_NUMERIC_TOKEN = re.compile(r"^[\(\-+△▲▼]?[\d,.]+%?\)?$")
+
+# 워커 프로세스별 문서 핸들 (initializer에서 한 번만 열기)
+_worker_shm = None
+_worker_doc = None
+
+
+def _init_extract_worker(shm_name, size):
+    """워커 초기화: 공유 메모리 버퍼에서 자체 fitz 문서 열기"""
+    global _worker_shm, _worker_doc
+    _worker_shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_doc = fitz.open(stream=_worker_shm.buf[:size], filetype="pdf")
+
+
+def _timed_page_text(doc, page_num):
+    """페이지 텍스트와 추출 소요 시간(ms)"""
+    start = time.perf_counter()
+    page_text = doc[page_num].get_text()
+    return page_text, (time.perf_counter() - start) * 1000
+
+
+def _extract_worker_range(start, end):
+    """워커: 담당 페이지 범위의 (텍스트, 소요시간) 추출"""
+    return [_timed_page_text(_worker_doc, page_num) for page_num in range(start, end)]
+
+
+@dataclass
+class PageRecord:
+    """페이지 단위 추출 결과"""
+    page: int  # 1부터 시작하는 페이지 번호
+    text: str
+    source: str  # 추출 엔진 (pymupdf, upstage, easyocr)
+    elapsed_ms: float = 0.0
+
+    def render(self):
+        """'=== 페이지 N ===' 마커가 붙은 텍스트"""
+        return PAGE_MARKER.format(page=self.page) + self.text
+
+
+class ExtractedDocument:
+    """PageRecord 묶음 - 전체 문자열은 필요할 때 한 번만 결합"""
+
+    def __init__(self, records=None, num_pages=None, fallback_text="", complete=True):
+        self.records = list(records or [])
+        self.num_pages = len(self.records) if num_pages is None else num_pages
+        # 페이지 정보 없이 통째로 받은 텍스트 (예: Upstage content.text)
+        self._fallback_text = fallback_text
+        # 일부 페이지 OCR 실패/텍스트 레이어 폴백이 섞였으면 False (캐시에 저장하지 않음)
+        self.complete = complete
+        # 추출하면서 미리 분할한 임베딩용 청크 (없으면 저장 시 분할)
+        self.chunks = None
+        self._text = None
+
+    def append(self, record):
+        self.records.append(record)
+        self._text = None
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __bool__(self):
+        return bool(self.records) or bool(self._fallback_text)
+
+    @property
+    def page_count(self):
+        """마커가 붙은 페이지 수 (기존 text.count('=== 페이지')와 동일)"""
+        return len(self.records)
+
+    @property
+    def text(self):
+        if self._text is None:
+            joined = "".join(record.render() for record in self.records)
+            self._text = joined if joined.strip() else self._fallback_text
+        return self._text
+
+    @property
+    def sources(self):
+        return sorted({record.source for record in self.records})
+
+    @property
+    def total_elapsed_ms(self):
+        return sum(record.elapsed_ms for record in self.records)
+
+    def to_dict(self):
+        """JSON 저장용 dict (캐시 등)"""
+        return {
+            "num_pages": self.num_pages,
+            "fallback_text": self._fallback_text,
+            "records": [
+                {"page": r.page, "text": r.text, "source": r.source, "elapsed_ms": r.elapsed_ms}
+                for r in self.records
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        records = [PageRecord(**record) for record in data.get("records", [])]
+        return cls(records, num_pages=data.get("num_pages"), fallback_text=data.get("fallback_text", ""))
+
+
+def split_page_ranges(num_pages, num_chunks):
+    """페이지 범위를 거의 같은 크기의 연속 구간으로 분할 [(start, end), ...]"""
+    num_chunks = max(1, min(num_chunks, num_pages))
+    base, extra = divmod(num_pages, num_chunks)
+    ranges = []
+    start = 0
+    for i in range(num_chunks):
+        end = start + base + (1 if i < extra else 0)
+        if end > start:
+            ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def count_pages(pdf_bytes, max_pages=50):
+    """처리할 페이지 수 (max_pages로 제한)"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return min(len(doc), max_pages)
+    finally:
+        doc.close()
+
+
+def iter_page_records_serial(pdf_bytes, max_pages=50):
+    """단일 프로세스로 PageRecord를 한 페이지씩 생성 (기존 방식)"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        num_pages = min(len(doc), max_pages)
+        for page_num in range(num_pages):
+            page_text, elapsed_ms = _timed_page_text(doc, page_num)
+            yield PageRecord(page_num + 1, page_text, "pymupdf", elapsed_ms)
+    finally:
+        doc.close()
+
+
+def iter_page_records_parallel(pdf_bytes, max_pages=50, workers=None):
+    """프로세스 풀로 PageRecord 생성 (페이지 순서 보장)
+
+    PDF 바이트를 공유 메모리에 한 번만 복사하고, 각 워커는 그 버퍼에서
+    자체 fitz 문서를 열어 연속된 페이지 구간을 처리합니다.
+    앞 구간이 끝나는 대로 순서대로 yield 합니다.
+    """
+    num_pages = count_pages(pdf_bytes, max_pages)
+
+    if workers is None:
+        workers = min(os.cpu_count() or 1, MAX_EXTRACT_WORKERS)
+    ranges = split_page_ranges(num_pages, workers)
+    if len(ranges) <= 1:
+        yield from iter_page_records_serial(pdf_bytes, max_pages)
+        return
+
+    size = len(pdf_bytes)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        shm.buf[:size] = pdf_bytes
+        # Streamlit 스크립트 스레드 등에서 fork 하면 잠긴 락이 복제될 수 있으므로 spawn 사용
+        with ProcessPoolExecutor(
+            max_workers=len(ranges),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_extract_worker,
+            initargs=(shm.name, size),
+        ) as executor:
+            futures = [executor.submit(_extract_worker_range, start, end) for start, end in ranges]
+            for (start, _), future in zip(ranges, futures):
+                for offset, (page_text, elapsed_ms) in enumerate(future.result()):
+                    yield PageRecord(start + offset + 1, page_text, "pymupdf", elapsed_ms)
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def iter_page_records(pdf_bytes, max_pages=50, parallel=True, workers=None):
+    """PageRecord 생성기 - 페이지 수가 충분하면 병렬, 실패 시 직렬 폴백"""
+    if not parallel or (workers is not None and workers <= 1):
+        yield from iter_page_records_serial(pdf_bytes, max_pages)
+        return
+
+    if count_pages(pdf_bytes, max_pages) < PARALLEL_MIN_PAGES:
+        yield from iter_page_records_serial(pdf_bytes, max_pages)
+        return
+
+    try:
+        # 병렬 결과는 전부 모은 뒤 내보냄 (중간 실패 시 중복 없이 직렬 재시도)
+        records = list(iter_page_records_parallel(pdf_bytes, max_pages, workers))
+    except Exception as e:
+        # 프로세스 생성이 막힌 환경 등 - 결과는 동일하므로 직렬로 재시도
+        logger.warning(f"⚠️ 병렬 추출 실패, 직렬로 재시도: {e}")
+        records = iter_page_records_serial(pdf_bytes, max_pages)
+    yield from records
+
+
+def extract_document(pdf_bytes, max_pages=50, parallel=True, workers=None):
+    """PyMuPDF 텍스트 레이어로 ExtractedDocument 생성"""
+    return ExtractedDocument(iter_page_records(pdf_bytes, max_pages, parallel, workers))
+
+
+def extract_page_texts_serial(pdf_bytes, max_pages=50):
+    """단일 프로세스로 페이지별 텍스트 추출 (기존 방식)"""
+    return [record.text for record in iter_page_records_serial(pdf_bytes, max_pages)]
+
+
+def extract_page_texts_parallel(pdf_bytes, max_pages=50, workers=None):
+    """프로세스 풀로 페이지별 텍스트 추출 (페이지 순서 보장)"""
+    return [record.text for record in iter_page_records_parallel(pdf_bytes, max_pages, workers)]
+
+
+def extract_page_texts(pdf_bytes, max_pages=50, parallel=True, workers=None):
+    """페이지별 텍스트 추출 - 페이지 수가 충분하면 병렬, 실패 시 직렬 폴백"""
+    return [record.text for record in iter_page_records(pdf_bytes, max_pages, parallel, workers)]
+
+
+@dataclass
+class PageClassification:
+    """페이지 분류 결과 (OCR/표 파싱 라우팅용)"""
+    page: int  # 1부터 시작
+    text_chars: int
+    image_coverage: float  # 이미지가 덮는 페이지 면적 비율 (0~1)
+    rule_count: int  # 수평/수직 괘선 수
+    numeric_ratio: float  # 숫자 토큰 비율
+    route: str  # ROUTE_TEXT / ROUTE_OCR / ROUTE_TABLE
+
+
+def _count_rules(page):
+    """표 테두리로 보이는 수평/수직 선분 수"""
+    rules = 0
+    for drawing in page.get_drawings():
+        for item in drawing.get("items", []):
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.x - p2.x) < 1 or abs(p1.y - p2.y) < 1:
+                    rules += 1
+            elif item[0] == "re":
+                rect = item[1]
+                # 얇은 사각형은 선으로, 셀 사각형은 테두리 4개로 계산
+                rules += 1 if min(rect.width, rect.height) < 2 else 4
+    return rules
+
+
+def _image_coverage(page):
+    """이미지가 덮는 페이지 면적 비율"""
+    page_area = abs(page.rect) or 1.0
+    covered = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        covered += abs(bbox)
+    return min(covered / page_area, 1.0)
+
+
+def classify_page(page, page_text=None):
+    """텍스트 밀도 / 이미지 면적 / 표 레이아웃으로 페이지 라우팅 결정"""
+    if page_text is None:
+        page_text = page.get_text()
+    text_chars = len(page_text.strip())
+    image_coverage = _image_coverage(page)
+    rule_count = _count_rules(page)
+
+    tokens = page_text.split()
+    numeric_ratio = sum(1 for t in tokens if _NUMERIC_TOKEN.match(t)) / len(tokens) if tokens else 0.0
+    line_count = sum(1 for line in page_text.splitlines() if line.strip())
+
+    if text_chars < MIN_PAGE_TEXT_CHARS or (image_coverage >= OCR_IMAGE_COVERAGE and text_chars < MIN_PAGE_TEXT_CHARS * 4):
+        route = ROUTE_OCR
+    elif rule_count >= TABLE_MIN_RULES or (numeric_ratio >= TABLE_NUMERIC_RATIO and line_count >= TABLE_MIN_LINES):
+        route = ROUTE_TABLE
+    else:
+        route = ROUTE_TEXT
+
+    return PageClassification(
+        page=page.number + 1,
+        text_chars=text_chars,
+        image_coverage=round(image_coverage, 3),
+        rule_count=rule_count,
+        numeric_ratio=round(numeric_ratio, 3),
+        route=route,
+    )
+
+
+def classify_pages(pdf_bytes, max_pages=50, page_texts=None):
+    """모든 페이지 분류 (page_texts가 있으면 텍스트 재추출 생략)"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        num_pages = min(len(doc), max_pages)
+        return [
+            classify_page(doc[page_num], page_texts[page_num] if page_texts else None)
+            for page_num in range(num_pages)
+        ]
+    finally:
+        doc.close()
+
+
+def build_sub_pdf(pdf_bytes, page_numbers):
+    """지정한 페이지(1부터)만 담은 PDF 바이트 생성"""
+    src = fitz.open(stream=pdf_bytes, filetype="pdf")
+    sub = fitz.open()
+    try:
+        for page_num in page_numbers:
+            sub.insert_pdf(src, from_page=page_num - 1, to_page=page_num - 1)
+        # no_new_id: 트레일러 /ID를 새로 만들지 않아 같은 입력이면 항상 같은 바이트 (캐시/작업 키 안정)
+        return sub.tobytes(garbage=3, deflate=True, no_new_id=True)
+    finally:
+        sub.close()
+        src.close()
+
+
+def _clean_cell(cell):
+    """표 셀 텍스트 정리 (None → 빈 문자열, 줄바꿈 → 공백)"""
+    return " ".join((cell or "").split())
+
+
+def table_rows_to_html(rows):
+    """표 행 목록 → HTML (첫 행은 헤더)"""
+    if not rows:
+        return ""
+    parts = ["<table>"]
+    for row_index, row in enumerate(rows):
+        tag = "th" if row_index == 0 else "td"
+        cells = "".join(f"<{tag}>{html.escape(cell)}</{tag}>" for cell in row)
+        parts.append(f"<tr>{cells}</tr>")
+    parts.append("</table>")
+    return "".join(parts)
+
+
+def table_rows_to_markdown(rows):
+    """표 행 목록 → Markdown (첫 행은 헤더)"""
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+
+    def line(row):
+        cells = [cell.replace("|", "\\|") for cell in row]
+        cells += [""] * (width - len(cells))
+        return "|" + "|".join(cells) + "|"
+
+    return "\n".join([line(rows[0]), "|" + "|".join(["---"] * width) + "|"] + [line(row) for row in rows[1:]])
+
+
+def extract_page_tables(page):
+    """페이지의 벡터 텍스트 표 추출 - structured_elements의 tables 항목 형식"""
+    tables = []
+    for table in page.find_tables().tables:
+        rows = [[_clean_cell(cell) for cell in row] for row in table.extract()]
+        # 빈 행 / 한 칸짜리 박스(제목 테두리 등)는 표로 보지 않음
+        rows = [row for row in rows if any(row)]
+        if len(rows) < 2 or max(len(row) for row in rows) < 2:
+            continue
+        tables.append({
+            "page": page.number + 1,
+            "content": "\n".join(" | ".join(row) for row in rows),
+            "html": table_rows_to_html(rows),
+            "markdown": table_rows_to_markdown(rows),
+        })
+    return tables
+
+
+def extract_local_tables(pdf_bytes, page_numbers):
+    """지정 페이지(1부터)의 표를 로컬 추출 - {페이지: [표 항목]}
+
+    표가 없는 페이지는 빈 리스트, 표 인식기가 실패한 페이지는 None (원격 파싱 대상)
+    """
+    results = {}
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        for page_num in page_numbers:
+            try:
+                results[page_num] = extract_page_tables(doc[page_num - 1])
+            except Exception as e:
+                # 표 인식기 내부 오류는 해당 페이지만 건너뜀
+                logger.warning(f"⚠️ 페이지 {page_num} 로컬 표 추출 실패: {e}")
+                results[page_num] = None
+    finally:
+        doc.close()
+    return results
+
+
+def remap_record_pages(records, page_map):
+    """부분 PDF 기준 페이지 번호를 원본 페이지 번호로 변환 (page_map[i] = 원본 i+1번째)"""
+    remapped = []
+    for record in records:
+        if 1 <= record.page <= len(page_map):
+            record.page = page_map[record.page - 1]
+            remapped.append(record)
+    return remapped
+
+
+def remap_structured_pages(structured_elements, page_map):
+    """structured_elements의 page 값을 원본 페이지 번호로 변환"""
+    if not structured_elements:
+        return structured_elements
+    if hasattr(structured_elements, "remap_pages"):
+        # StructuredDocument는 페이지 인덱스도 함께 갱신
+        return structured_elements.remap_pages(page_map)
+    for items in structured_elements.values():
+        if not isinstance(items, list):
+            continue
+        for item in items:
+            page = item.get("page")
+            if isinstance(page, int) and 1 <= page <= len(page_map):
+                item["page"] = page_map[page - 1]
+    return structured_elements
+
+
+def merge_page_records(base_records, override_records):
+    """페이지 번호 기준으로 병합 (override가 같은 페이지를 대체), 페이지 순서 유지"""
+    merged = {record.page: record for record in base_records}
+    for record in override_records:
+        merged[record.page] = record
+    return [merged[page] for page in sorted(merged)]
+
+
+def join_page_texts(page_texts, start_page=1):
+    """페이지 텍스트를 '=== 페이지 N ===' 마커와 함께 하나의 문자열로 결합"""
+    return "".join(
+        PAGE_MARKER.format(page=page_num) + page_text
+        for page_num, page_text in enumerate(page_texts, start_page)
+    )
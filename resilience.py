@@ -0,0 +1,270 @@
+"""
+🛡️ upstream 호출 보호 (재시도 · 동시 호출 제한 · 서킷 브레이커)
+upstage_client(동기 requests)와 ocr_server(비동기 httpx)가 같은 규칙으로 Upstage를 호출
+- 429/5xx/연결 오류는 지수 백오프 + 지터로 재시도, Retry-After 헤더가 있으면 그만큼 대기
+- 호스트별 동시 호출 수 상한 (스레드/이벤트 루프 각각)
+- 연속 실패가 쌓이면 서킷을 열어 일정 시간 바로 실패 (upstream이 버거울 때 부하를 더 얹지 않음)
+- HTTP 라이브러리에 의존하지 않음 (응답 객체의 status_code / headers만 사용)
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# 재시도할 HTTP 상태 코드 (요청 한도 / 일시적 서버 오류)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+# 서킷 브레이커 실패로 세지 않는 재시도 상태 (요청 한도 초과는 장애가 아님)
+NON_FAILURE_STATUS = {429}
+
+# 기본값 (환경변수로 변경 가능)
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+DEFAULT_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+DEFAULT_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+DEFAULT_MAX_RETRY_AFTER = float(os.getenv("UPSTREAM_MAX_RETRY_AFTER", "30"))
+DEFAULT_HOST_CONCURRENCY = int(os.getenv("UPSTREAM_HOST_CONCURRENCY", "8"))
+DEFAULT_BREAKER_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_THRESHOLD", "5"))
+DEFAULT_BREAKER_RESET = float(os.getenv("UPSTREAM_BREAKER_RESET", "30"))
+
+# 서킷 상태
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """서킷이 열려 있어 호출하지 않고 바로 실패"""
+
+    def __init__(self, host, retry_in):
+        if retry_in > 0:
+            super().__init__(f"{host} 서킷 열림 - {retry_in:.0f}초 후 재시도 가능")
+        else:
+            super().__init__(f"{host} 서킷 시험 호출 진행 중 - 잠시 후 재시도")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value):
+    """Retry-After 헤더 (초 또는 HTTP 날짜) → 대기 초 (없거나 잘못되면 None)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """지수 백오프 + full jitter (Retry-After가 있으면 그 값 우선, 상한 max_retry_after)"""
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BACKOFF_BASE,
+                 max_delay=DEFAULT_BACKOFF_MAX, max_retry_after=DEFAULT_MAX_RETRY_AFTER):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt, retry_after=None):
+        """attempt번째(0부터) 실패 후 대기 시간"""
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """연속 실패 failure_threshold회 (재시도 포함 호출 단위) → reset_timeout초 동안 열림 → 시험 호출 1회 (half-open)"""
+
+    def __init__(self, failure_threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self, host=""):
+        """호출 가능 여부 확인 (열려 있으면 CircuitOpenError)"""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(host, retry_in)
+                self.state = CIRCUIT_HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN:
+                # 시험 호출은 하나만 - 나머지는 결과가 나올 때까지 바로 실패
+                if self._trial_in_flight:
+                    self.rejected += 1
+                    raise CircuitOpenError(host, 0)
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == CIRCUIT_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """장애로 세지 않는 결과 (예: 429) - half-open 시험 호출만 해제"""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class UpstreamGuard:
+    """호스트 하나에 대한 재시도 / 동시 호출 제한 / 서킷 브레이커
+
+    call_sync(send) / call_async(send): send()는 응답 객체(status_code, headers)를 반환하거나
+    retryable_exceptions 중 하나를 발생. 재시도 후에도 실패하면 마지막 응답을 반환하거나 예외를 다시 발생.
+    max_attempts로 호출별 최대 시도 횟수를 바꿀 수 있음 (기본: policy.max_attempts)
+    서킷 브레이커에는 재시도를 다 쓴 뒤의 최종 결과만 호출당 한 번 기록
+    """
+
+    def __init__(self, host, policy=None, breaker=None, max_concurrency=DEFAULT_HOST_CONCURRENCY):
+        self.host = host
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_concurrency = max(1, max_concurrency)
+        self.attempts = 0
+        self.retries = 0
+        self._thread_slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._async_slots = {}  # 이벤트 루프별 세마포어
+
+    def _async_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_slots.get(loop)
+        if semaphore is None:
+            semaphore = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _record(self, response):
+        """최종 응답 → 서킷 브레이커에 결과 기록 (재시도를 다 쓴 뒤 호출당 한 번)"""
+        status = response.status_code
+        if status not in RETRYABLE_STATUS:
+            self.breaker.record_success()
+        elif status in NON_FAILURE_STATUS:
+            self.breaker.record_neutral()
+        else:
+            self.breaker.record_failure()
+
+    def _close(self, response):
+        close = getattr(response, "close", None)
+        if close is not None:
+            close()
+
+    async def _aclose(self, response):
+        """비동기 응답 닫기 (httpx: aclose, 없으면 동기 close)"""
+        aclose = getattr(response, "aclose", None)
+        if aclose is not None:
+            await aclose()
+        else:
+            self._close(response)
+
+    def call_sync(self, send, retryable_exceptions=(), on_retry=None, max_attempts=None):
+        max_attempts = max_attempts or self.policy.max_attempts
+        # 서킷 확인과 결과 기록은 재시도 횟수와 관계없이 호출당 한 번
+        self.breaker.before_call(self.host)
+        recorded = False
+        try:
+            for attempt in range(max_attempts):
+                last = attempt == max_attempts - 1
+                self.attempts += 1
+                try:
+                    with self._thread_slots:
+                        response = send()
+                except retryable_exceptions:
+                    if last:
+                        recorded = True
+                        self.breaker.record_failure()
+                        raise
+                    wait = self.policy.delay(attempt)
+                else:
+                    if response.status_code not in RETRYABLE_STATUS or last:
+                        recorded = True
+                        self._record(response)
+                        return response
+                    wait = self.policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                    self._close(response)
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry(attempt, wait)
+                time.sleep(wait)
+        finally:
+            if not recorded:
+                # 재시도 대상이 아닌 예외 / 취소 - 장애로 세지 않고 시험 호출만 해제
+                self.breaker.record_neutral()
+
+    async def call_async(self, send, retryable_exceptions=(), on_retry=None, max_attempts=None):
+        max_attempts = max_attempts or self.policy.max_attempts
+        self.breaker.before_call(self.host)
+        recorded = False
+        try:
+            for attempt in range(max_attempts):
+                last = attempt == max_attempts - 1
+                self.attempts += 1
+                try:
+                    async with self._async_semaphore():
+                        response = await send()
+                except retryable_exceptions:
+                    if last:
+                        recorded = True
+                        self.breaker.record_failure()
+                        raise
+                    wait = self.policy.delay(attempt)
+                else:
+                    if response.status_code not in RETRYABLE_STATUS or last:
+                        recorded = True
+                        self._record(response)
+                        return response
+                    wait = self.policy.delay(attempt, parse_retry_after(response.headers.get("Retry-After")))
+                    # 재시도 전에 버리는 응답의 연결을 풀로 돌려줌 (동기 버전과 동일)
+                    await self._aclose(response)
+                self.retries += 1
+                if on_retry is not None:
+                    on_retry(attempt, wait)
+                await asyncio.sleep(wait)
+        finally:
+            if not recorded:
+                self.breaker.record_neutral()
+
+    def stats(self):
+        return {
+            "host": self.host,
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rejected": self.breaker.rejected,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_upstream_guard(url):
+    """URL 호스트별 프로세스 공용 UpstreamGuard"""
+    host = urlsplit(url).netloc or url
+    with _guards_lock:
+        guard = _guards.get(host)
+        if guard is None:
+            guard = _guards[host] = UpstreamGuard(host)
+    return guard
@@ -0,0 +1,163 @@
+"""
+⚡ 업로드 직후 선행 처리 (speculative extraction)
+사용자가 키워드를 고르는 동안 백그라운드에서 텍스트 추출 · 페이지 분류 · 로컬 표 추출 · 청크 분할을 미리 실행
+- 파일 해시(+ 최대 페이지 수)로 작업을 구분, 같은 파일은 한 번만 처리
+- "데이터 추출 시작" 시 완료된 결과를 바로 쓰거나 진행 중인 작업을 기다림
+- 업로드가 바뀌거나 취소되면 남은 단계를 건너뛰고 결과 폐기
+- Streamlit 호출 없음 (백그라운드 스레드에서 실행)
+"""
+
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from pdf_extraction import ROUTE_TABLE, classify_pages, extract_document, extract_local_tables
+
+# 동시에 선행 처리할 파일 수 / 보관할 결과 수
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_ENTRIES = 8
+
+
+class SpeculationCancelled(Exception):
+    """선행 처리가 취소됨"""
+
+
+class SpeculativeResult:
+    """선행 처리 결과 (본 처리에서 그대로 재사용)"""
+
+    def __init__(self, key):
+        self.key = key
+        self.document = None  # 텍스트 레이어 ExtractedDocument
+        self.classifications = None  # 페이지 분류 결과
+        self.local_tables = None  # {페이지: [표 항목]}
+        self.chunks = None  # document 기준 임베딩용 청크
+        self.stage_ms = {}
+
+
+class SpeculativeTask:
+    """선행 처리 작업 하나 - Future + 취소 플래그"""
+
+    def __init__(self, key, handle):
+        self.key = key
+        self.created_at = time.time()
+        # 백그라운드 작업이 끝날 때까지 PDF 버퍼를 살려 둠
+        self._handle = handle
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """남은 단계를 건너뛰도록 표시 (대기 중이면 바로 취소)"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise SpeculationCancelled(self.key)
+
+    def result(self, timeout=None):
+        """완료 결과 (진행 중이면 대기) - 취소/실패 시 None"""
+        try:
+            return self.future.result(timeout)
+        except (CancelledError, SpeculationCancelled):
+            return None
+        except Exception as e:
+            print(f"⚠️ 선행 처리 실패 ({self.key}): {e}")
+            return None
+
+
+def _run_speculation(task, pdf_bytes, max_pages, chunker):
+    """단계마다 취소 여부를 확인하며 실행"""
+    result = SpeculativeResult(task.key)
+
+    def stage(name, func):
+        task.check()
+        start = time.perf_counter()
+        value = func()
+        result.stage_ms[name] = (time.perf_counter() - start) * 1000
+        return value
+
+    # 백그라운드 스레드에서는 프로세스 풀을 띄우지 않고 직렬 추출
+    result.document = stage("text", lambda: extract_document(pdf_bytes, max_pages=max_pages, parallel=False))
+    result.classifications = stage(
+        "classify",
+        lambda: classify_pages(pdf_bytes, max_pages, page_texts=[record.text for record in result.document]),
+    )
+    table_pages = [c.page for c in result.classifications if c.route == ROUTE_TABLE]
+    result.local_tables = stage("tables", lambda: extract_local_tables(pdf_bytes, table_pages))
+    if chunker is not None:
+        result.chunks = stage("chunks", lambda: chunker(result.document))
+    task.check()
+    return result
+
+
+class SpeculativeExtractor:
+    """업로드 파일별 선행 처리 작업 관리"""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(handle, max_pages=50):
+        return f"{handle.sha256}-p{max_pages}"
+
+    def start(self, handle, max_pages=50, chunker=None):
+        """선행 처리 시작 (같은 키가 이미 있으면 기존 작업 반환)"""
+        key = self.make_key(handle, max_pages)
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is not None and not task.cancelled:
+                return task
+            task = SpeculativeTask(key, handle)
+            task.future = self._executor.submit(_run_speculation, task, handle.view(), max_pages, chunker)
+            self._tasks[key] = task
+            self._prune()
+        return task
+
+    def get(self, key):
+        with self._lock:
+            return self._tasks.get(key)
+
+    def take(self, key, timeout=None):
+        """결과 가져오기 (진행 중이면 완료까지 대기) - 없거나 취소/실패면 None"""
+        task = self.get(key)
+        if task is None or task.cancelled:
+            return None
+        return task.result(timeout)
+
+    def cancel(self, key):
+        """작업 취소 및 결과 폐기"""
+        with self._lock:
+            task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def _prune(self):
+        """오래된 작업부터 정리 (진행 중인 작업도 취소)"""
+        if len(self._tasks) <= self.max_entries:
+            return
+        for key, task in sorted(self._tasks.items(), key=lambda item: item[1].created_at):
+            if len(self._tasks) <= self.max_entries:
+                break
+            task.cancel()
+            del self._tasks[key]
+
+
+_default_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_speculative_extractor():
+    """프로세스 공용 선행 처리 관리자 (Streamlit 재실행에도 유지)"""
+    global _default_extractor
+    with _extractor_lock:
+        if _default_extractor is None:
+            _default_extractor = SpeculativeExtractor()
+    return _default_extractor
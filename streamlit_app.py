@@ -2,7 +2,6 @@ import streamlit as st
 import fitz  # PyMuPDF
 import os
 import re
-import numpy as np
 from openai import OpenAI
 from pathlib import Path
 from docx import Document
@@ -14,6 +13,15 @@ import time
 import uuid
 from functools import wraps
 import pandas as pd
+from pdf_extraction import (
+    ExtractedDocument, PageRecord, extract_document,
+    ROUTE_OCR, ROUTE_TABLE, ROUTE_TEXT, classify_pages, build_sub_pdf,
+    remap_record_pages, remap_structured_pages, merge_page_records, extract_local_tables,
+)
+from extraction_cache import get_extraction_cache, make_cache_key
+from document_buffer import PDFDocumentHandle, as_document_handle
+from speculative import get_speculative_extractor
+from document_model import KIND_TABLE, StructuredDocument, StructuredElement, structured_to_dict
 
 # 페이지 설정
 st.set_page_config(
@@ -158,6 +166,12 @@ if UPSTAGE_API_KEY and UPSTAGE_API_KEY != "your-upstage-api-key-here":
 else:
     st.sidebar.info("ℹ️ Upstage API 미설정 (기본 텍스트 추출)")
 
+# 원격 OCR 서버 (ocr_server.py) - OCR_SERVER_UPSTAGE=true면 Upstage 분석을 서버 경유 페이지별 스트리밍으로 수행
+OCR_API_URL = os.getenv("OCR_API_URL")
+OCR_API_KEY = os.getenv("OCR_API_KEY")
+if OCR_API_URL and OCR_API_KEY and "your-ngrok-url" not in OCR_API_URL:
+    st.sidebar.success("☁️ 원격 OCR API 연결됨")
+
 # 세션 스테이트 초기화
 if 'template' not in st.session_state:
     st.session_state.template = []
@@ -165,6 +179,8 @@ if 'extracted_data' not in st.session_state:
     st.session_state.extracted_data = {}
 if 'pdf_text' not in st.session_state:
     st.session_state.pdf_text = ""
+if 'pdf_document' not in st.session_state:
+    st.session_state.pdf_document = None  # 페이지 레코드 (ExtractedDocument)
 if 'report_sections' not in st.session_state:
     # 기본 보고서 섹션 선택 (모두 선택)
     st.session_state.report_sections = [
@@ -186,6 +202,11 @@ if 'reference_pdfs' not in st.session_state:
     st.session_state.reference_pdfs = {}  # {filename: extracted_text}
 if 'structured_data' not in st.session_state:
     st.session_state.structured_data = None  # Upstage Parse 구조화 데이터
+if 'pending_upstage_job' not in st.session_state:
+    st.session_state.pending_upstage_job = None  # 진행 중인 비동기 Upstage 작업 키
+if 'speculative_key' not in st.session_state:
+    st.session_state.speculative_key = None  # 업로드 직후 선행 처리 작업 키
+    st.session_state.speculative_file_id = None
 
 # 로깅 시스템용 세션 스테이트
 if 'user_name' not in st.session_state:
@@ -397,7 +418,7 @@ def log_data_quality(
             
             # 2. OCR 원본 데이터
             "ocr_raw_text": ocr_raw_text[:20000] if ocr_raw_text else None,  # 처음 20000자만 저장 (재무표 전체 포함)
-            "ocr_structured_data": ocr_structured_data,
+            "ocr_structured_data": structured_to_dict(ocr_structured_data),
             "ocr_tables_count": ocr_tables_count,
             "ocr_charts_count": ocr_charts_count,
             
@@ -507,12 +528,15 @@ def generate_quality_log_txt(log_data):
     txt.append("")
     
     # 표 데이터
+    structured_data = StructuredDocument.from_dict(structured_data or None)
     if structured_data and structured_data.get('tables'):
         txt.append(f"[표 데이터 - 총 {len(structured_data['tables'])}개]")
         txt.append("")
-        for idx, table in enumerate(structured_data['tables'], 1):  # 모든 표 표시
-            txt.append(f"--- 표 {idx} (페이지 {table.get('page', '?')}) ---")
-            table_content = table.get('content', '내용 없음')
+        for idx, table in enumerate(structured_data.tables_in_page_order(), 1):  # 모든 표 표시 (페이지 순)
+            section = structured_data.section_for_page(table.page)
+            section_label = f" - {section.content[:50]}" if section else ""
+            txt.append(f"--- 표 {idx} (페이지 {table.page}{section_label}) ---")
+            table_content = table.content or '내용 없음'
             txt.append(table_content[:1000])  # 각 표당 1000자로 증가 (재무표 전체 포함)
             if len(table_content) > 1000:
                 txt.append("... (생략)")
@@ -730,12 +754,26 @@ REPORT_SECTION_TEMPLATES = {
 }
 
 # Supabase 헬퍼 함수
-def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, report_content=None, create_embeddings_flag=True):
-    """Supabase에 데이터 및 임베딩 저장"""
+def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, report_content=None, create_embeddings_flag=True, chunks=None):
+    """Supabase에 데이터 및 임베딩 저장
+
+    - pdf_file: 업로드 파일 또는 PDFDocumentHandle
+    - extracted_text: 문자열 또는 ExtractedDocument
+    - chunks: 미리 분할해 둔 청크 (선행 처리 결과, 없으면 여기서 분할)
+    """
     if not supabase_client:
         st.warning("⚠️ Supabase 클라이언트가 연결되지 않았습니다.")
         return None
     
+    # 페이지 레코드가 있으면 문자열을 다시 스캔하지 않고 그대로 사용
+    if isinstance(extracted_text, ExtractedDocument):
+        document = extracted_text
+        extracted_text = document.text
+        pages_count = document.page_count
+    else:
+        document = None
+        pages_count = extracted_text.count("=== 페이지")
+    
     try:
         # 1. 기업 정보 저장
         company_data = {
@@ -749,14 +787,22 @@ def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, rep
         # 2. PDF 파일을 Storage에 저장 (선택사항 - 에러 발생 시 무시)
         try:
             file_path = f"{company_id}/main.pdf"
-            pdf_file.seek(0)
-            pdf_bytes = pdf_file.read()
-            supabase_client.storage.from_("company-pdfs").upload(
-                file_path,
-                pdf_bytes,
-                {"content-type": "application/pdf"}
-            )
-            file_size = len(pdf_bytes)
+            pdf_handle = as_document_handle(pdf_file)
+            # 임시 파일로 스필된 대용량 PDF는 디스크에서 바로 업로드
+            if pdf_handle.path:
+                with open(pdf_handle.path, "rb") as pdf_stream:
+                    supabase_client.storage.from_("company-pdfs").upload(
+                        file_path,
+                        pdf_stream,
+                        {"content-type": "application/pdf"}
+                    )
+            else:
+                supabase_client.storage.from_("company-pdfs").upload(
+                    file_path,
+                    pdf_handle.tobytes(),
+                    {"content-type": "application/pdf"}
+                )
+            file_size = pdf_handle.size
             st.info("✅ PDF 파일 Storage 저장 완료")
         except Exception as storage_error:
             st.warning(f"⚠️ PDF Storage 저장 실패 (계속 진행): {storage_error}")
@@ -771,7 +817,7 @@ def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, rep
             "storage_path": file_path,
             "file_size": file_size,
             "extracted_text": extracted_text[:50000],  # 텍스트 크기 제한
-            "pages_count": extracted_text.count("=== 페이지")
+            "pages_count": pages_count
         }
         supabase_client.table("pdf_files").insert(pdf_data).execute()
         st.info("✅ PDF 메타데이터 저장 완료")
@@ -802,7 +848,7 @@ def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, rep
         if st.session_state.get('structured_data'):
             try:
                 import json
-                structured_json = json.dumps(st.session_state.structured_data, ensure_ascii=False)
+                structured_json = json.dumps(structured_to_dict(st.session_state.structured_data), ensure_ascii=False)
                 
                 # companies 테이블에 structured_data 컬럼 추가 필요
                 # 일단 extracted_data 테이블에 특수 필드로 저장
@@ -819,7 +865,8 @@ def save_to_supabase(company_name, pdf_file, extracted_text, extracted_data, rep
         if create_embeddings_flag and openai_client:
             with st.spinner("🔮 임베딩 벡터 생성 중..."):
                 # 텍스트 청크 분할
-                chunks = split_text_into_chunks(extracted_text, max_tokens=500, overlap_tokens=50)
+                if chunks is None:
+                    chunks = split_text_into_chunks(document or extracted_text, max_tokens=500, overlap_tokens=50)
                 st.info(f"📦 {len(chunks)}개 청크 생성 완료")
                 
                 # 임베딩 생성
@@ -887,33 +934,107 @@ def load_company_data(company_id):
 # 임베딩 및 RAG 시스템
 # ============================================
 
-def split_text_into_chunks(text, max_tokens=500, overlap_tokens=50):
-    """텍스트를 토큰 기반으로 청크 분할"""
-    try:
-        encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+def tokenize_text_chunks(text, max_tokens=500, overlap_tokens=50):
+    """토큰 기반 청크 분할 (Streamlit 호출 없음 - 선행 처리 스레드에서도 사용)"""
+    encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+    if isinstance(text, ExtractedDocument):
+        tokens = []
+        for record in text:
+            tokens.extend(encoding.encode(record.render()))
+        if not tokens:
+            tokens = encoding.encode(text.text)
+    else:
         tokens = encoding.encode(text)
-        
-        chunks = []
-        start = 0
-        
-        while start < len(tokens):
-            end = start + max_tokens
-            chunk_tokens = tokens[start:end]
-            chunk_text = encoding.decode(chunk_tokens)
-            
-            chunks.append({
-                "text": chunk_text,
-                "start_pos": start,
+    
+    chunks = []
+    start = 0
+    
+    while start < len(tokens):
+        end = start + max_tokens
+        chunk_tokens = tokens[start:end]
+        chunk_text = encoding.decode(chunk_tokens)
+        
+        chunks.append({
+            "text": chunk_text,
+            "start_pos": start,
+            "end_pos": end,
+            "token_count": len(chunk_tokens)
+        })
+        
+        start += (max_tokens - overlap_tokens)
+    
+    return chunks
+
+class PageChunker:
+    """페이지 레코드를 도착하는 대로 토큰화해 청크 생성 (결과는 tokenize_text_chunks(document)와 동일)
+
+    순서 없이 도착해도 앞 페이지가 모두 모인 만큼만 토큰화하고, 나머지는 finish에서 마무리합니다.
+    """
+    
+    def __init__(self, pages, max_tokens=500, overlap_tokens=50):
+        self.encoding = tiktoken.encoding_for_model("text-embedding-3-small")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self._order = list(pages)
+        self._pending = {}
+        self._consumed = []  # 토큰화한 (페이지, 텍스트) - 최종 문서와 비교용
+        self._tokens = []
+        self._start = 0
+        self.chunks = []
+    
+    def add(self, record):
+        self._pending[record.page] = record
+        while len(self._consumed) < len(self._order) and self._order[len(self._consumed)] in self._pending:
+            self._consume(self._pending.pop(self._order[len(self._consumed)]))
+        self._emit(final=False)
+    
+    def _consume(self, record):
+        self._consumed.append((record.page, record.text))
+        self._tokens.extend(self.encoding.encode(record.render()))
+    
+    def _emit(self, final):
+        # 끝까지 채워진 청크만 먼저 만들고, 마지막 짧은 청크는 final에서
+        while self._start < len(self._tokens) and (final or self._start + self.max_tokens <= len(self._tokens)):
+            end = self._start + self.max_tokens
+            chunk_tokens = self._tokens[self._start:end]
+            self.chunks.append({
+                "text": self.encoding.decode(chunk_tokens),
+                "start_pos": self._start,
                 "end_pos": end,
                 "token_count": len(chunk_tokens)
             })
-            
-            start += (max_tokens - overlap_tokens)
-        
-        return chunks
+            self._start += (self.max_tokens - self.overlap_tokens)
+    
+    def finish(self, document):
+        """최종 문서 기준 청크 - 미리 토큰화한 앞부분이 문서와 같으면 이어서, 다르면 처음부터 분할"""
+        expected = [(record.page, record.text) for record in document]
+        done = len(self._consumed)
+        if not done or self._consumed != expected[:done]:
+            return tokenize_text_chunks(document, self.max_tokens, self.overlap_tokens)
+        for record in document.records[done:]:
+            self._consume(record)
+        self._emit(final=True)
+        return self.chunks
+
+def make_page_chunker(document):
+    """원격 OCR 서버 스트리밍과 함께 돌릴 청크 분할기 (임베딩을 만들 수 없으면 None)"""
+    if not (supabase_client and openai_client and use_ocr_server_for_upstage()):
+        return None
+    try:
+        return PageChunker([record.page for record in document])
+    except Exception as e:
+        print(f"⚠️ 청크 분할기 생성 실패: {e}")
+        return None
+
+def split_text_into_chunks(text, max_tokens=500, overlap_tokens=50):
+    """텍스트를 토큰 기반으로 청크 분할 (ExtractedDocument면 페이지 레코드를 바로 토큰화)"""
+    try:
+        return tokenize_text_chunks(text, max_tokens, overlap_tokens)
     except Exception as e:
         st.error(f"청크 분할 실패: {e}")
         # 폴백: 단순 문자 기반 분할
+        if isinstance(text, ExtractedDocument):
+            text = text.text
         chunk_size = 2000
         overlap = 200
         chunks = []
@@ -1068,43 +1189,76 @@ def retrieve_relevant_context(query, company_id=None, max_tokens=3000):
 # ============================================
 # Upstage Document Parse API 연동
 # ============================================
-import requests
+from upstage_client import (
+    UpstageError, post_document, parse_document_windowed,
+    UpstageJobPending, JOB_COMPLETED, JOB_FAILED, get_job_manager,
+    upstage_form_data, get_asset_store, iter_ocr_server_pages, merge_page_stream,
+)
 
-# Upstage API URL (최신 Document Digitization API)
-UPSTAGE_API_URL = "https://api.upstage.ai/v1/document-digitization"
+# 대용량 PDF는 N페이지 단위로 나눠 동시에 분석 (타임아웃/누락 방지)
+UPSTAGE_WINDOW_PAGES = int(os.getenv("UPSTAGE_WINDOW_PAGES", "10"))
+UPSTAGE_MAX_WORKERS = int(os.getenv("UPSTAGE_MAX_WORKERS", "4"))
+
+# 업로드 직후 선행 처리 (텍스트/표/청크를 버튼 누르기 전에 준비)
+SPECULATIVE_EXTRACTION = os.getenv("SPECULATIVE_EXTRACTION", "true").lower() == "true"
+
+# 비동기 모드: 작업 제출 후 백그라운드에서 폴링 (스크립트 스레드가 2분씩 멈추지 않음)
+UPSTAGE_ASYNC = os.getenv("UPSTAGE_ASYNC", "false").lower() == "true"
+
+# 경량 모드: text/markdown만 요청 (html, 좌표, base64 이미지 생략 → 응답 크기/메모리 절감)
+UPSTAGE_LEAN = os.getenv("UPSTAGE_LEAN", "false").lower() == "true"
+
+# 원격 OCR 서버 경유 분석 (선택): 서버가 창별로 분석하고 끝나는 페이지부터 스트리밍
+# (창 크기/동시 창 수/경량 모드 설정은 서버로 전달, UPSTAGE_ASYNC가 켜져 있으면 비동기 작업 우선)
+OCR_SERVER_UPSTAGE = os.getenv("OCR_SERVER_UPSTAGE", "false").lower() == "true"
+
+def check_ocr_server_available():
+    """원격 OCR 서버 설정 확인"""
+    return bool(OCR_API_URL and OCR_API_KEY and "your-ngrok-url" not in OCR_API_URL)
+
+def use_ocr_server_for_upstage():
+    """Upstage 분석을 원격 OCR 서버 경유로 할지 (OCR_SERVER_UPSTAGE=true + 서버 설정)"""
+    return OCR_SERVER_UPSTAGE and check_ocr_server_available()
 
 def check_upstage_available():
-    """Upstage API 키 설정 확인"""
-    return bool(UPSTAGE_API_KEY and UPSTAGE_API_KEY != "your-upstage-api-key-here")
+    """Upstage API 키 설정 확인 (원격 OCR 서버 경유 포함)"""
+    return bool(UPSTAGE_API_KEY and UPSTAGE_API_KEY != "your-upstage-api-key-here") or use_ocr_server_for_upstage()
 
-# OCR Reader (lazy loading) - 로컬 폴백용
-_ocr_reader = None
+# OCR 엔진 (로컬 폴백용) - 프로세스 공용, 배치 인식
+from ocr_engine import get_ocr_engine, get_ocr_pool, iter_ocr_page_records
+
+# 사전 로딩: auto면 Upstage 미설정일 때만 (EasyOCR가 실제로 쓰일 때) 앱 시작 시 백그라운드 로딩
+EASYOCR_WARMUP = os.getenv("EASYOCR_WARMUP", "auto").lower()
+if EASYOCR_WARMUP == "true" or (EASYOCR_WARMUP == "auto" and not check_upstage_available()):
+    # EASYOCR_WORKERS > 1이면 워커 프로세스들이 각자 모델을 로딩
+    (get_ocr_pool() or get_ocr_engine()).warm_up()
 
 def get_ocr_reader():
-    """OCR Reader를 lazy loading으로 가져오기 (로컬 폴백)"""
-    global _ocr_reader
-    if _ocr_reader is None:
-        import easyocr
-        _ocr_reader = easyocr.Reader(['ko', 'en'], gpu=False)
-    return _ocr_reader
-
-def extract_text_from_pdf(pdf_file, max_pages=50, use_ocr=False):
-    """PDF에서 텍스트 추출"""
+    """OCR Reader 가져오기 (로컬 폴백, 사전 로딩 중이면 완료까지 대기)"""
+    return get_ocr_engine().get_reader()
+
+def extract_document_from_pdf(pdf_file, max_pages=50, use_ocr=False, parallel=True, page_routing=True, prepared=None):
+    """PDF에서 페이지 단위 ExtractedDocument 추출
+
+    - pdf_file: 업로드 파일 또는 PDFDocumentHandle (모든 단계가 같은 버퍼 공유)
+    - parallel=True: 대용량 PDF를 멀티프로세스로 추출
+    - page_routing=True: OCR/표 파싱이 필요한 페이지만 Upstage/EasyOCR로 처리
+    - prepared: 업로드 직후 선행 처리 결과 (텍스트/분류/로컬 표 재사용)
+    """
     try:
-        pdf_file.seek(0)
-        doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        num_pages = min(len(doc), max_pages)
+        pdf_handle = as_document_handle(pdf_file)
+        pdf_bytes = pdf_handle.view()
         
-        text = ""
-        for page_num in range(num_pages):
-            page = doc[page_num]
-            page_text = page.get_text()
-            text += f"\n\n=== 페이지 {page_num+1} ===\n\n{page_text}"
+        if prepared is not None and prepared.document is not None:
+            document = prepared.document
+        else:
+            # 페이지 수가 많으면 프로세스 풀로 병렬 추출 (페이지 순서/마커는 동일)
+            document = extract_document(pdf_bytes, max_pages=max_pages, parallel=parallel)
+        text = document.text
         
         # 텍스트가 충분하고 OCR 요청 안 했으면 그대로 반환
         if len(text.strip()) > 100 and not use_ocr:
-            doc.close()
-            return text, num_pages
+            return document
         
         # OCR 사용
         if use_ocr or len(text.strip()) < 100:
@@ -1113,70 +1267,420 @@ def extract_text_from_pdf(pdf_file, max_pages=50, use_ocr=False):
             else:
                 st.info("🔍 표 구조 인식 모드로 재추출합니다...")
             
-            # Upstage API 시도
-            if check_upstage_available():
+            engine = "upstage" if check_upstage_available() else "easyocr"
+            mode = f"{engine}-routed" if page_routing else engine
+            if engine == "upstage" and UPSTAGE_LEAN:
+                mode += "-lean"
+            filename = pdf_handle.name
+            
+            # 같은 PDF를 같은 모드로 추출한 적이 있으면 OCR/파싱 생략
+            cached = get_cached_extraction(pdf_bytes, mode, max_pages, filename)
+            if cached is not None:
+                return cached
+            
+            # 원격 OCR 서버 경유면 페이지가 도착하는 대로 청크 분할 (저장 시 재사용)
+            chunker = make_page_chunker(document) if engine == "upstage" else None
+            if page_routing:
+                # 페이지별 분류 후 필요한 페이지만 OCR/표 파싱
+                ocr_document = extract_routed_document(
+                    pdf_bytes, document, engine, max_pages, filename, prepared=prepared, chunker=chunker
+                )
+            elif engine == "upstage":
+                # Upstage API 시도
                 st.info("☁️ Upstage Document Parse 사용 (표 구조화 + OCR)")
-                doc.close()
-                pdf_file.seek(0)
-                return extract_text_with_upstage(pdf_file, max_pages)
+                ocr_document = extract_text_with_upstage(
+                    pdf_handle, max_pages, on_page=chunker.add if chunker is not None else None
+                )
             else:
                 # 로컬 OCR 폴백 (Upstage 없을 때만)
                 st.warning("⚠️ Upstage API 미설정, 기본 OCR 사용")
-                doc.close()
-                pdf_file.seek(0)
-                return extract_text_with_easyocr(pdf_file, max_pages)
-        
-        doc.close()
-        return text, num_pages
-        
+                ocr_document = extract_text_with_easyocr(pdf_handle, max_pages)
+            
+            if chunker is not None and ocr_document:
+                ocr_document.chunks = chunker.finish(ocr_document)
+            
+            if ocr_document and ocr_document.complete:
+                # 페이지 라우팅은 EasyOCR에서도 로컬 표를 구조화 데이터로 남김
+                structured = st.session_state.get('structured_data') if engine == "upstage" or page_routing else None
+                get_extraction_cache(supabase_client).put(
+                    make_cache_key(pdf_bytes, mode, max_pages), ocr_document, structured_to_dict(structured)
+                )
+            return ocr_document
+        
+        return document
+        
+    except UpstageJobPending:
+        raise
     except Exception as e:
         st.error(f"PDF 읽기 오류: {e}")
-        return "", 0
+        return ExtractedDocument()
+
+def start_speculative_extraction(uploaded_file, max_pages=50):
+    """업로드 직후 백그라운드 선행 처리 시작 (업로드가 바뀌거나 제거되면 이전 작업 취소)"""
+    extractor = get_speculative_extractor()
+    previous_key = st.session_state.get('speculative_key')
+    
+    if uploaded_file is None:
+        if previous_key:
+            extractor.cancel(previous_key)
+            st.session_state.speculative_key = None
+            st.session_state.speculative_file_id = None
+        return None
+    
+    # 재실행마다 해시를 다시 계산하지 않도록 업로드 ID로 구분
+    file_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+    if previous_key and st.session_state.get('speculative_file_id') == file_id and extractor.get(previous_key):
+        return previous_key
+    
+    handle = PDFDocumentHandle.from_upload(uploaded_file)
+    key = extractor.make_key(handle, max_pages)
+    if previous_key and previous_key != key:
+        extractor.cancel(previous_key)
+    
+    # 임베딩을 만들 때만 청크 분할까지 미리 수행
+    chunker = tokenize_text_chunks if (supabase_client and openai_client) else None
+    extractor.start(handle, max_pages, chunker=chunker)
+    st.session_state.speculative_key = key
+    st.session_state.speculative_file_id = file_id
+    log_activity("speculative_extraction", "started", {"filename": handle.name, "key": key})
+    return key
+
+def take_speculative_result(pdf_handle, max_pages=50):
+    """선행 처리 결과 가져오기 - 진행 중이면 완료까지 대기, 없으면 None"""
+    extractor = get_speculative_extractor()
+    key = extractor.make_key(pdf_handle, max_pages)
+    task = extractor.get(key)
+    if task is None:
+        return None
+    if not task.future.done():
+        with st.spinner("⚡ 업로드 직후 시작한 선행 처리 마무리 중..."):
+            prepared = extractor.take(key)
+    else:
+        prepared = extractor.take(key)
+    if prepared is not None:
+        stages = ", ".join(f"{name} {ms:.0f}ms" for name, ms in prepared.stage_ms.items())
+        st.info(f"⚡ 선행 처리 결과 재사용 ({stages})")
+        log_activity("speculative_extraction", "hit", {"key": key, "stage_ms": prepared.stage_ms})
+    return prepared
+
+def extract_routed_document(pdf_bytes, document, engine, max_pages=50, filename="document.pdf", prepared=None, chunker=None):
+    """페이지별 분류 후 OCR/표 파싱이 필요한 페이지만 엔진으로 보내고 원래 페이지 순서로 병합
+
+    chunker(PageChunker)가 있으면 텍스트 레이어 페이지와 도착한 OCR 페이지를 바로 넘김
+    """
+    if prepared is not None and prepared.classifications is not None:
+        classifications = prepared.classifications
+    else:
+        classifications = classify_pages(pdf_bytes, max_pages, page_texts=[record.text for record in document])
+    ocr_pages = [c.page for c in classifications if c.route == ROUTE_OCR]
+    table_pages = [c.page for c in classifications if c.route == ROUTE_TABLE]
+    text_page_count = sum(1 for c in classifications if c.route == ROUTE_TEXT)
+    
+    # 표 페이지는 벡터 텍스트이므로 PyMuPDF 표 인식기로 로컬 추출 (Upstage 호출 없음)
+    table_start = time.perf_counter()
+    if prepared is not None and prepared.local_tables is not None:
+        local_tables = prepared.local_tables
+    else:
+        local_tables = extract_local_tables(pdf_bytes, table_pages)
+    table_ms = (time.perf_counter() - table_start) * 1000
+    local_table_count = sum(len(tables or []) for tables in local_tables.values())
+    
+    # 원격 파싱은 이미지 위주 페이지만: 스캔 페이지 + 로컬 표가 없고 이미지가 있는 표 페이지
+    # (EasyOCR는 표 구조를 만들지 못하므로 스캔 페이지만 처리)
+    coverage = {c.page: c.image_coverage for c in classifications}
+    if engine == "upstage":
+        image_table_pages = [
+            page for page, tables in local_tables.items()
+            if tables is None or (not tables and coverage[page] > 0)
+        ]
+        target_pages = sorted(ocr_pages + image_table_pages)
+    else:
+        target_pages = ocr_pages
+    
+    st.info(
+        f"🧭 페이지 분류: 텍스트 {text_page_count}개, 스캔 {len(ocr_pages)}개, 표 {len(table_pages)}개 "
+        f"(로컬 표 {local_table_count}개, {table_ms:.0f}ms) → {len(target_pages)}/{len(classifications)}페이지만 {engine} 처리"
+    )
+    log_activity("page_routing", "success", {
+        "filename": filename,
+        "engine": engine,
+        "total_pages": len(classifications),
+        "ocr_pages": ocr_pages,
+        "table_pages": table_pages,
+        "local_tables": local_table_count,
+        "remote_pages": target_pages
+    })
+    
+    # 이전 문서의 구조화 데이터가 남지 않도록 초기화 (로컬 표 + Upstage 결과로 다시 채움)
+    st.session_state.structured_data = None
+    
+    ocr_records = []
+    if target_pages and engine == "upstage":
+        on_page = None
+        if chunker is not None:
+            target_set = set(target_pages)
+            for record in document:
+                if record.page not in target_set:
+                    chunker.add(record)
+            def add_ocr_page(record):
+                # 부분 PDF 기준 페이지 번호 → 원본 페이지 번호
+                if 1 <= record.page <= len(target_pages):
+                    chunker.add(PageRecord(target_pages[record.page - 1], record.text, record.source))
+            on_page = add_ocr_page
+        if len(target_pages) == len(classifications):
+            sub_handle = PDFDocumentHandle(pdf_bytes, name=filename)
+            sub_document = extract_text_with_upstage(sub_handle, max_pages=len(target_pages), on_page=on_page)
+        else:
+            sub_handle = PDFDocumentHandle(build_sub_pdf(pdf_bytes, target_pages), name=filename)
+            sub_document = extract_text_with_upstage(
+                sub_handle, max_pages=len(target_pages), source_bytes=pdf_bytes, source_pages=target_pages,
+                on_page=on_page,
+            )
+        # 부분 PDF 기준 페이지 번호 → 원본 페이지 번호
+        remap_structured_pages(st.session_state.get('structured_data'), target_pages)
+        ocr_records = remap_record_pages(sub_document.records, target_pages)
+    elif target_pages:
+        sub_document = extract_text_with_easyocr(PDFDocumentHandle(pdf_bytes, name=filename), max_pages, pages=target_pages)
+        ocr_records = sub_document.records
+    
+    # 로컬 표를 구조화 데이터에 합침 (extract_all_keywords_batch가 그대로 사용)
+    structured = st.session_state.get('structured_data') or StructuredDocument()
+    for page in sorted(local_tables):
+        for table in local_tables[page] or []:
+            structured.add(StructuredElement.from_dict(KIND_TABLE, table))
+    st.session_state.structured_data = structured if len(structured) else None
+    
+    if not target_pages:
+        return document
+    
+    if not ocr_records:
+        st.warning("⚠️ 선택 페이지 OCR 결과가 없어 텍스트 레이어를 그대로 사용합니다.")
+        return ExtractedDocument(document.records, num_pages=document.num_pages, complete=False)
+    
+    return ExtractedDocument(
+        merge_page_records(document.records, ocr_records),
+        num_pages=document.num_pages,
+        complete=sub_document.complete,
+    )
 
-def extract_text_with_upstage(pdf_file, max_pages=50):
-    """Upstage Document Parse API로 PDF 전체 분석 (표 구조화!)"""
-    if not UPSTAGE_API_KEY:
+def get_cached_extraction(pdf_bytes, mode, max_pages, filename):
+    """추출 캐시 조회 - 적중 시 structured_data 복원 후 ExtractedDocument 반환"""
+    try:
+        cache_key = make_cache_key(pdf_bytes, mode, max_pages)
+        cached = get_extraction_cache(supabase_client).get(cache_key)
+    except Exception as e:
+        print(f"추출 캐시 조회 실패: {e}")
+        return None
+    
+    if cached is None:
+        log_activity("extraction_cache", "miss", {"filename": filename, "mode": mode})
+        return None
+    
+    document, structured_elements = cached
+    st.session_state.structured_data = StructuredDocument.from_dict(structured_elements)
+    st.success(f"♻️ 이전 추출 결과 재사용 ({mode}, {document.num_pages}페이지) - OCR/파싱 생략")
+    log_activity("extraction_cache", "hit", {
+        "filename": filename,
+        "mode": mode,
+        "cache_key": cache_key,
+        "pages": document.num_pages
+    })
+    return document
+
+def extract_text_from_pdf(pdf_file, max_pages=50, use_ocr=False, parallel=True):
+    """PDF에서 텍스트 추출 (기존 호출부 호환용 - (text, num_pages) 반환)"""
+    document = extract_document_from_pdf(pdf_file, max_pages=max_pages, use_ocr=use_ocr, parallel=parallel)
+    return document.text, document.num_pages
+
+def get_async_upstage_result(pdf_bytes, filename, max_pages=50, source_bytes=None, source_pages=None):
+    """비동기 Upstage 작업 결과 조회 - 없으면 제출, 진행 중이면 UpstageJobPending
+
+    - 부분 PDF를 보낼 때는 source_bytes(원본 PDF) + source_pages(원본 페이지 번호)로 작업 키 생성
+      (재실행마다 부분 PDF를 다시 만들어도 같은 작업을 찾도록)
+    """
+    mode = "upstage-async-lean" if UPSTAGE_LEAN else "upstage-async"
+    if source_bytes is not None:
+        job_key = make_cache_key(source_bytes, mode, max_pages, pages=source_pages)
+    else:
+        job_key = make_cache_key(pdf_bytes, mode, max_pages)
+    manager = get_job_manager()
+    job = manager.get(job_key)
+    
+    if job is not None and job.status == JOB_COMPLETED:
+        return job.result, (job.updated_at - job.created_at) * 1000
+    
+    if job is not None and job.status == JOB_FAILED:
+        # 다음 실행 때 다시 제출할 수 있도록 제거
+        manager.discard(job_key)
+        raise UpstageError(f"비동기 작업 실패: {job.error}")
+    
+    if job is None:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            over_limit = len(doc) > max_pages
+        if over_limit:
+            pdf_bytes = build_sub_pdf(pdf_bytes, list(range(1, max_pages + 1)))
+        job = manager.submit(job_key, pdf_bytes, filename, UPSTAGE_API_KEY, data=upstage_form_data(UPSTAGE_LEAN))
+        log_activity("upstage_async", "submitted", {"filename": filename, "job_key": job_key})
+    
+    raise UpstageJobPending(job)
+
+def render_upstage_job_progress():
+    """비동기 Upstage 작업 진행 상황/부분 결과 표시 - 완료되면 추출 파이프라인 재개"""
+    job_key = st.session_state.get('pending_upstage_job')
+    job = get_job_manager().get(job_key) if job_key else None
+    if job is None:
+        st.session_state.pending_upstage_job = None
+        return
+    
+    if job.done:
+        st.session_state.pending_upstage_job = None
+        st.session_state.resume_extraction = True
+        st.rerun()
+    
+    st.markdown("### ⏳ Upstage 문서 분석 진행 중")
+    elapsed = time.time() - job.created_at
+    if job.total_pages:
+        st.progress(job.progress, text=f"{job.filename}: {job.completed_pages}/{job.total_pages}페이지 ({elapsed:.0f}초)")
+    else:
+        st.progress(0.0, text=f"{job.filename}: 작업 대기 중... ({elapsed:.0f}초)")
+    st.caption("다른 작업을 계속하셔도 됩니다. 분석이 끝나면 자동으로 데이터 추출을 이어갑니다.")
+    
+    # 도착한 배치의 페이지 미리보기
+    partial = job.partial_result()
+    if partial["elements"]:
+        pages_preview = {}
+        for elem in partial["elements"]:
+            content = elem.get("content", {})
+            elem_text = content.get("text", "") if isinstance(content, dict) else str(content)
+            pages_preview.setdefault(elem.get("page", 1), []).append(elem_text)
+        with st.expander(f"📄 부분 결과 미리보기 ({len(pages_preview)}페이지 도착)"):
+            for page_num in sorted(pages_preview):
+                st.markdown(f"**페이지 {page_num}**")
+                st.text("\n".join(pages_preview[page_num])[:300])
+    
+    if not hasattr(st, "fragment"):
+        st.button("🔄 진행 상황 새로고침")
+
+# Streamlit fragment가 있으면 이 영역만 주기적으로 다시 그림 (스크립트 전체를 막지 않음)
+if hasattr(st, "fragment"):
+    render_upstage_job_progress = st.fragment(run_every=2)(render_upstage_job_progress)
+
+def upstage_element_text(element):
+    """Upstage 요소 하나의 텍스트 (text가 없으면 html)"""
+    content_obj = element.get("content", {})
+    if isinstance(content_obj, dict):
+        return content_obj.get("text", "") or content_obj.get("html", "")
+    return str(content_obj)
+
+def get_ocr_server_result(pdf_bytes, filename, max_pages=50, on_page=None):
+    """원격 OCR 서버에서 페이지별 결과를 받는 대로 진행 상황을 표시하며 병합
+
+    - 창 크기/동시 창 수/경량 모드는 UPSTAGE_WINDOW_PAGES / UPSTAGE_MAX_WORKERS / UPSTAGE_LEAN 그대로 전달
+    - on_page: 페이지가 도착할 때마다 PageRecord로 호출 (병합을 기다리지 않고 청크 분할 등 시작)
+    반환: (병합된 응답 dict, 실패한 창 목록 [(첫 페이지, 마지막 페이지, 오류 메시지), ...])
+    """
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        total_pages = min(len(doc), max_pages)
+        if len(doc) > max_pages:
+            pdf_bytes = build_sub_pdf(pdf_bytes, list(range(1, total_pages + 1)))
+    
+    progress = st.progress(0.0, text=f"☁️ 원격 OCR 서버로 {total_pages}페이지 분석 중...")
+    page_results, failures = [], []
+    records = iter_ocr_server_pages(
+        OCR_API_URL, OCR_API_KEY, pdf_bytes, filename,
+        window_pages=UPSTAGE_WINDOW_PAGES, max_in_flight=UPSTAGE_MAX_WORKERS, lean=UPSTAGE_LEAN,
+    )
+    for record in records:
+        if "summary" in record:
+            continue
+        if record.get("status") == "failed":
+            first_page, last_page = record.get("pages", [None, None])
+            failures.append((first_page, last_page, record.get("error", "")))
+            continue
+        page_results.append(record)
+        if on_page is not None:
+            # extract_text_with_upstage가 병합 결과에서 만드는 페이지 텍스트와 같은 방식
+            page_text = "\n\n".join(t for t in map(upstage_element_text, record.get("elements", [])) if t)
+            if page_text:
+                on_page(PageRecord(record["page"], page_text, "upstage"))
+        progress.progress(
+            min(len(page_results) / max(total_pages, 1), 1.0),
+            text=f"📄 {len(page_results)}/{total_pages}페이지 수신 (방금: {record['page']}페이지)",
+        )
+    progress.empty()
+    return merge_page_stream(page_results), failures
+
+def extract_text_with_upstage(pdf_file, max_pages=50, windowed=True, async_mode=None, source_bytes=None, source_pages=None, on_page=None):
+    """Upstage Document Parse API로 PDF 전체 분석 (표 구조화!) - ExtractedDocument 반환
+
+    - windowed=True면 UPSTAGE_WINDOW_PAGES보다 긴 PDF를 페이지 창으로 나눠 동시 요청
+    - async_mode=True면 비동기 작업으로 제출하고, 끝나지 않았으면 UpstageJobPending 발생
+      (기본값: UPSTAGE_ASYNC 환경변수, source_bytes/source_pages는 부분 PDF의 작업 키용)
+    - OCR_SERVER_UPSTAGE=true면 원격 OCR 서버에서 끝나는 페이지부터 스트리밍으로 수신
+      (on_page: 도착한 페이지마다 PageRecord로 호출, 비동기 모드에서는 사용하지 않음)
+    """
+    use_ocr_server = use_ocr_server_for_upstage()
+    if async_mode is None:
+        # 비동기 작업은 Upstage 직접 호출 (API 키 없이 서버만 설정했으면 서버 경유)
+        async_mode = UPSTAGE_ASYNC and bool(UPSTAGE_API_KEY)
+    
+    if not UPSTAGE_API_KEY and not use_ocr_server:
         st.error("Upstage API 키가 설정되지 않았습니다.")
-        return "", 0
+        return ExtractedDocument()
     
     try:
-        pdf_file.seek(0)
-        pdf_bytes = pdf_file.read()
-        
-        st.info("🚀 Upstage Document Parse로 PDF 분석 중... (표 구조 인식)")
-        
-        # Upstage API 호출
-        headers = {
-            "Authorization": f"Bearer {UPSTAGE_API_KEY}"
-        }
-        
-        files = {
-            "document": (getattr(pdf_file, 'name', 'document.pdf'), pdf_bytes, "application/pdf")
-        }
-        
-        # Upstage Document Parse API 파라미터 (표 + 차트 인식)
-        data = {
-            "ocr": "force",  # Always apply OCR
-            "model": "document-parse",  # 명시적으로 모델 지정
-            "output_formats": "['text', 'html', 'markdown']",  # JSON 배열을 문자열로
-            "coordinates": "true",  # 좌표 정보 포함
-            "base64_encoding": "['table', 'figure']",  # 표와 차트/그래프 모두 인코딩
-        }
-        
-        response = requests.post(
-            UPSTAGE_API_URL,
-            headers=headers,
-            files=files,
-            data=data,
-            timeout=120  # PDF 분석은 시간이 걸릴 수 있음
-        )
-        
-        if response.status_code != 200:
-            st.error(f"❌ Upstage API 오류: {response.status_code}")
-            st.error(f"상세: {response.text}")
-            return "", 0
-        
-        result = response.json()
+        pdf_handle = as_document_handle(pdf_file)
+        pdf_bytes = pdf_handle.view()
+        
+        filename = pdf_handle.name
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            total_pages = min(len(doc), max_pages)
+        
+        request_start = time.perf_counter()
+        failed_windows = []
+        if use_ocr_server and not async_mode:
+            result, failed_windows = get_ocr_server_result(pdf_bytes, filename, max_pages, on_page=on_page)
+            for first_page, last_page, error in failed_windows:
+                st.warning(f"⚠️ 페이지 {first_page}-{last_page or '?'} 분석 실패 (원격 OCR 서버): {error}")
+            if failed_windows and not result["elements"]:
+                st.error("❌ 원격 OCR 서버에서 모든 페이지 분석에 실패했습니다.")
+                return ExtractedDocument()
+        elif async_mode:
+            result, request_ms = get_async_upstage_result(
+                pdf_bytes, filename, max_pages, source_bytes=source_bytes, source_pages=source_pages
+            )
+            st.info(f"🚀 Upstage 비동기 분석 결과 수신 ({request_ms / 1000:.1f}초 소요)")
+        elif windowed and total_pages > UPSTAGE_WINDOW_PAGES:
+            st.info(
+                f"🚀 Upstage Document Parse로 PDF 분석 중... "
+                f"({total_pages}페이지를 {UPSTAGE_WINDOW_PAGES}페이지씩 나눠 동시 분석)"
+            )
+            result, failed_windows = parse_document_windowed(
+                pdf_bytes,
+                filename,
+                UPSTAGE_API_KEY,
+                max_pages=max_pages,
+                window_pages=UPSTAGE_WINDOW_PAGES,
+                max_workers=UPSTAGE_MAX_WORKERS,
+                data=upstage_form_data(UPSTAGE_LEAN),
+                asset_store=get_asset_store(),
+            )
+            for first_page, last_page, error in failed_windows:
+                st.warning(f"⚠️ 페이지 {first_page}-{last_page} 분석 실패 (재시도 후에도 실패): {error}")
+            if failed_windows and not result["elements"]:
+                st.error("❌ 모든 페이지 창 분석에 실패했습니다.")
+                return ExtractedDocument()
+        else:
+            st.info("🚀 Upstage Document Parse로 PDF 분석 중... (표 구조 인식)")
+            # PDF 분석은 시간이 걸릴 수 있음
+            result = post_document(
+                pdf_bytes, filename, UPSTAGE_API_KEY,
+                data=upstage_form_data(UPSTAGE_LEAN),
+                timeout=120,
+                asset_store=get_asset_store(),
+            )
+        if not async_mode:
+            request_ms = (time.perf_counter() - request_start) * 1000
         
         # 디버그: 응답 구조 확인
         with st.expander("🔍 디버그: Upstage API 응답 구조"):
@@ -1202,56 +1706,8 @@ def extract_text_with_upstage(pdf_file, max_pages=50):
         # API v2.0 응답 구조: elements 배열에서 직접 추출
         elements_list = result.get("elements", [])
         
-        # 구조화된 데이터 추출 (표, 차트, 제목, 리스트 등)
-        structured_elements = {
-            "tables": [],
-            "charts": [],  # 차트/그래프 추가
-            "headings": [],
-            "paragraphs": [],
-            "lists": []
-        }
-        
-        # elements 배열에서 직접 추출 (v2.0 API)
-        for element in elements_list:
-            elem_category = element.get("category", "")
-            elem_content = element.get("content", {})
-            elem_page = element.get("page", 0)
-            
-            # content는 dict 형태 {html, markdown, text}
-            elem_html = elem_content.get("html", "") if isinstance(elem_content, dict) else ""
-            elem_text = elem_content.get("text", "") if isinstance(elem_content, dict) else str(elem_content)
-            elem_markdown = elem_content.get("markdown", "") if isinstance(elem_content, dict) else ""
-            
-            if "table" in elem_category.lower():
-                structured_elements["tables"].append({
-                    "page": elem_page,
-                    "content": elem_text or elem_html or elem_markdown,
-                    "html": elem_html,
-                    "markdown": elem_markdown
-                })
-            elif "figure" in elem_category.lower() or "chart" in elem_category.lower() or "image" in elem_category.lower():
-                structured_elements["charts"].append({
-                    "page": elem_page,
-                    "content": elem_text or elem_html or elem_markdown,
-                    "html": elem_html,
-                    "markdown": elem_markdown,
-                    "category": elem_category
-                })
-            elif "heading" in elem_category.lower() or "title" in elem_category.lower():
-                structured_elements["headings"].append({
-                    "page": elem_page,
-                    "content": elem_text or elem_html
-                })
-            elif "list" in elem_category.lower():
-                structured_elements["lists"].append({
-                    "page": elem_page,
-                    "content": elem_text or elem_html
-                })
-            elif "paragraph" in elem_category.lower():
-                structured_elements["paragraphs"].append({
-                    "page": elem_page,
-                    "content": elem_text or elem_html
-                })
+        # 구조화된 데이터 추출 (표, 차트, 제목, 리스트 등) - 페이지/종류별 인덱스 포함
+        structured_elements = StructuredDocument.from_upstage_elements(elements_list)
         
         # 페이지별 정보 (호환성 유지)
         pages = result.get("pages", [])
@@ -1318,7 +1774,7 @@ def extract_text_with_upstage(pdf_file, max_pages=50):
         st.session_state.structured_data = structured_elements
         
         # 페이지별 텍스트 구조화 (elements로부터 재구성)
-        structured_text = ""
+        records = []
         if elements_list:
             # elements를 페이지별로 그룹화
             pages_dict = {}
@@ -1327,65 +1783,83 @@ def extract_text_with_upstage(pdf_file, max_pages=50):
                 if page_num not in pages_dict:
                     pages_dict[page_num] = []
                 
-                content_obj = elem.get("content", {})
-                if isinstance(content_obj, dict):
-                    elem_text = content_obj.get("text", "") or content_obj.get("html", "")
-                else:
-                    elem_text = str(content_obj)
-                
+                elem_text = upstage_element_text(elem)
                 if elem_text:
                     pages_dict[page_num].append(elem_text)
             
-            # 페이지별로 텍스트 구성
-            for page_num in sorted(pages_dict.keys())[:max_pages]:
-                structured_text += f"\n\n=== 페이지 {page_num} ===\n\n"
-                structured_text += "\n\n".join(pages_dict[page_num])
-        
-        # structured_text가 없으면 content.text 사용
-        final_text = structured_text if structured_text.strip() else text
-        
-        return final_text, min(num_pages, max_pages)
+            # 페이지별 레코드 구성 (API 호출 시간은 페이지 수로 균등 배분)
+            page_nums = sorted(pages_dict.keys())[:max_pages]
+            per_page_ms = request_ms / len(page_nums) if page_nums else 0.0
+            for page_num in page_nums:
+                records.append(PageRecord(page_num, "\n\n".join(pages_dict[page_num]), "upstage", per_page_ms))
+        
+        # 페이지 레코드가 비어 있으면 content.text 사용 (실패한 창이 있으면 캐시하지 않음)
+        return ExtractedDocument(
+            records, num_pages=min(num_pages, max_pages), fallback_text=text, complete=not failed_windows
+        )
         
-    except requests.Timeout:
-        st.error("⏱️ Upstage API 타임아웃 (대용량 PDF는 시간이 걸릴 수 있습니다)")
-        return "", 0
+    except UpstageJobPending:
+        raise
+    except UpstageError as e:
+        if e.status_code is None and e.retryable:
+            st.error("⏱️ Upstage API 타임아웃 (대용량 PDF는 시간이 걸릴 수 있습니다)")
+        else:
+            st.error(f"❌ Upstage API 오류: {e.status_code}")
+        st.error(f"상세: {e}")
+        return ExtractedDocument()
     except Exception as e:
         st.error(f"❌ Upstage API 오류: {e}")
         import traceback
         st.error(traceback.format_exc())
-        return "", 0
+        return ExtractedDocument()
+
+def iter_easyocr_records(pdf_bytes, max_pages=50, pages=None):
+    """로컬 EasyOCR로 PageRecord 생성 (pages: 처리할 페이지 번호, 1부터)
+    
+    EASYOCR_WORKERS > 1이면 멀티 프로세스 워커 풀, 아니면 현재 프로세스에서 배치 인식
+    """
+    pool = get_ocr_pool()
+    if pool is not None:
+        try:
+            # 풀 결과는 전부 모은 뒤 내보냄 (중간 실패 시 중복 없이 단일 프로세스로 재시도)
+            return iter(list(pool.iter_page_records(pdf_bytes, max_pages=max_pages, pages=pages)))
+        except Exception as e:
+            print(f"⚠️ OCR 워커 풀 실패, 단일 프로세스로 재시도: {e}")
+    return iter_ocr_page_records(pdf_bytes, get_ocr_engine(), max_pages=max_pages, pages=pages)
 
-def extract_text_with_easyocr(pdf_file, max_pages=50):
-    """로컬 EasyOCR로 텍스트 추출 (느림)"""
-    text = ""
+def extract_text_with_easyocr(pdf_file, max_pages=50, pages=None):
+    """로컬 EasyOCR로 텍스트 추출 (느림) - ExtractedDocument 반환 (pages 지정 시 해당 페이지만)"""
     try:
-        pdf_file.seek(0)
-        doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        num_pages = min(len(doc), max_pages)
+        pdf_bytes = as_document_handle(pdf_file).view()
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            num_pages = min(len(doc), max_pages)
+        total = len(pages) if pages else num_pages
+        
+        engine = get_ocr_engine()
+        if get_ocr_pool() is None and not engine.is_ready:
+            with st.spinner("🔄 EasyOCR 모델 로딩 중..."):
+                engine.get_reader()
         
         progress_bar = st.progress(0)
+        document = ExtractedDocument(num_pages=num_pages)
         
-        for page_num in range(num_pages):
-            page = doc[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-            img_array = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-            
-            if pix.n == 4:
-                img_array = img_array[:, :, :3]
-            
-            ocr_reader = get_ocr_reader()
-            ocr_result = ocr_reader.readtext(img_array, detail=0, paragraph=True)
-            page_text = "\n".join(ocr_result)
-            text += f"\n\n=== 페이지 {page_num+1} ===\n\n{page_text}"
-            
-            progress_bar.progress((page_num + 1) / num_pages)
+        for record in iter_easyocr_records(pdf_bytes, max_pages, pages=pages):
+            document.append(record)
+            progress_bar.progress(min(len(document) / total, 1.0))
         
         progress_bar.empty()
-        doc.close()
-        return text, num_pages
+        if document:
+            page_times = [record.elapsed_ms for record in document]
+            pool = get_ocr_pool()
+            mode_label = f"워커 {pool.workers}개" if pool is not None else f"배치 {engine.batch_size}장"
+            st.caption(
+                f"🔤 EasyOCR: {len(document)}페이지, 페이지당 평균 {sum(page_times) / len(page_times) / 1000:.2f}초 "
+                f"(최대 {max(page_times) / 1000:.2f}초, {mode_label})"
+            )
+        return document
     except Exception as e:
         st.error(f"로컬 OCR 오류: {e}")
-        return "", 0
+        return ExtractedDocument()
 
 def extract_all_keywords_batch(text, field_names, structured_data=None):
     """배치 방식으로 모든 키워드를 한 번에 추출 (구조화된 데이터 우선 활용)"""
@@ -1402,7 +1876,8 @@ def extract_all_keywords_batch(text, field_names, structured_data=None):
         has_structured_tables = False
         
         if structured_data:
-            # 표 데이터를 마크다운/HTML 형식으로 변환
+            structured_data = StructuredDocument.from_dict(structured_data)
+            # 표 데이터를 마크다운/HTML 형식으로 변환 (페이지 순, 표가 속한 섹션 제목 포함)
             if structured_data.get("tables"):
                 has_structured_tables = True
                 context_info += "\n\n" + "="*60 + "\n"
@@ -1410,8 +1885,11 @@ def extract_all_keywords_batch(text, field_names, structured_data=None):
                 context_info += "="*60 + "\n\n"
                 context_info += "⚠️ **재무 데이터는 아래 표에서만 추출하세요! 본문 텍스트 무시!**\n\n"
                 
-                for idx, table in enumerate(structured_data['tables']):  # 모든 표 표시
-                    context_info += f"▶ **[표 {idx+1}] (페이지 {table.get('page', '?')})**\n\n"
+                tables = structured_data.tables_in_page_order()
+                for idx, table in enumerate(tables):  # 모든 표 표시
+                    section = structured_data.section_for_page(table.page)
+                    section_label = f", 섹션: {section.content[:50]}" if section else ""
+                    context_info += f"▶ **[표 {idx+1}] (페이지 {table.page}{section_label})**\n\n"
                     
                     # Markdown이 가장 파싱하기 쉬우므로 우선
                     table_markdown = table.get('markdown', '')
@@ -1464,9 +1942,9 @@ def extract_all_keywords_batch(text, field_names, structured_data=None):
             # 주요 제목 요약 (문서 구조 파악용)
             if structured_data.get("headings"):
                 context_info += "\n[📑 문서 구조 - 주요 섹션]\n"
-                for heading in structured_data['headings'][:15]:  # 최대 15개
-                    heading_text = heading['content'][:100]  # 긴 제목은 자르기
-                    context_info += f"  • 페이지 {heading.get('page', '?')}: {heading_text}\n"
+                for level, page, title in structured_data.outline()[:15]:  # 최대 15개
+                    indent = "  " * (level + 1)
+                    context_info += f"{indent}• 페이지 {page}: {title[:100]}\n"  # 긴 제목은 자르기
                 context_info += "\n"
         
         # 텍스트 길이 조정 - 표가 있으면 중간, 없으면 길게
@@ -2083,19 +2561,23 @@ def generate_report_with_openai(data_dict, report_sections=None, model="gpt-4o-m
     # 구조화된 데이터 컨텍스트 추가
     structured_context = ""
     if structured_data:
+        structured_data = StructuredDocument.from_dict(structured_data)
         structured_context = "\n\n**📊 문서 구조 정보 (Upstage Parse):**\n"
         
-        # 표 데이터 요약
+        # 표 데이터 요약 (페이지 순, 표가 속한 섹션 제목 포함)
         if structured_data.get("tables"):
             structured_context += f"\n[표 데이터 {len(structured_data['tables'])}개 인식]\n"
-            for idx, table in enumerate(structured_data['tables']):
-                structured_context += f"\n표 {idx+1} (페이지 {table['page']}):\n{table['content'][:800]}\n"
+            tables = structured_data.tables_in_page_order()
+            for idx, table in enumerate(tables):
+                section = structured_data.section_for_page(table.page)
+                section_label = f", {section.content[:50]}" if section else ""
+                structured_context += f"\n표 {idx+1} (페이지 {table.page}{section_label}):\n{table.content[:800]}\n"
         
-        # 문서 구조
+        # 문서 구조 (제목 수준별 들여쓰기)
         if structured_data.get("headings"):
             structured_context += f"\n[문서 구조 - 주요 섹션]\n"
-            for heading in structured_data['headings'][:15]:
-                structured_context += f"- {heading['content']}\n"
+            for level, page, title in structured_data.outline()[:15]:
+                structured_context += f"{'  ' * level}- {title}\n"
     
     # 참고자료 텍스트 추가 (기존 방식)
     reference_context = ""
@@ -2224,7 +2706,7 @@ with st.sidebar:
                             
                             # 구조화된 데이터 로드 (Upstage Parse 결과)
                             if loaded_structured_data:
-                                st.session_state.structured_data = loaded_structured_data
+                                st.session_state.structured_data = StructuredDocument.from_dict(loaded_structured_data)
                                 st.success(f"✅ 구조화된 데이터 복원 완료! (표 {len(loaded_structured_data.get('tables', []))}개)")
                             
                             # 템플릿 자동 생성 (키워드 복원)
@@ -2466,6 +2948,10 @@ with tab2:
     st.markdown("### 📄 기업 보고서 (필수)")
     uploaded_file = st.file_uploader("기업 사업보고서 PDF 업로드", type=['pdf'], key="main_pdf")
     
+    # 키워드를 고르는 동안 텍스트 추출/표 인식/청크 분할을 미리 시작
+    if SPECULATIVE_EXTRACTION:
+        start_speculative_extraction(uploaded_file)
+    
     # 고급 분석 옵션 - 기본값을 True로 변경하고 강조
     st.markdown("---")
     st.markdown("### ⚙️ 추출 옵션")
@@ -2501,10 +2987,17 @@ with tab2:
     
     st.markdown("---")
     
+    # 비동기 Upstage 작업이 진행 중이면 진행 상황 표시 (완료 시 자동 재개)
+    if st.session_state.get('pending_upstage_job'):
+        render_upstage_job_progress()
+    
+    # 비동기 작업 완료 후 자동 재개 여부
+    resume_extraction = st.session_state.pop('resume_extraction', False)
+    
     # 사용자 정보 확인
     if not st.session_state.user_name:
         st.warning("⚠️ 먼저 사이드바에서 사용자 정보를 입력하세요")
-    elif uploaded_file and st.button("🚀 데이터 추출 시작", type="primary"):
+    elif uploaded_file and (st.button("🚀 데이터 추출 시작", type="primary") or resume_extraction):
         if not st.session_state.template:
             st.error("❌ 템플릿을 먼저 설정하세요! 사이드바에서 키워드를 추가하세요.")
         else:
@@ -2517,8 +3010,8 @@ with tab2:
                 user = create_or_get_test_user(st.session_state.user_name, st.session_state.user_email)
                 user_id = user['id'] if user else None
                 
-                # 세션 시작 로그
-                if user_id:
+                # 세션 시작 로그 (비동기 작업 재개 시에는 기존 세션 유지)
+                if user_id and not resume_extraction:
                     start_test_session(user_id, "처리 중", uploaded_file.name)
                 
                 # PDF 처리 시작
@@ -2526,15 +3019,24 @@ with tab2:
                 
                 with st.spinner("📄 PDF 처리 중..."):
                     pdf_start = time.time()
-                    # 메인 PDF 텍스트 추출
-                    pdf_text, num_pages = extract_text_from_pdf(uploaded_file, max_pages=50, use_ocr=use_ocr_mode)
+                    # 업로드 파일을 한 번만 읽어 모든 단계가 같은 버퍼 공유
+                    main_pdf = PDFDocumentHandle.from_upload(uploaded_file)
+                    
+                    # 업로드 직후 시작한 선행 처리 결과 (완료됐거나 진행 중이면 기다렸다가 재사용)
+                    prepared = take_speculative_result(main_pdf) if SPECULATIVE_EXTRACTION else None
+                    
+                    # 메인 PDF 텍스트 추출 (페이지 레코드 유지, 전체 문자열은 한 번만 결합)
+                    pdf_document = extract_document_from_pdf(main_pdf, max_pages=50, use_ocr=use_ocr_mode, prepared=prepared)
+                    pdf_text, num_pages = pdf_document.text, pdf_document.num_pages
+                    st.session_state.pdf_document = pdf_document
                     st.session_state.pdf_text = pdf_text
                     pdf_time = int((time.time() - pdf_start) * 1000)
                     
                     log_activity("pdf_upload", "success", {
                         "filename": uploaded_file.name,
                         "pages": num_pages,
-                        "text_length": len(pdf_text)
+                        "text_length": len(pdf_text),
+                        "sources": pdf_document.sources
                     }, pdf_time)
                     
                     # 참고자료 PDF 처리
@@ -2542,7 +3044,8 @@ with tab2:
                     if reference_files:
                         with st.spinner(f"📚 참고자료 {len(reference_files)}개 처리 중..."):
                             for ref_file in reference_files:
-                                ref_text, ref_pages = extract_text_from_pdf(ref_file, max_pages=50, use_ocr=use_ocr_mode)
+                                with PDFDocumentHandle.from_upload(ref_file) as ref_pdf:
+                                    ref_text, ref_pages = extract_text_from_pdf(ref_pdf, max_pages=50, use_ocr=use_ocr_mode)
                                 if ref_text:
                                     st.session_state.reference_pdfs[ref_file.name] = ref_text
                                     st.success(f"✅ {ref_file.name} 처리 완료 ({ref_pages}페이지, {len(ref_text)}자)")
@@ -2615,9 +3118,11 @@ with tab2:
                                 
                                 company_id = save_to_supabase(
                                     company_name=company_name_temp,
-                                    pdf_file=uploaded_file,
-                                    extracted_text=pdf_text,
-                                    extracted_data=extracted_data
+                                    pdf_file=main_pdf,
+                                    extracted_text=pdf_document,
+                                    extracted_data=extracted_data,
+                                    # OCR로 바뀐 페이지가 없으면 선행 처리 청크, 원격 OCR 서버 경유면 수신 중에 분할한 청크 사용
+                                    chunks=prepared.chunks if prepared is not None and pdf_document is prepared.document else pdf_document.chunks
                                 )
                                 save_time = int((time.time() - save_start) * 1000)
                                 
@@ -2671,6 +3176,12 @@ with tab2:
                         log_error("pdf_upload", Exception("PDF 텍스트 추출 실패"))
                         complete_test_session("failed", "PDF 텍스트 추출 실패")
             
+            except UpstageJobPending as pending:
+                # 비동기 분석 작업 제출됨 - 진행 상황은 fragment가 표시하고 완료 시 재개
+                st.session_state.pending_upstage_job = pending.job.key
+                st.info(f"⏳ Upstage 비동기 분석 작업을 제출했습니다 ({pending.job.filename}). 완료되면 자동으로 이어서 처리합니다.")
+                st.rerun()
+            
             except Exception as e:
                 st.error(f"❌ 처리 중 오류 발생: {str(e)}")
                 error_trace = traceback.format_exc()
@@ -2708,18 +3219,9 @@ with tab2:
                             with st.spinner(f"🔍 {len(new_fields)}개 새 키워드 추출 중..."):
                                 # PDF 텍스트가 없으면 구조화된 데이터에서 텍스트 재구성
                                 if not st.session_state.pdf_text:
-                                    structured_data = st.session_state.structured_data
-                                    reconstructed_text = ""
-                                    
-                                    # 표 데이터 추가
-                                    for table in structured_data.get('tables', []):
-                                        reconstructed_text += f"\n{table['content']}\n"
-                                    
-                                    # 문단 데이터 추가
-                                    for para in structured_data.get('paragraphs', [])[:50]:
-                                        reconstructed_text += f"{para['content']}\n"
-                                    
-                                    st.session_state.pdf_text = reconstructed_text
+                                    # 표 + 문단(최대 50개)으로 재구성
+                                    structured_data = StructuredDocument.from_dict(st.session_state.structured_data)
+                                    st.session_state.pdf_text = structured_data.reconstruct_text(max_paragraphs=50)
                                 
                                 # 새 키워드만 추출
                                 new_extracted = extract_all_keywords_batch(
@@ -2761,7 +3263,7 @@ with tab2:
         
         # 구조화된 데이터 정보 표시 (표/차트)
         if st.session_state.get('structured_data'):
-            structured_data = st.session_state.structured_data
+            structured_data = StructuredDocument.from_dict(st.session_state.structured_data)
             table_count = len(structured_data.get("tables", []))
             chart_count = len(structured_data.get("charts", []))
             
@@ -2771,8 +3273,11 @@ with tab2:
             # 표 정보
             if table_count > 0:
                 with st.expander(f"📊 인식된 표 정보 ({table_count}개)", expanded=False):
-                    for idx, table in enumerate(structured_data["tables"], 1):
-                        st.write(f"**표 {idx} (페이지 {table.get('page', '?')})**")
+                    tables = structured_data.tables_in_page_order()
+                    for idx, table in enumerate(tables, 1):
+                        section = structured_data.section_for_page(table.page)
+                        section_label = f" - {section.content[:50]}" if section else ""
+                        st.write(f"**표 {idx} (페이지 {table.page}{section_label})**")
                         table_content = table.get('html', '') or table.get('markdown', '') or table.get('content', '')
                         if table_content:
                             st.text(table_content[:300] + ("..." if len(table_content) > 300 else ""))
@@ -3364,12 +3869,12 @@ if is_admin:
                                     st.markdown("### 📄 OCR 원본 추출 데이터 (Upstage Parse)")
                                     
                                     # 표 데이터
-                                    structured_data = selected_log.get('ocr_structured_data', {})
+                                    structured_data = StructuredDocument.from_dict(selected_log.get('ocr_structured_data') or None)
                                     if structured_data and structured_data.get('tables'):
                                         st.markdown(f"#### 📊 인식된 표 ({len(structured_data['tables'])}개)")
-                                        for idx, table in enumerate(structured_data['tables']):
-                                            with st.expander(f"표 {idx+1} (페이지 {table.get('page', '?')})"):
-                                                st.text(table.get('content', '내용 없음')[:1000])
+                                        for idx, table in enumerate(structured_data.tables_in_page_order()):
+                                            with st.expander(f"표 {idx+1} (페이지 {table.page})"):
+                                                st.text((table.content or '내용 없음')[:1000])
                                     else:
                                         st.info("구조화된 표 데이터가 없습니다")
                                     
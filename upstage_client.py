@@ -0,0 +1,880 @@
+"""
+☁️ Upstage Document Parse 클라이언트
+Streamlit에 의존하지 않는 요청/응답 처리
+- 대용량 PDF를 N페이지 창(window)으로 나눠 동시 요청
+- 창별 실패는 해당 창만 재시도
+- 창별 결과를 원본 페이지 번호로 보정해 하나의 응답으로 병합
+- 비동기 API(제출 → 작업 핸들 → 백그라운드 폴링)로 스크립트 스레드를 막지 않음
+- 경량 모드: 실제로 쓰는 출력 형식만 요청, 응답은 스트리밍 파싱
+- base64 이미지 페이로드는 세션 메모리 대신 디스크에 저장하고 경로만 참조
+- 원격 OCR 서버(ocr_server.py)의 페이지별 NDJSON 스트리밍 응답 수신
+- 모든 Upstage 호출은 resilience 계층 경유 (백오프 재시도, Retry-After, 호스트별 동시 호출 제한, 서킷 브레이커)
+"""
+
+import base64
+import codecs
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz  # PyMuPDF
+import requests
+
+from pdf_extraction import build_sub_pdf
+from resilience import RETRYABLE_STATUS, CircuitOpenError, get_upstream_guard
+
+# Upstage API URL (최신 Document Digitization API, 테스트 시 모의 서버 주소로 변경 가능)
+UPSTAGE_API_URL = os.getenv("UPSTAGE_DIGITIZATION_URL", "https://api.upstage.ai/v1/document-digitization")
+UPSTAGE_ASYNC_URL = f"{UPSTAGE_API_URL}/async"
+UPSTAGE_REQUEST_STATUS_URL = f"{UPSTAGE_API_URL}/requests/{{request_id}}"
+
+# 비동기 작업 폴링 간격 (초)
+DEFAULT_POLL_INTERVAL = 2.0
+# 비동기 작업 최대 대기 시간 (초) / 연속 조회 실패 허용 횟수 - 넘으면 작업 실패 처리
+DEFAULT_JOB_TIMEOUT = 30 * 60
+DEFAULT_MAX_POLL_ERRORS = 10
+
+# 창 분할 기본값
+DEFAULT_WINDOW_PAGES = 10
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_WINDOW_RETRIES = 2
+
+# Upstage Document Parse API 파라미터 (표 + 차트 인식)
+DEFAULT_FORM_DATA = {
+    "ocr": "force",  # Always apply OCR
+    "model": "document-parse",  # 명시적으로 모델 지정
+    "output_formats": "['text', 'html', 'markdown']",  # JSON 배열을 문자열로
+    "coordinates": "true",  # 좌표 정보 포함
+    "base64_encoding": "['table', 'figure']",  # 표와 차트/그래프 모두 인코딩
+}
+
+# 경량 모드 파라미터 - 추출기가 실제로 읽는 형식만 요청
+# (표: markdown/text, 본문: text / 좌표와 base64 이미지는 사용하지 않음)
+LEAN_FORM_DATA = {
+    "ocr": "force",
+    "model": "document-parse",
+    "output_formats": "['text', 'markdown']",
+    "coordinates": "false",
+}
+
+# 스트리밍 응답 읽기 단위
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# base64 페이로드 저장 위치 / 용량 상한 / 보관 기간
+DEFAULT_ASSET_DIR = Path(__file__).parent / ".upstage_assets"
+DEFAULT_ASSET_MAX_BYTES = 200 * 1024 * 1024  # 200MB
+DEFAULT_ASSET_TTL_SECONDS = 24 * 3600
+
+
+def upstage_form_data(lean=False):
+    """요청 파라미터 (lean=True면 경량 모드)"""
+    return dict(LEAN_FORM_DATA if lean else DEFAULT_FORM_DATA)
+
+
+class UpstageError(Exception):
+    """Upstage API 호출 실패"""
+
+    def __init__(self, message, status_code=None, retryable=False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class AssetStore:
+    """base64 이미지 페이로드를 디스크에 저장 (콘텐츠 해시 파일명, 중복 저장 없음)
+
+    용량 초과 시 오래 안 쓴 파일부터 삭제(LRU), TTL 동안 쓰이지 않은 파일도 삭제합니다.
+    디렉터리 순회는 일정 간격 또는 새로 쓴 용량이 상한의 1/10을 넘을 때만 수행합니다.
+    """
+
+    def __init__(self, asset_dir=DEFAULT_ASSET_DIR, max_bytes=DEFAULT_ASSET_MAX_BYTES,
+                 ttl_seconds=DEFAULT_ASSET_TTL_SECONDS, evict_interval=60.0):
+        self.asset_dir = Path(asset_dir)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._written_since_evict = 0
+        self._last_evict = 0.0
+        self.asset_dir.mkdir(parents=True, exist_ok=True)
+
+    def put(self, b64_data):
+        """base64 문자열을 디코딩해 저장하고 파일 경로 반환"""
+        raw = base64.b64decode(b64_data)
+        path = self.asset_dir / f"{hashlib.sha256(raw).hexdigest()}.bin"
+        if path.exists():
+            # 최근 사용 시각 갱신 (LRU 기준)
+            try:
+                os.utime(path, None)
+                return str(path)
+            except OSError:
+                pass
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(raw)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._written_since_evict += len(raw)
+            now = time.time()
+            if now - self._last_evict >= self.evict_interval or self._written_since_evict > self.max_bytes // 10:
+                self._evict(now)
+        return str(path)
+
+    def get(self, ref):
+        """저장된 페이로드 (삭제된 뒤면 FileNotFoundError)"""
+        path = Path(ref)
+        data = path.read_bytes()
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def _evict(self, now):
+        """TTL 동안 쓰이지 않은 파일 삭제 후, 용량 초과분을 오래 안 쓴 순서로 삭제"""
+        self._written_since_evict = 0
+        self._last_evict = now
+        entries = []
+        total = 0
+        for path in self.asset_dir.glob("*.bin"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self):
+        """저장 파일 수 / 총 용량"""
+        sizes = [path.stat().st_size for path in self.asset_dir.glob("*.bin")]
+        return {"entries": len(sizes), "bytes": sum(sizes), "max_bytes": self.max_bytes, "ttl_seconds": self.ttl_seconds}
+
+
+_default_asset_store = None
+
+
+def get_asset_store():
+    """프로세스 공용 AssetStore (UPSTAGE_ASSET_DIR / UPSTAGE_ASSET_MAX_MB / UPSTAGE_ASSET_TTL_HOURS 환경변수)"""
+    global _default_asset_store
+    if _default_asset_store is None:
+        max_mb = os.getenv("UPSTAGE_ASSET_MAX_MB")
+        ttl_hours = os.getenv("UPSTAGE_ASSET_TTL_HOURS")
+        _default_asset_store = AssetStore(
+            os.getenv("UPSTAGE_ASSET_DIR") or DEFAULT_ASSET_DIR,
+            max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_ASSET_MAX_BYTES,
+            ttl_seconds=float(ttl_hours) * 3600 if ttl_hours else DEFAULT_ASSET_TTL_SECONDS,
+        )
+    return _default_asset_store
+
+
+def _offload_binary(element, asset_store):
+    """요소의 base64 페이로드를 디스크로 옮기고 참조 경로만 남김"""
+    b64_data = element.pop("base64_encoding", None)
+    if b64_data and asset_store is not None:
+        try:
+            element["base64_ref"] = asset_store.put(b64_data)
+        except (ValueError, OSError) as e:
+            print(f"⚠️ base64 페이로드 저장 실패: {e}")
+    return element
+
+
+# 값 끝을 찾는 스캐너용 패턴 (구조 문자 / 문자열 본문(이스케이프 포함) / 숫자·리터럴 토큰)
+_SCAN_STRUCT = re.compile(r'["\[\]{}]')
+_SCAN_STRING = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+_SCALAR_TAIL = re.compile(r"[0-9A-Za-z+\-.]*")
+
+
+class _ValueScanner:
+    """JSON 값 하나가 어디서 끝나는지 청크 단위로 이어서 찾음 (각 청크는 한 번만 훑음)
+
+    문법 검증은 하지 않고 괄호 깊이 / 문자열 / 이스케이프 상태만 추적 - 디코딩은 값이 끝난 뒤 한 번
+    """
+
+    def __init__(self):
+        self.kind = None  # "container" / "string" / "scalar"
+        self.depth = 0
+        self.in_string = False
+        self.escape = False  # 청크가 역슬래시로 끝남
+
+    def feed(self, text, i=0):
+        """text[i:]를 이어서 훑고 값이 끝나는 위치(끝 다음 인덱스) 반환 - 아직 안 끝났으면 None"""
+        if self.kind is None:
+            first = text[i]
+            if first in "[{":
+                self.kind = "container"
+            elif first == '"':
+                self.kind = "string"
+                self.in_string = True
+                i += 1
+            else:
+                self.kind = "scalar"
+        if self.kind == "scalar":
+            # 숫자/리터럴은 청크 경계에서 잘렸을 수 있음 ('1.' + '5}') - 구분자가 보일 때까지 끝이 아님
+            end = _SCALAR_TAIL.match(text, i).end()
+            return end if end < len(text) else None
+        while True:
+            if self.in_string:
+                if self.escape:
+                    if i >= len(text):
+                        return None
+                    i += 1
+                    self.escape = False
+                i = _SCAN_STRING.match(text, i).end()
+                if i >= len(text):
+                    return None
+                if text[i] == "\\":
+                    # 청크 끝의 역슬래시 - 이스케이프된 문자는 다음 청크 첫 글자
+                    self.escape = True
+                    return None
+                i += 1  # 닫는 따옴표
+                self.in_string = False
+                if self.kind == "string":
+                    return i
+                continue
+            match = _SCAN_STRUCT.search(text, i)
+            if match is None:
+                return None
+            char, i = match.group(), match.end()
+            if char == '"':
+                self.in_string = True
+            elif char in "[{":
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 0:
+                    return i
+
+
+class _StreamBuffer:
+    """바이트 청크 → 텍스트 버퍼 (UTF-8 경계 안전)"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        """다음 청크의 텍스트 - 스트림 끝이면 None"""
+        if self.eof:
+            return None
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk) if chunk else ""
+            if text:
+                return text
+        self.eof = True
+        return self._decoder.decode(b"", final=True) or None
+
+    def fill(self):
+        """청크 하나 더 읽기 - 더 없으면 False"""
+        # 이미 소비한 앞부분은 버려 버퍼가 응답 전체로 커지지 않게 함
+        if self.pos > STREAM_CHUNK_SIZE:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        text = self._read()
+        if text is None:
+            return False
+        self.text += text
+        return True
+
+    def skip_ws(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def peek(self):
+        self.skip_ws()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON 스트림 파싱 오류: '{char}' 필요 (위치 {self.pos})")
+        self.pos += 1
+
+    def decode_value(self, decoder=json.JSONDecoder()):
+        """다음 JSON 값 하나 디코딩
+
+        값이 끝날 때까지 청크를 모으되 새 청크만 훑고, 모은 청크는 끝난 뒤 한 번만 이어 붙여 디코딩
+        (큰 content.html 문자열도 청크마다 처음부터 다시 디코딩/복사하지 않음)
+        """
+        self.skip_ws()
+        if self.pos < len(self.text):
+            scanner = _ValueScanner()
+            end = scanner.feed(self.text, self.pos)
+            if end is None:
+                pieces = [self.text[self.pos:]]
+                length = len(pieces[0])
+                while end is None:
+                    text = self._read()
+                    if text is None:
+                        break  # 스트림 끝 - 잘린 값이면 아래 raw_decode가 오류
+                    end = scanner.feed(text)
+                    pieces.append(text)
+                    length += len(text)
+                self.text = "".join(pieces)
+                self.pos = 0
+        value, self.pos = decoder.raw_decode(self.text, self.pos)
+        return value
+
+
+def parse_response_stream(chunks, asset_store=None, stream_key="elements"):
+    """Upstage JSON 응답을 스트리밍 파싱
+
+    최상위 객체를 키 단위로 읽고, elements 배열은 요소 하나씩 디코딩해
+    base64 페이로드를 즉시 디스크로 옮깁니다. 응답 전체를 메모리에 올리지 않습니다.
+    """
+    buf = _StreamBuffer(chunks)
+    result = {}
+    buf.expect("{")
+    if buf.peek() == "}":
+        return result
+    while True:
+        key = buf.decode_value()
+        buf.expect(":")
+        if key == stream_key and buf.peek() == "[":
+            buf.pos += 1
+            items = []
+            if buf.peek() == "]":
+                buf.pos += 1
+            else:
+                while True:
+                    item = buf.decode_value()
+                    if isinstance(item, dict):
+                        item = _offload_binary(item, asset_store)
+                    items.append(item)
+                    separator = buf.peek()
+                    buf.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError(f"JSON 스트림 파싱 오류: 배열 구분자 '{separator}'")
+            result[key] = items
+        else:
+            result[key] = buf.decode_value()
+        separator = buf.peek()
+        buf.pos += 1
+        if separator == "}":
+            return result
+        if separator != ",":
+            raise ValueError(f"JSON 스트림 파싱 오류: 객체 구분자 '{separator}'")
+
+
+# 재시도할 requests 예외 (연결 실패 / 타임아웃)
+RETRYABLE_EXCEPTIONS = (requests.Timeout, requests.ConnectionError)
+
+
+def _guarded_request(method, url, retries=None, **kwargs):
+    """resilience 계층을 거쳐 요청 (retries: 첫 시도 외 재시도 횟수, 기본은 UPSTREAM_MAX_ATTEMPTS 기준)"""
+    try:
+        return get_upstream_guard(url).call_sync(
+            lambda: requests.request(method, url, **kwargs),
+            retryable_exceptions=RETRYABLE_EXCEPTIONS,
+            max_attempts=None if retries is None else retries + 1,
+        )
+    except CircuitOpenError as e:
+        raise UpstageError(f"Upstage 연속 실패로 잠시 호출 중단: {e}") from e
+
+
+def post_document(pdf_bytes, filename, api_key, data=None, timeout=120, asset_store=None, retries=None):
+    """PDF 한 건을 Upstage에 전송하고 JSON 응답 반환 (스트리밍 파싱)"""
+    headers = {"Authorization": f"Bearer {api_key}"}
+    files = {"document": (filename, pdf_bytes, "application/pdf")}
+    try:
+        response = _guarded_request(
+            "POST",
+            UPSTAGE_API_URL,
+            retries=retries,
+            headers=headers,
+            files=files,
+            data=data if data is not None else DEFAULT_FORM_DATA,
+            timeout=timeout,
+            stream=True,
+        )
+    except requests.Timeout as e:
+        raise UpstageError(f"타임아웃: {e}", retryable=True) from e
+    except requests.ConnectionError as e:
+        raise UpstageError(f"연결 실패: {e}", retryable=True) from e
+
+    with response:
+        if response.status_code != 200:
+            raise UpstageError(
+                f"Upstage API 오류 {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                retryable=response.status_code in RETRYABLE_STATUS,
+            )
+        try:
+            return parse_response_stream(response.iter_content(STREAM_CHUNK_SIZE), asset_store=asset_store)
+        except requests.RequestException as e:
+            raise UpstageError(f"응답 수신 실패: {e}", retryable=True) from e
+
+
+def split_pdf_windows(pdf_bytes, window_pages=DEFAULT_WINDOW_PAGES, max_pages=50):
+    """PDF를 window_pages 단위 부분 PDF로 분할 [(첫 페이지 번호, 바이트), ...]"""
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    num_pages = min(len(doc), max_pages)
+    doc.close()
+
+    windows = []
+    for start in range(0, num_pages, window_pages):
+        end = min(start + window_pages, num_pages)
+        windows.append((start + 1, build_sub_pdf(pdf_bytes, list(range(start + 1, end + 1)))))
+    return windows
+
+
+def _parse_window(window_bytes, filename, api_key, data, timeout, retries, asset_store=None):
+    """창 하나 요청 - 429/5xx/연결 오류는 resilience 계층에서 최대 retries회 재시도"""
+    return post_document(
+        window_bytes, filename, api_key, data=data, timeout=timeout, asset_store=asset_store, retries=retries
+    )
+
+
+def merge_window_results(window_results):
+    """창별 응답을 원본 페이지 번호 기준 하나의 응답으로 병합
+
+    window_results: [(첫 페이지 번호, 응답 dict), ...] (페이지 순서)
+    """
+    merged_elements = []
+    merged_pages = []
+    text_parts, html_parts, markdown_parts = [], [], []
+
+    for first_page, result in window_results:
+        offset = first_page - 1
+        for element in result.get("elements", []):
+            element = dict(element)
+            element["page"] = element.get("page", 1) + offset
+            element["id"] = len(merged_elements)
+            merged_elements.append(element)
+        for page_data in result.get("pages", []):
+            page_data = dict(page_data)
+            if isinstance(page_data.get("page"), int):
+                page_data["page"] += offset
+            merged_pages.append(page_data)
+
+        content = result.get("content", {})
+        text_parts.append(content.get("text", ""))
+        html_parts.append(content.get("html", ""))
+        markdown_parts.append(content.get("markdown", ""))
+
+    return {
+        "content": {
+            "text": "\n\n".join(p for p in text_parts if p),
+            "html": "\n".join(p for p in html_parts if p),
+            "markdown": "\n\n".join(p for p in markdown_parts if p),
+        },
+        "elements": merged_elements,
+        "pages": merged_pages,
+    }
+
+
+def parse_document_windowed(
+    pdf_bytes,
+    filename,
+    api_key,
+    max_pages=50,
+    window_pages=DEFAULT_WINDOW_PAGES,
+    max_workers=DEFAULT_MAX_WORKERS,
+    retries=DEFAULT_WINDOW_RETRIES,
+    data=None,
+    timeout=120,
+    asset_store=None,
+):
+    """창 단위 동시 요청 후 병합
+
+    반환: (병합된 응답 dict, 실패한 창 목록 [(첫 페이지, 마지막 페이지, 오류 메시지), ...])
+    """
+    windows = split_pdf_windows(pdf_bytes, window_pages, max_pages)
+
+    def run(window):
+        first_page, window_bytes = window
+        window_name = f"{filename.rsplit('.', 1)[0]}_p{first_page}.pdf"
+        return _parse_window(window_bytes, window_name, api_key, data, timeout, retries, asset_store)
+
+    successes, failures = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(windows)))) as executor:
+        futures = [executor.submit(run, window) for window in windows]
+        for (first_page, window_bytes), future in zip(windows, futures):
+            try:
+                successes.append((first_page, future.result()))
+            except Exception as e:
+                with fitz.open(stream=window_bytes, filetype="pdf") as window_doc:
+                    last_page = first_page + len(window_doc) - 1
+                failures.append((first_page, last_page, str(e)))
+
+    return merge_window_results(successes), failures
+
+
+# ============================================
+# 원격 OCR 서버 (ocr_server.py /ocr-pdf?stream=true)
+# ============================================
+
+def iter_ocr_server_pages(server_url, api_key, pdf_bytes, filename, window_pages=None, timeout=300,
+                          formats=None, include_elements=True, max_in_flight=None, lean=False):
+    """원격 OCR 서버에 PDF를 보내고 페이지별 결과를 받는 대로 하나씩 반환
+
+    각 줄: 페이지 결과 {"page", "text", "html", "elements", ...}
+           실패한 창 {"pages": [첫 페이지, 마지막 페이지], "status": "failed", "error"}
+           마지막 줄 {"summary": {...}}
+    formats(예: ["text"]) / include_elements=False: 서버가 필요 없는 표현과 요소 목록을 빼고 전송
+    max_in_flight: 서버의 동시 분석 창 수, lean=True: 서버가 경량 모드 파라미터로 Upstage 호출
+    (응답은 Accept-Encoding에 따라 압축되어 오고 requests가 자동으로 풂)
+    """
+    params = {"stream": "true"}
+    if window_pages:
+        params["window_pages"] = window_pages
+    if max_in_flight:
+        params["max_in_flight"] = max_in_flight
+    if lean:
+        params["lean"] = "true"
+    if formats:
+        params["formats"] = ",".join(formats)
+    if not include_elements:
+        params["elements"] = "false"
+    try:
+        response = requests.post(
+            f"{server_url.rstrip('/')}/ocr-pdf",
+            headers={"X-API-Key": api_key},
+            files={"file": (filename, pdf_bytes, "application/pdf")},
+            params=params,
+            timeout=timeout,
+            stream=True,
+        )
+    except requests.Timeout as e:
+        raise UpstageError(f"OCR 서버 타임아웃: {e}", retryable=True) from e
+    except requests.ConnectionError as e:
+        raise UpstageError(f"OCR 서버 연결 실패: {e}", retryable=True) from e
+
+    with response:
+        if response.status_code != 200:
+            raise UpstageError(
+                f"OCR 서버 오류 {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+                retryable=response.status_code in RETRYABLE_STATUS,
+            )
+        try:
+            for line in response.iter_lines(chunk_size=STREAM_CHUNK_SIZE):
+                if line:
+                    yield json.loads(line)
+        except requests.RequestException as e:
+            raise UpstageError(f"OCR 서버 응답 수신 실패: {e}", retryable=True) from e
+
+
+def merge_page_stream(page_results):
+    """페이지별 결과를 Document Parse 응답 형식 하나로 병합 (페이지 순서)"""
+    merged_elements = []
+    text_parts, html_parts = [], []
+    for page_result in sorted(page_results, key=lambda r: r["page"]):
+        for element in page_result.get("elements", []):
+            element = dict(element)
+            element["id"] = len(merged_elements)
+            merged_elements.append(element)
+        text_parts.append(page_result.get("text", ""))
+        html_parts.append(page_result.get("html", ""))
+
+    return {
+        "content": {
+            "text": "\n\n".join(p for p in text_parts if p),
+            "html": "\n".join(p for p in html_parts if p),
+            "markdown": "",
+        },
+        "elements": merged_elements,
+        "pages": [],
+    }
+
+
+# ============================================
+# 비동기 Document Parse (제출 → 폴링)
+# ============================================
+
+# 작업 상태
+JOB_SUBMITTING = "submitting"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def submit_async(pdf_bytes, filename, api_key, data=None, timeout=60):
+    """비동기 파싱 요청 제출 - Upstage request_id 반환"""
+    headers = {"Authorization": f"Bearer {api_key}"}
+    files = {"document": (filename, pdf_bytes, "application/pdf")}
+    try:
+        response = _guarded_request(
+            "POST",
+            UPSTAGE_ASYNC_URL,
+            headers=headers,
+            files=files,
+            data=data if data is not None else DEFAULT_FORM_DATA,
+            timeout=timeout,
+        )
+    except RETRYABLE_EXCEPTIONS as e:
+        raise UpstageError(f"비동기 제출 실패: {e}", retryable=True) from e
+
+    if response.status_code not in (200, 202):
+        raise UpstageError(
+            f"Upstage 비동기 제출 오류 {response.status_code}: {response.text[:500]}",
+            status_code=response.status_code,
+            retryable=response.status_code in RETRYABLE_STATUS,
+        )
+    return response.json()["request_id"]
+
+
+def get_async_status(request_id, api_key, timeout=30):
+    """비동기 작업 상태 조회 (status, total_pages, completed_pages, batches)"""
+    try:
+        response = _guarded_request(
+            "GET",
+            UPSTAGE_REQUEST_STATUS_URL.format(request_id=request_id),
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+    except RETRYABLE_EXCEPTIONS as e:
+        raise UpstageError(f"Upstage 작업 조회 실패: {e}", retryable=True) from e
+    if response.status_code != 200:
+        raise UpstageError(
+            f"Upstage 작업 조회 오류 {response.status_code}: {response.text[:500]}",
+            status_code=response.status_code,
+            retryable=response.status_code in RETRYABLE_STATUS,
+        )
+    return response.json()
+
+
+def download_batch(download_url, timeout=60, asset_store=None):
+    """완료된 배치 결과 다운로드 (스트리밍 파싱)"""
+    try:
+        response = _guarded_request("GET", download_url, timeout=timeout, stream=True)
+    except RETRYABLE_EXCEPTIONS as e:
+        raise UpstageError(f"배치 결과 다운로드 실패: {e}", retryable=True) from e
+    with response:
+        if response.status_code != 200:
+            raise UpstageError(
+                f"배치 결과 다운로드 오류 {response.status_code}",
+                status_code=response.status_code,
+                retryable=response.status_code in RETRYABLE_STATUS,
+            )
+        return parse_response_stream(response.iter_content(STREAM_CHUNK_SIZE), asset_store=asset_store)
+
+
+def _normalize_batch_pages(batch_result, start_page, end_page):
+    """병합 기준 첫 페이지 - 배치 결과의 page가 배치 기준(1부터)이면 start_page, 원본 기준이면 1"""
+    pages = [e.get("page") for e in batch_result.get("elements", []) if isinstance(e.get("page"), int)]
+    if start_page > 1 and pages and max(pages) <= end_page - start_page + 1 and min(pages) < start_page:
+        return start_page
+    return 1
+
+
+class UpstageJobPending(Exception):
+    """비동기 작업이 아직 끝나지 않음 (UI가 진행 상황을 보여주고 나중에 재개)"""
+
+    def __init__(self, job):
+        super().__init__(f"Upstage 작업 진행 중: {job.key}")
+        self.job = job
+
+
+class UpstageJob:
+    """비동기 파싱 작업 핸들 (스레드 안전한 상태 스냅샷 제공)"""
+
+    def __init__(self, key, filename):
+        self.key = key
+        self.filename = filename
+        self.request_id = None
+        self.status = JOB_SUBMITTING
+        self.total_pages = 0
+        self.completed_pages = 0
+        self.error = None
+        self.poll_errors = 0  # 연속 조회 실패 횟수
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._batches = {}  # 배치 start_page -> (병합 기준 첫 페이지, 결과 dict)
+        self._result = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    @property
+    def progress(self):
+        if not self.total_pages:
+            return 0.0
+        return min(self.completed_pages / self.total_pages, 1.0)
+
+    def partial_result(self):
+        """지금까지 받은 배치만 병합한 응답 (진행 중 미리보기용)"""
+        with self._lock:
+            batches = [self._batches[start_page] for start_page in sorted(self._batches)]
+        return merge_window_results(batches)
+
+    @property
+    def result(self):
+        return self._result
+
+    def _has_batch(self, start_page):
+        with self._lock:
+            return start_page in self._batches
+
+    def _add_batch(self, start_page, first_page, batch_result):
+        with self._lock:
+            self._batches[start_page] = (first_page, batch_result)
+
+    def _finish(self, status, error=None):
+        if status == JOB_COMPLETED:
+            self._result = self.partial_result()
+        self.status = status
+        self.error = error
+        self.updated_at = time.time()
+
+
+class UpstageJobManager:
+    """비동기 작업 제출/폴링 관리자 (프로세스 공용)
+
+    제출은 작은 스레드 풀에서, 폴링은 단일 백그라운드 스레드가 모든 작업을 순회하며 처리합니다.
+    여러 사용자의 파싱이 동시에 진행돼도 Streamlit 스크립트 스레드는 기다리지 않습니다.
+    """
+
+    def __init__(self, poll_interval=DEFAULT_POLL_INTERVAL, submit_workers=4, max_finished_jobs=100, asset_store=None,
+                 job_timeout=DEFAULT_JOB_TIMEOUT, max_poll_errors=DEFAULT_MAX_POLL_ERRORS):
+        self.poll_interval = poll_interval
+        self.job_timeout = job_timeout
+        self.max_poll_errors = max_poll_errors
+        self.asset_store = asset_store
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._submit_executor = ThreadPoolExecutor(max_workers=submit_workers, thread_name_prefix="upstage-submit")
+        self._poller = None
+        self._api_keys = {}
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def submit(self, key, pdf_bytes, filename, api_key, data=None):
+        """작업 제출 (같은 key가 진행 중/완료 상태면 기존 작업 재사용)"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != JOB_FAILED:
+                return job
+            job = UpstageJob(key, filename)
+            self._jobs[key] = job
+            self._api_keys[key] = api_key
+            self._prune()
+        # 제출 스레드가 끝날 때까지 bytes가 필요하므로 복사본 전달 (memoryview 원본 해제 대비)
+        self._submit_executor.submit(self._submit, job, bytes(pdf_bytes), api_key, data)
+        self._ensure_poller()
+        return job
+
+    def discard(self, key):
+        with self._lock:
+            self._jobs.pop(key, None)
+            self._api_keys.pop(key, None)
+
+    def _submit(self, job, pdf_bytes, api_key, data):
+        try:
+            job.request_id = submit_async(pdf_bytes, job.filename, api_key, data=data)
+            job.status = JOB_RUNNING
+            job.updated_at = time.time()
+        except Exception as e:
+            job._finish(JOB_FAILED, str(e))
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll_loop, name="upstage-poller", daemon=True)
+                self._poller.start()
+
+    def _poll_loop(self):
+        while True:
+            # 종료 판단과 _poller 해제를 한 락 구간에서 처리
+            # (사이에 submit()이 들어와 살아 있는 폴러를 보고 새 폴러를 띄우지 않는 경쟁 방지)
+            with self._lock:
+                active = [job for job in self._jobs.values() if job.status == JOB_RUNNING]
+                submitting = any(job.status == JOB_SUBMITTING for job in self._jobs.values())
+                if not active and not submitting:
+                    self._poller = None
+                    return
+            for job in active:
+                self._poll_job(job)
+            time.sleep(self.poll_interval)
+
+    def _poll_job(self, job):
+        if time.time() - job.created_at > self.job_timeout:
+            job._finish(JOB_FAILED, f"Upstage 작업 시간 초과 ({self.job_timeout / 60:.0f}분)")
+            return
+        api_key = self._api_keys.get(job.key)
+        try:
+            status = get_async_status(job.request_id, api_key)
+        except Exception as e:
+            # 재시도 가능한 오류와 서킷 열림은 다음 폴링에서 재시도 (연속 max_poll_errors회까지)
+            job.poll_errors += 1
+            retryable = not isinstance(e, UpstageError) or e.retryable or isinstance(e.__cause__, CircuitOpenError)
+            if not retryable or job.poll_errors >= self.max_poll_errors:
+                job._finish(JOB_FAILED, str(e))
+            else:
+                print(f"⚠️ Upstage 작업 조회 실패 ({job.key}, {job.poll_errors}/{self.max_poll_errors}): {e}")
+            return
+        job.poll_errors = 0
+
+        job.total_pages = status.get("total_pages") or job.total_pages
+        job.completed_pages = status.get("completed_pages") or job.completed_pages
+        job.updated_at = time.time()
+
+        for batch in status.get("batches", []):
+            start_page = batch.get("start_page", 1)
+            if batch.get("status") != "completed" or job._has_batch(start_page) or not batch.get("download_url"):
+                continue
+            try:
+                batch_result = download_batch(batch["download_url"], asset_store=self.asset_store)
+            except Exception as e:
+                print(f"⚠️ 배치 다운로드 실패 ({job.key}, {start_page}페이지~): {e}")
+                continue
+            first_page = _normalize_batch_pages(batch_result, start_page, batch.get("end_page", start_page))
+            job._add_batch(start_page, first_page, batch_result)
+
+        batches = status.get("batches", [])
+        if status.get("status") == "completed" and all(job._has_batch(b.get("start_page", 1)) for b in batches):
+            job._finish(JOB_COMPLETED)
+        elif status.get("status") == "failed":
+            job._finish(JOB_FAILED, status.get("failure_message") or "Upstage 작업 실패")
+
+    def _prune(self):
+        """완료된 오래된 작업 정리 (메모리 상한)"""
+        finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.updated_at)
+        for job in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            self._jobs.pop(job.key, None)
+            self._api_keys.pop(job.key, None)
+
+
+_job_manager = None
+
+
+def get_job_manager():
+    """프로세스 공용 작업 관리자 (Streamlit 재실행에도 유지, UPSTAGE_JOB_TIMEOUT_MINUTES 환경변수)"""
+    global _job_manager
+    if _job_manager is None:
+        timeout_minutes = os.getenv("UPSTAGE_JOB_TIMEOUT_MINUTES")
+        _job_manager = UpstageJobManager(
+            asset_store=get_asset_store(),
+            job_timeout=float(timeout_minutes) * 60 if timeout_minutes else DEFAULT_JOB_TIMEOUT,
+        )
+    return _job_manager